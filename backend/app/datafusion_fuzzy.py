@@ -0,0 +1,323 @@
+"""
+Fuzzy key resolution for DataFusion: near-identical key values from
+different sources ("GNPS-0001", "gnps_0001", "GNPS 0001 ") are matched and
+grouped into clusters.
+
+Keys are compared on their distinct values only, never row by row:
+
+  1. normalise — lowercase, non-alphanumerics dropped ("GNPS-0001",
+     "gnps 0001" → "gnps0001"); values with the same normalised form match
+     outright (score 1.0).  With fuzzyThreshold 1 only case is ignored:
+     "GNPS-0001" matches "gnps-0001" but not "GNPS-00-01";
+  2. n-grams   — each normalised value (padded with a space) becomes its set
+     of character n-grams;
+  3. blocking  — an inverted index over the rarest n-grams of each value
+     (prefix filtering: two values with Jaccard ≥ t always share one of the
+     first |x| - ceil(t·|x|) + 1 n-grams in global rarity order), so only
+     values that share such an n-gram become candidate pairs; blocks larger
+     than FUZZY_MAX_BLOCK are skipped, and pairs whose sizes or first shared
+     n-gram position rule the threshold out are dropped (PPJoin filters);
+  4. scoring   — the n-gram Jaccard similarity of every candidate pair, computed
+     with sorted-array lookups over all pairs at once;
+  5. clusters  — connected components of the pairs scoring ≥ threshold
+     (single-link); every member is resolved to the cluster's most frequent
+     key value.
+
+Cost grows with the number of distinct keys times the block sizes, not with
+the square of the key count.
+
+rules (same object as the merge rules):
+  fuzzyKeyStrategy : "off" | "report" (clusters in the analysis only) |
+                     "merge" (also rewrite keys to the canonical value)
+  fuzzyThreshold   : Jaccard threshold in (0, 1], default 0.85
+  fuzzyNgram       : n-gram length 2..5, default 3
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+FUZZY_STRATEGIES = ("off", "report", "merge")
+FUZZY_DEFAULT_THRESHOLD = 0.85
+FUZZY_DEFAULT_NGRAM = 3
+
+FUZZY_MAX_CHARS = 128           # longer keys are compared on their first 128 characters
+FUZZY_MAX_BLOCK = 256           # n-grams shared by more values than this are not used as blocks
+FUZZY_CLUSTERS_LIMIT = 50
+FUZZY_VARIANTS_LIMIT = 20
+
+_GRAM_BATCH = 50_000            # values per n-gram extraction batch
+_PAIR_BATCH = 1_000_000         # candidate pairs per scoring batch
+_HASH_MULT = np.uint64(0x9E3779B97F4A7C15)   # odd: n-gram hash when exact codes do not fit 64 bits
+
+
+def fuzzy_options(rules: Dict) -> Optional[Dict]:
+    """
+    {strategy, threshold, ngram} from the merge rules, or None when fuzzy
+    matching is off.  Invalid values raise ValueError.
+    """
+    strategy = rules.get("fuzzyKeyStrategy", "off") or "off"
+    if strategy not in FUZZY_STRATEGIES:
+        raise ValueError(f"Unknown fuzzyKeyStrategy '{strategy}' (expected one of {', '.join(FUZZY_STRATEGIES)})")
+    if strategy == "off":
+        return None
+    try:
+        threshold = float(rules.get("fuzzyThreshold", FUZZY_DEFAULT_THRESHOLD))
+        ngram = int(rules.get("fuzzyNgram", FUZZY_DEFAULT_NGRAM))
+    except (TypeError, ValueError):
+        raise ValueError("fuzzyThreshold must be a number and fuzzyNgram an integer")
+    if not 0 < threshold <= 1:
+        raise ValueError("fuzzyThreshold must be in (0, 1]")
+    if not 2 <= ngram <= 5:
+        raise ValueError("fuzzyNgram must be between 2 and 5")
+    return {"strategy": strategy, "threshold": threshold, "ngram": ngram}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  N-gram index
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _normalise(names: pd.Series) -> pd.Series:
+    return (
+        names.str.lower()
+        .str.replace(r"[\W_]+", "", regex=True)
+        .str.slice(0, FUZZY_MAX_CHARS)
+    )
+
+
+def _ngrams(values: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (value id, n-gram code) for every n-gram of every value, extracted on
+    fixed-width code-point matrices; values are batched by length so one
+    long value does not widen the whole matrix.
+
+    Characters are renumbered over the alphabet of the values, so an n-gram
+    code is exact (base-|alphabet| digits) whenever |alphabet|^n fits in 64
+    bits — always for ASCII keys; larger alphabets fall back to a
+    multiplicative hash.
+    """
+    padded = np.char.add(np.char.add(" ", values.astype(str)), " ")
+    lengths = np.char.str_len(padded)
+    alphabet = np.unique(np.frombuffer("".join(padded.tolist()).encode("utf-32-le"), dtype=np.uint32))
+    base = len(alphabet)
+    mult = np.uint64(base) if base ** n < 2 ** 64 else _HASH_MULT
+    by_length = np.argsort(lengths, kind="stable")
+    ids, codes = [], []
+    for start in range(0, len(by_length), _GRAM_BATCH):
+        batch = by_length[start:start + _GRAM_BATCH]
+        width = int(lengths[batch[-1]])
+        if width < n:
+            continue
+        chars = padded[batch].astype(f"U{width}").view(np.uint32).reshape(len(batch), width)
+        chars = np.searchsorted(alphabet, chars).astype(np.uint64)     # padding past a value's end is masked below
+        positions = width - n + 1
+        gram = np.zeros((len(batch), positions), dtype=np.uint64)
+        for k in range(n):
+            gram = gram * mult + chars[:, k:k + positions]
+        valid = np.arange(positions) <= (lengths[batch] - n)[:, None]
+        rows, cols = np.nonzero(valid)
+        ids.append(batch[rows])
+        codes.append(gram[rows, cols])
+    if not ids:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+    return np.concatenate(ids).astype(np.int64), np.concatenate(codes)
+
+
+def _segment_positions(sizes: np.ndarray) -> np.ndarray:
+    """0..size-1 for every segment, concatenated."""
+    total = int(sizes.sum())
+    return np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+
+def _candidate_pairs(ids: np.ndarray, gids: np.ndarray, sizes: np.ndarray, rank: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pairs (a < b) of values sharing a prefix n-gram that can still reach the
+    threshold.  ids/gids are the (value, n-gram) entries; sizes the n-gram
+    count per value.
+    """
+    # Prefix: each value's rarest |x| - ceil(t·|x|) + 1 n-grams
+    order = np.lexsort((rank[gids], ids))
+    ids, gids = ids[order], gids[order]
+    pos = _segment_positions(sizes)
+    prefix_len = sizes - np.ceil(threshold * sizes - 1e-9).astype(np.int64) + 1
+    keep = pos < prefix_len[ids]
+    ids, gids, pos = ids[keep], gids[keep], pos[keep]
+
+    # Prefix n-grams of each value before this one that sit in oversized
+    # (skipped) blocks: shared n-grams the blocks below do not see
+    skipped = np.bincount(gids)[gids] > FUZZY_MAX_BLOCK
+    skipped_before = np.cumsum(skipped) - skipped
+    skipped_before -= skipped_before[np.arange(len(pos)) - pos]         # entry - pos: first entry of its value
+
+    # Blocks: prefix entries grouped by n-gram
+    order = np.argsort(gids, kind="stable")
+    ids, gids, pos, skipped_before = ids[order], gids[order], pos[order], skipped_before[order]
+    _, block_start, block_size = np.unique(gids, return_index=True, return_counts=True)
+    usable = (block_size > 1) & (block_size <= FUZZY_MAX_BLOCK)
+    block_start, block_size = block_start[usable], block_size[usable]
+    members = np.repeat(block_start, block_size) + _segment_positions(block_size)
+
+    # Every pair inside a block: each member pairs with the ones after it
+    later = np.repeat(block_size, block_size) - _segment_positions(block_size) - 1
+    left = np.repeat(members, later)
+    right = left + 1 + _segment_positions(later)
+    swap = ids[left] > ids[right]
+    left, right = np.where(swap, right, left), np.where(swap, left, right)
+    a, b = ids[left], ids[right]
+
+    # One entry per pair: its first shared n-gram in a usable block (lowest
+    # positions, as both sets are in the same order)
+    pair = a * len(sizes) + b
+    order = np.lexsort((pos[left], pair))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pair[order][1:] != pair[order][:-1]
+    order = order[first]
+    left, right = left[order], right[order]
+    a, b, pos_a, pos_b = a[order], b[order], pos[left], pos[right]
+    earlier = np.minimum(skipped_before[left], skipped_before[right])
+
+    # Size filter (t·|a| ≤ |b| ≤ |a|/t) and positional filter: with that n-gram
+    # at positions i, j at most earlier + 1 + min(|a|-i-1, |b|-j-1) are shared,
+    # and Jaccard ≥ t needs ceil(t/(1+t)·(|a|+|b|))
+    size_a, size_b = sizes[a], sizes[b]
+    fits = np.minimum(size_a, size_b) >= threshold * np.maximum(size_a, size_b) - 1e-9
+    needed = np.ceil(threshold / (1 + threshold) * (size_a + size_b) - 1e-9)
+    fits &= earlier + 1 + np.minimum(size_a - pos_a - 1, size_b - pos_b - 1) >= needed
+    return a[fits], b[fits]
+
+
+def _jaccard(a: np.ndarray, b: np.ndarray, entry_codes: np.ndarray, n_grams: np.int64, starts: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """
+    n-gram Jaccard of each pair: the n-grams of the smaller set are looked up
+    in the other value's sorted (value, n-gram) codes (value * n_grams + n-gram).
+    Pairs are scored in order of that other value, so the lookups walk the
+    codes in order instead of jumping around them.
+    """
+    swap = sizes[a] > sizes[b]
+    a, b = np.where(swap, b, a), np.where(swap, a, b)
+    order = np.argsort(b, kind="stable")
+    a, b = a[order], b[order]
+    entry_gids = entry_codes % n_grams
+    scores = np.empty(len(a), dtype=np.float64)
+    for lo in range(0, len(a), _PAIR_BATCH):
+        pa, pb = a[lo:lo + _PAIR_BATCH], b[lo:lo + _PAIR_BATCH]
+        count = sizes[pa]
+        pair = np.repeat(np.arange(len(pa)), count)
+        gids = entry_gids[np.repeat(starts[pa], count) + _segment_positions(count)]
+        query = pb[pair] * n_grams + gids
+        at = np.minimum(np.searchsorted(entry_codes, query), len(entry_codes) - 1)
+        shared = np.bincount(pair, weights=entry_codes[at] == query, minlength=len(pa))
+        scores[order[lo:lo + _PAIR_BATCH]] = shared / (sizes[pa] + sizes[pb] - shared)
+    return scores
+
+
+def _similar_pairs(values: np.ndarray, threshold: float, n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(a, b, score) for the pairs of distinct normalised values scoring ≥ threshold."""
+    ids, codes = _ngrams(values, n)
+    gids, _ = pd.factorize(codes)
+    n_grams = np.int64(gids.max()) + 1 if len(gids) else 1
+    entry_codes = np.unique(ids * n_grams + gids)          # sorted by value, then n-gram; sets, not bags
+    ids, gids = entry_codes // n_grams, entry_codes % n_grams
+    sizes = np.bincount(ids, minlength=len(values))
+    starts = np.cumsum(sizes) - sizes
+
+    # Global rarity order of the n-grams (ties by id)
+    freq = np.bincount(gids, minlength=n_grams)
+    rank = np.empty(n_grams, dtype=np.int64)
+    rank[np.lexsort((np.arange(n_grams), freq))] = np.arange(n_grams)
+
+    a, b = _candidate_pairs(ids, gids, sizes, rank, threshold)
+    if not len(a):
+        return a, b, np.zeros(0)
+    scores = _jaccard(a, b, entry_codes, n_grams, starts, sizes)
+    matched = scores >= threshold - 1e-9
+    return a[matched], b[matched], scores[matched]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Key resolution
+# ──────────────────────────────────────────────────────────────────────────────
+
+def resolve_keys(
+    keys: pd.Series,
+    threshold: float = FUZZY_DEFAULT_THRESHOLD,
+    ngram: int = FUZZY_DEFAULT_NGRAM,
+    counts: Optional[np.ndarray] = None,
+) -> Tuple[pd.Series, List[Dict], int]:
+    """
+    Cluster near-identical key values; return
+      (keys with every cluster member replaced by the cluster's canonical value,
+       clusters [{key, variants, size, score}] (first FUZZY_CLUSTERS_LIMIT),
+       number of rows whose key was rewritten).
+
+    counts: rows represented by each entry of keys (default 1 each), for
+    callers that pass distinct keys.  The canonical value is the one with the
+    most rows (first seen on ties); score is the lowest similarity among the
+    matched pairs of the cluster.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    codes, uniques = pd.factorize(keys)
+    n_unique = len(uniques)
+    if n_unique < 2:
+        return keys, [], 0
+    names = pd.Series(np.asarray(uniques, dtype=object)).astype(str)
+    if threshold >= 1:
+        # Threshold 1: keys that differ only by case, not by separators ("GNPS-12-3" ≠ "GNPS-1-23")
+        norm_ids, norm_values = pd.factorize(names.str.lower())
+        norm_values = np.asarray(norm_values, dtype=object)
+        a = b = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0)
+    else:
+        norm_ids, norm_values = pd.factorize(_normalise(names))
+        norm_values = np.asarray(norm_values, dtype=object)
+        a, b, scores = _similar_pairs(norm_values, threshold, ngram)
+    n_norm = len(norm_values)
+    graph = coo_matrix((np.ones(len(a), dtype=np.int8), (a, b)), shape=(n_norm, n_norm))
+    _, component = connected_components(graph, directed=False)
+
+    # Keys that normalise to "" ("-", "__") match nothing
+    cluster = component[norm_ids].astype(np.int64)
+    blank = norm_values[norm_ids] == ""
+    cluster[blank] = component.max() + 1 + np.flatnonzero(blank)
+
+    _, cluster, cluster_size = np.unique(cluster, return_inverse=True, return_counts=True)
+    multi = cluster_size[cluster] > 1
+    if not multi.any():
+        return keys, [], 0
+
+    # Canonical member: most rows, then first appearance
+    valid = codes >= 0
+    rows = np.bincount(codes[valid], weights=None if counts is None else np.asarray(counts)[valid], minlength=n_unique)
+    order = np.lexsort((np.arange(n_unique), -rows, cluster))
+    first = np.ones(n_unique, dtype=bool)
+    first[1:] = cluster[order][1:] != cluster[order][:-1]
+    canonical_of_cluster = np.empty(len(cluster_size), dtype=np.int64)
+    canonical_of_cluster[cluster[order][first]] = order[first]
+    canonical = canonical_of_cluster[cluster]
+
+    rewritten = int(rows[canonical != np.arange(n_unique)].sum())
+    resolved = keys
+    if rewritten:
+        values = np.append(np.asarray(uniques, dtype=object), None)
+        resolved = pd.Series(values[np.where(codes >= 0, canonical[np.maximum(codes, 0)], -1)], index=keys.index, name=keys.name)
+        resolved = resolved.astype(keys.dtype)
+
+    # Report: clusters in order of first appearance, lowest pair score of each
+    min_score = pd.Series(scores).groupby(component[a]).min() if len(a) else pd.Series(dtype=float)
+    report: List[Dict] = []
+    members = pd.Series(np.flatnonzero(multi)).groupby(cluster[multi], sort=False)
+    for c, idx in members:
+        if len(report) >= FUZZY_CLUSTERS_LIMIT:
+            break
+        idx = idx.to_numpy()
+        variants = sorted(names.iloc[idx])
+        score = min_score.get(component[norm_ids[idx[0]]], 1.0) if not blank[idx[0]] else 1.0
+        report.append({
+            "key": names.iloc[canonical_of_cluster[c]],
+            "variants": variants[:FUZZY_VARIANTS_LIMIT],
+            "size": len(variants),
+            "score": round(float(score), 3),
+        })
+    return resolved, report, rewritten
@@ -0,0 +1,290 @@
+"""
+Out-of-core DataFusion merge for inputs larger than memory.
+
+Same rules, output columns, values, _conflict flags and stats as
+merge_frame on the parsed files, with memory bounded by one partition:
+
+  0. scan — a first read finds the columns whose chunks parse as different
+     kinds of values (mixed_columns); they are read as text from then on,
+     as the whole-file parse reads them, so a value does not depend on the
+     chunk it falls in; then, only with fuzzyKeyStrategy "merge", a second
+     read collects the distinct keys with their row counts and resolves
+     them, so that near-identical keys are rewritten before partitioning;
+  1. spill — every file is read in CSV_CHUNK_ROWS-row chunks and mapped;
+     each row is appended to one of N partition files chosen by a hash of
+     its key (of the whole row when there is no key column), so identical
+     rows and rows sharing a key always land in the same partition;
+  2. merge — partitions are loaded one at a time, brought to the dtypes the
+     in-memory concat would give, case-normalised, deduplicated and
+     conflict-flagged;
+  3. output — each merged partition is appended to the output CSV.
+
+N is chosen so that a partition holds about DATAFUSION_PARTITION_MB of CSV
+input (default 64).
+
+Ordering: rows are written partition by partition, and in input order
+within a partition.  The set of output rows is the same as merge_frame's;
+their order is not — sort on a column if a stable order is needed.
+"""
+import math
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.datafusion_fuzzy import fuzzy_options, resolve_keys
+from app.datafusion_service import CSV_CHUNK_ROWS, apply_mapping, file_encoding, mixed_columns, normalize_case
+
+PARTITION_TARGET_BYTES = int(float(os.environ.get("DATAFUSION_PARTITION_MB", 64)) * 2**20)
+MAX_PARTITIONS = 512
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Partitioning
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _canonical_hash(values: pd.Series) -> np.ndarray:
+    """
+    Hash that is equal for values pandas compares equal, whatever dtype the
+    chunk was parsed with: numbers hash as float64 (so 1, 1.0 and "1" collide,
+    which only puts them in the same partition), other values by their string
+    form, nulls as 0.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return np.where(
+            values.isna().to_numpy(),
+            np.uint64(0),
+            pd.util.hash_pandas_object(values.astype("float64"), index=False).to_numpy(),
+        )
+    numeric = pd.to_numeric(values, errors="coerce").astype("float64")
+    h = np.where(
+        numeric.notna().to_numpy(),
+        pd.util.hash_pandas_object(numeric, index=False).to_numpy(),
+        pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy(),
+    )
+    return np.where(values.isna().to_numpy(), np.uint64(0), h)
+
+
+def _column_weight(name) -> np.uint64:
+    h = pd.util.hash_array(np.array([str(name)], dtype=object))[0]
+    return np.uint64(h | np.uint64(1))
+
+
+def _partition_ids(chunk: pd.DataFrame, key_column: str, label_col: str, case_strategy: str, n: int) -> np.ndarray:
+    # Hash the label as it will be compared after case normalisation
+    hashed = normalize_case(chunk, label_col, case_strategy) if case_strategy != "keep" else chunk
+    if key_column and key_column in hashed.columns:
+        h = _canonical_hash(hashed[key_column])
+    else:
+        # Missing columns hash as nulls (0), so the sum does not depend on which columns a file has
+        h = np.zeros(len(hashed), dtype=np.uint64)
+        for name in hashed.columns:
+            h += _canonical_hash(hashed[name]) * _column_weight(name)
+    return (h % np.uint64(n)).astype(np.int64)
+
+
+def _dtype_sample(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per column (a non-null value when the column has one): concatenating
+    samples gives the same columns and dtypes as concatenating the frames.
+    """
+    if len(df) == 0:
+        return df
+    columns = {}
+    for name in df.columns:
+        col = df[name]
+        valid = col.notna().to_numpy()
+        pos = int(valid.argmax()) if valid.any() else 0
+        columns[name] = col.iloc[pos:pos + 1].reset_index(drop=True)
+    return pd.DataFrame(columns)
+
+
+def _read_chunks(path: Path, encoding: str, chunksize: int, text_columns: Optional[List[str]] = None):
+    dtype = {col: str for col in text_columns} if text_columns else None
+    return pd.read_csv(path, chunksize=chunksize, encoding=encoding, dtype=dtype)
+
+
+def _read_spill(path: Path) -> Iterator[Tuple[int, pd.DataFrame]]:
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _fuzzy_rekey(
+    paths: Dict[str, Path], encodings: Dict[str, str], text_columns: Dict[str, List[str]],
+    column_mapping: Dict, key_column: str, fuzzy: Dict, chunksize: int
+) -> Tuple[pd.Series, int]:
+    """
+    {key value: canonical value} for the keys that fuzzy resolution rewrites,
+    and the number of rows they cover; keys are counted chunk by chunk.
+    """
+    counts = []
+    for name, path in paths.items():
+        mapping = {name: column_mapping[name]} if column_mapping.get(name) else {}
+        try:
+            for chunk in _read_chunks(path, encodings[name], chunksize, text_columns[name]):
+                chunk = apply_mapping({name: chunk}, mapping, key_column)[name]
+                if key_column in chunk.columns:
+                    counts.append(chunk[key_column].value_counts(sort=False))
+        except Exception as exc:
+            raise ValueError(f"Failed to parse '{name}': {exc}") from exc
+    if not counts:
+        return pd.Series(dtype=object), 0
+    counts = pd.concat(counts).groupby(level=0, sort=False).sum()
+    keys = pd.Series(counts.index, dtype=object)
+    resolved, _, rewritten = resolve_keys(keys, fuzzy["threshold"], fuzzy["ngram"], counts=counts.to_numpy())
+    changed = (resolved != keys).to_numpy()
+    return pd.Series(resolved[changed].to_numpy(), index=keys[changed]), rewritten
+
+
+def _rekey(chunk: pd.DataFrame, key_column: str, rekey: pd.Series) -> pd.DataFrame:
+    keys = chunk[key_column]
+    hit = keys.isin(rekey.index).to_numpy()
+    if not hit.any():
+        return chunk
+    values = keys.to_numpy(dtype=object, copy=True)
+    values[hit] = keys[hit].map(rekey).to_numpy(dtype=object)
+    rekeyed = pd.Series(values, index=keys.index)
+    try:
+        rekeyed = rekeyed.astype(keys.dtype)
+    except (TypeError, ValueError):
+        rekeyed = rekeyed.infer_objects()       # canonical value of another type (mixed key column)
+    chunk = chunk.copy()
+    chunk[key_column] = rekeyed
+    return chunk
+
+
+def partition_count(paths: Dict[str, Path]) -> int:
+    total = sum(os.path.getsize(p) for p in paths.values())
+    return min(MAX_PARTITIONS, max(1, math.ceil(total / PARTITION_TARGET_BYTES)))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Merge
+# ──────────────────────────────────────────────────────────────────────────────
+
+def merge_out_of_core(
+    paths: Dict[str, Path],
+    options: Dict,
+    output: Path,
+    spill_dir: Path,
+    partitions: Optional[int] = None,
+    chunksize: int = CSV_CHUNK_ROWS,
+) -> Dict:
+    """
+    Merge CSV files {filename: path} into the CSV at `output`; return the stats.
+    options: {column_mapping, key_column, label_col, rules} as /datafusion/merge.
+    """
+    column_mapping = options.get("column_mapping", {}) or {}
+    key_column = options.get("key_column", "")
+    label_col = options.get("label_col", "")
+    rules = options.get("rules", {})
+    case_strategy = rules.get("caseStrategy", "lowercase")
+    dup_strategy = rules.get("duplicateStrategy", "first")
+    fuzzy = fuzzy_options(rules)
+    # Decided up front: a chunked read cannot switch encoding after spilling rows
+    encodings = {name: file_encoding(path) for name, path in paths.items()}
+
+    # ── 0. Scan, fuzzy keys ───────────────────────────────────────────────────
+    text_columns = {}
+    for name, path in paths.items():
+        try:
+            text_columns[name] = mixed_columns(_read_chunks(path, encodings[name], chunksize))
+        except Exception as exc:
+            raise ValueError(f"Failed to parse '{name}': {exc}") from exc
+
+    rekey, keys_merged = None, 0
+    if fuzzy and fuzzy["strategy"] == "merge" and key_column and key_column != label_col:
+        rekey, keys_merged = _fuzzy_rekey(
+            paths, encodings, text_columns, column_mapping, key_column, fuzzy, chunksize
+        )
+
+    n = partitions or partition_count(paths)
+    spill_dir = Path(spill_dir)
+    spill_dir.mkdir(parents=True, exist_ok=True)
+    spill_paths = [spill_dir / f"part_{p:04d}.pkl" for p in range(n)]
+
+    # ── 1. Spill: chunks → partition files ────────────────────────────────────
+    names = list(paths)
+    samples: List[List[pd.DataFrame]] = [[] for _ in names]
+    total_input = 0
+    spills = [open(p, "wb") for p in spill_paths]
+    try:
+        for i, name in enumerate(names):
+            mapping = {name: column_mapping[name]} if column_mapping.get(name) else {}
+            try:
+                reader = _read_chunks(paths[name], encodings[name], chunksize, text_columns[name])
+                for chunk in reader:
+                    chunk = apply_mapping({name: chunk}, mapping, key_column)[name]
+                    if rekey is not None and len(rekey) and key_column in chunk.columns:
+                        chunk = _rekey(chunk, key_column, rekey)
+                    samples[i].append(_dtype_sample(chunk))
+                    total_input += len(chunk)
+
+                    part = _partition_ids(chunk, key_column, label_col, case_strategy, n)
+                    order = np.argsort(part, kind="stable")
+                    bounds = np.cumsum(np.bincount(part, minlength=n))
+                    start = 0
+                    for p, end in enumerate(bounds):
+                        if end > start:
+                            pickle.dump((i, chunk.iloc[order[start:end]]), spills[p], pickle.HIGHEST_PROTOCOL)
+                        start = end
+            except Exception as exc:
+                raise ValueError(f"Failed to parse '{name}': {exc}") from exc
+    finally:
+        for f in spills:
+            f.close()
+
+    # Dtypes per file (parse_csv_path concat) and of the merged frame (merge_frame concat)
+    file_samples = [pd.concat(s, ignore_index=True) for s in samples]
+    file_dtypes = [s.dtypes.to_dict() for s in file_samples]
+    merged_sample = pd.concat(
+        [normalize_case(s, label_col, case_strategy) for s in file_samples], ignore_index=True
+    )
+    columns = list(merged_sample.columns)
+    dtypes = merged_sample.dtypes.to_dict()
+
+    # ── 2-3. Merge each partition, append to the output ───────────────────────
+    total_output = duplicates_removed = conflicts_found = 0
+    flag_conflicts = bool(key_column and key_column in columns and label_col and label_col in columns)
+    with open(output, "w", newline="") as out:
+        out.write(merged_sample.iloc[:0].assign(_conflict=False).to_csv(index=False))
+        for path in spill_paths:
+            frames = [
+                normalize_case(sub.astype(file_dtypes[i]), label_col, case_strategy)
+                .reindex(columns=columns).astype(dtypes)
+                for i, sub in _read_spill(path)
+            ]
+            path.unlink()
+            if not frames:
+                continue
+            part = pd.concat(frames, ignore_index=True)
+            del frames
+
+            before = len(part)
+            if dup_strategy in ("first", "last"):
+                part = part.drop_duplicates(keep=dup_strategy)
+            duplicates_removed += before - len(part)
+
+            part["_conflict"] = False
+            if flag_conflicts:
+                nunique = part.groupby(key_column)[label_col].transform("nunique")
+                part["_conflict"] = (nunique > 1).astype(bool)
+                conflicts_found += int(part["_conflict"].sum())
+
+            total_output += len(part)
+            part.to_csv(out, header=False, index=False)
+
+    return {
+        "total_input": total_input,
+        "total_output": total_output,
+        "duplicates_removed": duplicates_removed,
+        "conflicts_found": conflicts_found,
+        "fuzzy_keys_merged": keys_merged,
+    }
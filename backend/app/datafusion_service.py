@@ -1,28 +1,144 @@
+import codecs
+import functools
 import io
-from typing import List, Dict, Any, Optional
+import json
+import shutil
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Dict, Optional, Tuple
 
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
+
+from app.datafusion_fuzzy import fuzzy_options, resolve_keys
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 #  Helpers
 # ──────────────────────────────────────────────────────────────────────────────
 
-def _safe_scalar(v: Any) -> Any:
-    """Convert numpy/pandas scalar types to plain Python for JSON serialisation."""
-    if isinstance(v, (np.integer,)):
-        return int(v)
-    if isinstance(v, (np.floating,)):
-        return None if np.isnan(v) else float(v)
-    if isinstance(v, (np.bool_,)):
-        return bool(v)
-    try:
-        if pd.isna(v):
-            return None
-    except (TypeError, ValueError):
-        pass
-    return v
+def to_records(df: pd.DataFrame) -> List[Dict]:
+    """
+    Same as to_dict(orient="records") with plain Python values for JSON
+    serialisation and NaN/NA → None, converted column by column (tolist)
+    rather than cell by cell.
+    """
+    columns = []
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        columns.append(col.astype(object).where(col.notna(), None).tolist() if col.hasnans else col.tolist())
+    names = list(df.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+CASE_ISSUES_LIMIT = 20
+KEY_CONFLICTS_LIMIT = 50
+
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+_PRESENT = _HASH_MIX                     # mixed into every non-null cell: 0 and 0.0 hash to 0 otherwise
+_TEXT_HASH_KEY = "datafusion-text0"      # 16-byte hash key: strings never share a hash with numbers
+
+
+def _label_categories(labels: pd.Series) -> pd.Series:
+    """
+    Labels as strings, as a categorical (nulls stay null).  str() runs on the
+    distinct values only; values that stringify alike ("1", 1) share a category.
+    """
+    codes, uniques = pd.factorize(labels)
+    str_codes, names = pd.factorize(uniques.astype(str))
+    codes = np.append(str_codes, -1)[codes]       # -1 (null) indexes the appended -1
+    return pd.Series(pd.Categorical.from_codes(codes, names), index=labels.index)
+
+
+def _cased_categories(
+    values: pd.Series,
+    labels: pd.Series,
+    strategy: str,
+    present: Optional[np.ndarray] = None,
+) -> pd.Series:
+    """
+    Same values as normalize_case on the label column, computed on the
+    categories instead of on every row.  Null rows are stringified as
+    normalize_case does ("nan", "None"), except where `present` is False:
+    rows of frames without the label column, which normalize_case leaves null.
+    """
+    codes = labels.cat.codes.to_numpy().copy()
+    names = labels.cat.categories.astype(str)
+    nulls = codes < 0
+    if present is not None:
+        nulls &= present
+    if nulls.any():
+        null_codes, null_names = pd.factorize(values[nulls].astype(str))
+        codes[nulls] = null_codes + len(names)
+        names = names.append(null_names)
+    cased = names.str.lower() if strategy == "lowercase" else names.str.upper()
+    cased_codes, cased_names = pd.factorize(cased)
+    codes = np.append(cased_codes, -1)[codes]         # -1 (null) indexes the appended -1
+    return pd.Series(pd.Categorical.from_codes(codes, cased_names), index=labels.index)
+
+
+def _case_issues(labels: pd.Series) -> List[Dict]:
+    """
+    Labels that differ only by case, in order of first appearance.  labels is
+    a categorical from _label_categories: its categories are the distinct
+    values in order of appearance, so only those are lowered and grouped.
+    """
+    names = pd.Series(labels.cat.categories)
+    lower = names.str.lower()
+    counts = names.groupby(lower, sort=False).nunique()
+    issue_keys = counts.index[counts > 1][:CASE_ISSUES_LIMIT]
+    if not len(issue_keys):
+        return []
+    variants = names[lower.isin(issue_keys)].groupby(lower, sort=False).unique()
+    return [{"lower": k, "variants": sorted(variants[k])} for k in issue_keys]
+
+
+def _key_conflicts(keys: pd.Series, labels: pd.Series, conflict_keys: pd.Index) -> List[Dict]:
+    """Materialise the label sets of the conflicting keys only (keys in groupby order)."""
+    if not len(conflict_keys):
+        return []
+    mask = keys.isin(conflict_keys) & labels.notna()
+    variants = labels[mask].groupby(keys[mask], observed=True).unique()
+    return [{"key": str(key), "labels": sorted(variants[key])} for key in conflict_keys]
+
+
+def cell_hashes(values: pd.Series) -> np.ndarray:
+    """
+    uint64 per cell, equal for values the merge treats as equal across files
+    (1 and 1.0, "a" from an object or a categorical column) and different for
+    values it keeps apart (1 and "1"); 0 for nulls only, so a null and a
+    missing column hash alike but a 0 does not.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+        h = pd.util.hash_pandas_object(values.astype("float64"), index=False).to_numpy() ^ _PRESENT
+        h[values.isna().to_numpy()] = 0
+        return h
+    # Object / categorical: hashed per distinct value, numbers as numbers — a column
+    # concatenated from an int file and a string file holds both 1 and "1"
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    numeric = uniques.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, str)).to_numpy(dtype=bool)
+    hashes = np.empty(len(uniques) + 1, dtype=np.uint64)
+    hashes[:-1][numeric] = pd.util.hash_pandas_object(uniques[numeric].astype("float64"), index=False).to_numpy()
+    hashes[:-1][~numeric] = pd.util.hash_pandas_object(
+        uniques[~numeric].astype(str), index=False, hash_key=_TEXT_HASH_KEY
+    ).to_numpy()
+    hashes ^= _PRESENT
+    hashes[-1] = 0                                      # code -1: null
+    return hashes[codes]
+
+
+def _hash_rows(df: pd.DataFrame) -> np.ndarray:
+    """One uint64 per row, from the cell hashes of every column."""
+    h = np.zeros(len(df), dtype=np.uint64)
+    for i in range(df.shape[1]):
+        h = _combine_hashes(h, cell_hashes(df.iloc[:, i]))
+    return h
+
+
+def _combine_hashes(h_rest: np.ndarray, h_col: np.ndarray) -> np.ndarray:
+    """Row hash of (other columns, one column) from their separate hashes; uint64 arithmetic wraps."""
+    return (h_rest * _HASH_MIX) ^ h_col
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -33,19 +149,265 @@ def parse_files(files: List[Dict]) -> Dict[str, pd.DataFrame]:
     """Parse a list of {name, content} dicts into DataFrames keyed by filename."""
     result: Dict[str, pd.DataFrame] = {}
     for f in files:
-        content = f.get("content", "")
         name = f.get("name", "unknown.csv")
-        try:
-            df = pd.read_csv(io.StringIO(content))
-            result[name] = df
-        except Exception as exc:
-            raise ValueError(f"Failed to parse '{name}': {exc}") from exc
+        result[name] = parse_text(f.get("content", ""), name)
     return result
 
 
+def parse_text(content: str, name: str) -> pd.DataFrame:
+    """Parse one CSV given as text (see read_csv_source)."""
+    data = content.encode("utf-8")
+    return read_csv_source(lambda: io.BytesIO(data), name)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Dtype compaction
+# ──────────────────────────────────────────────────────────────────────────────
+
+CATEGORY_MAX_RATIO = 0.5          # string columns with ≤ 50% distinct values become categorical
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink a parsed frame without changing any value:
+      - integers are downcast to the smallest integer dtype that holds them;
+      - string columns with few distinct values (labels, repeated keys) become
+        categorical, so dedup/groupby work on integer codes.
+    Floats stay float64: a float32 column prints its values with float32
+    precision (0.10000000149011612 → "0.1"), which would change CSV exports.
+    """
+    columns = {}
+    for name in df.columns:
+        col = df[name]
+        kind = col.dtype.kind
+        if kind == "i":
+            col = pd.to_numeric(col, downcast="integer")
+        elif kind == "O" and len(col):
+            if (
+                col.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(col)
+                and pd.api.types.infer_dtype(col, skipna=True) == "string"
+            ):
+                col = col.astype("category")
+        columns[name] = col
+    return pd.DataFrame(columns, index=df.index)
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat(ignore_index=True) that keeps categorical columns categorical:
+    categories are unioned first (pandas falls back to object when they differ)
+    and kept sorted, so a groupby on the column iterates in the same order as
+    on the object column.
+    """
+    frames = list(frames)
+    shared: Dict[str, List] = {}
+    for df in frames:
+        for name in df.columns:
+            shared.setdefault(name, []).append(df[name])
+    for name, cols in shared.items():
+        if len(cols) < 2 or not all(isinstance(c.dtype, pd.CategoricalDtype) for c in cols):
+            continue
+        if all(c.dtype == cols[0].dtype for c in cols):
+            continue
+        categories = union_categoricals(cols, sort_categories=True, ignore_order=True).categories
+        frames = [
+            df.assign(**{name: df[name].cat.set_categories(categories)}) if name in df.columns else df
+            for df in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  CSV parsing
+# ──────────────────────────────────────────────────────────────────────────────
+
+SNIFF_ROWS = 1_000                # rows read to sniff column dtypes
+
+
+@functools.lru_cache(maxsize=1)
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _matches_sniffed(df: pd.DataFrame, sniffed: pd.Series) -> bool:
+    """
+    Whether a pyarrow-parsed frame has the dtypes the C parser would give:
+    same columns, strings stay strings (pyarrow turns ISO dates into
+    datetimes), numbers stay numbers.
+    """
+    if list(df.columns) != list(sniffed.index):
+        return False
+    for col, hint in sniffed.items():
+        kind = df[col].dtype.kind
+        if hint.kind == "O" and kind != "O":
+            return False
+        if hint.kind in "iuf" and kind not in "iuf":
+            return False
+        if hint.kind == "b" and kind not in "bO":
+            return False
+    return True
+
+
+def _c_parser_nulls(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Missing cells of object columns as NaN, as the C parser gives them:
+    pyarrow gives None, which normalize_case would write as "none".
+    """
+    for col in df.columns[(df.dtypes == object).to_numpy()]:
+        if df[col].hasnans:
+            df[col] = df[col].fillna(np.nan)
+    return df
+
+
+def _value_kinds(chunk: pd.DataFrame) -> Dict[str, str]:
+    """"text", "bool" or "number" for each column of a C-parser chunk that has values."""
+    kinds = {}
+    for col in chunk.columns:
+        values = chunk[col]
+        if values.dtype.kind in "iuf":
+            if values.notna().any():
+                kinds[col] = "number"
+        elif values.dtype.kind == "b":
+            kinds[col] = "bool"
+        elif values.notna().any():
+            # The C parser's object columns hold strings, or booleans only
+            boolean = pd.api.types.infer_dtype(values, skipna=True) == "boolean"
+            kinds[col] = "bool" if boolean else "text"
+    return kinds
+
+
+def mixed_columns(chunks) -> List[str]:
+    """
+    Columns that the chunks of one CSV parse as different kinds of values
+    (text in one chunk, numbers or booleans in another).  A whole-file read
+    parses them as text: read with dtype str, every chunk gives those values.
+    """
+    seen: Dict[str, set] = {}
+    for chunk in chunks:
+        for col, kind in _value_kinds(chunk).items():
+            seen.setdefault(col, set()).add(kind)
+    return [col for col, kinds in seen.items() if len(kinds) > 1]
+
+
+def _read_csv_c(open_source, chunksize: Optional[int], dtype: Optional[Dict], encoding: str) -> pd.DataFrame:
+    if chunksize is None:
+        return pd.read_csv(open_source(), dtype=dtype, encoding=encoding)
+    chunks = list(pd.read_csv(open_source(), chunksize=chunksize, dtype=dtype, encoding=encoding))
+    if len(chunks) == 1:
+        return chunks[0]
+    mixed = mixed_columns(chunks)
+    if mixed:
+        dtype = {**(dtype or {}), **{col: str for col in mixed}}
+        chunks = list(pd.read_csv(open_source(), chunksize=chunksize, dtype=dtype, encoding=encoding))
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_csv_source(open_source, name: str, chunksize: Optional[int] = None) -> pd.DataFrame:
+    """
+    Parse one CSV.  open_source() returns a fresh path or binary buffer for each read.
+
+      - a sniffing pass reads the first SNIFF_ROWS rows with the C parser;
+      - with pyarrow installed, the file is parsed by the multithreaded pyarrow
+        engine (missing strings as NaN, not None) and kept if its dtypes agree
+        with the sniffed ones;
+      - otherwise the C parser reads it (in `chunksize`-row chunks if given),
+        with the sniffed float columns passed as dtype hints, and again without
+        hints if a later row does not fit them; columns whose chunks disagree
+        (see mixed_columns) are read again as text;
+      - the frame is shrunk by compact_frame.
+
+    Sources that are not valid UTF-8 are read again as Latin-1 (raw uploads
+    from spreadsheet tools).  Any failure is reported as ValueError naming the file.
+    """
+    try:
+        try:
+            df = _read_csv_encoded(open_source, chunksize, "utf-8")
+        except UnicodeDecodeError:
+            df = _read_csv_encoded(open_source, chunksize, "latin-1")
+    except Exception as exc:
+        raise ValueError(f"Failed to parse '{name}': {exc}") from exc
+    return compact_frame(df)
+
+
+def _read_csv_encoded(open_source, chunksize: Optional[int], encoding: str) -> pd.DataFrame:
+    sniffed = pd.read_csv(open_source(), nrows=SNIFF_ROWS, encoding=encoding).dtypes
+    df = None
+    if _has_pyarrow():
+        try:
+            df = pd.read_csv(open_source(), engine="pyarrow", encoding=encoding)
+        except Exception:
+            df = None               # the C parser decides (and reports the error)
+        if df is not None:
+            df = _c_parser_nulls(df)
+            if not _matches_sniffed(df, sniffed):
+                df = None
+    if df is None:
+        hints = {col: "float64" for col, dtype in sniffed.items() if dtype.kind == "f"}
+        try:
+            df = _read_csv_c(open_source, chunksize, hints or None, encoding)
+        except UnicodeDecodeError:
+            raise                   # a ValueError too: read_csv_source retries as Latin-1
+        except ValueError:
+            if not hints:
+                raise
+            df = _read_csv_c(open_source, chunksize, None, encoding)
+    return df
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Streamed uploads
+# ──────────────────────────────────────────────────────────────────────────────
+
+UPLOAD_BLOCK_BYTES = 1 << 20      # copy uploads to disk 1 MB at a time
+CSV_CHUNK_ROWS = 100_000          # rows per pd.read_csv chunk (C parser)
+
+
+def spool_upload(fileobj: BinaryIO, directory: Path, name: str) -> Path:
+    """Copy an uploaded file object to `directory` in fixed-size blocks; return the path."""
+    directory = Path(directory)
+    path = directory / Path(name).name
+    with open(path, "wb") as out:
+        shutil.copyfileobj(fileobj, out, UPLOAD_BLOCK_BYTES)
+    return path
+
+
+def file_encoding(path: Path) -> str:
+    """
+    "utf-8" if the whole file decodes as UTF-8, else "latin-1" (which decodes
+    any byte).  For readers that cannot restart halfway, like the out-of-core
+    merge; read_csv_source instead retries on the first decode error.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(UPLOAD_BLOCK_BYTES), b""):
+                decoder.decode(block)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "latin-1"
+    return "utf-8"
+
+
+def parse_csv_path(path: Path, name: str, chunksize: int = CSV_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Parse a CSV from disk (see read_csv_source).  The raw text is never held in
+    memory as a whole: the C parser reads it in row chunks.
+    """
+    return read_csv_source(lambda: path, name, chunksize)
+
+
+def parse_paths(paths: Dict[str, Path], chunksize: int = CSV_CHUNK_ROWS) -> Dict[str, pd.DataFrame]:
+    """Parse spooled uploads {filename: path} into DataFrames keyed by filename."""
+    return {name: parse_csv_path(path, name, chunksize) for name, path in paths.items()}
+
+
 def get_file_info(name: str, df: pd.DataFrame) -> Dict:
     """Return metadata (rows, columns, 3-row preview) for a single DataFrame."""
-    preview = df.head(3).fillna("").astype(str).to_dict(orient="records")
+    preview = df.head(3).astype(object).fillna("").astype(str).to_dict(orient="records")
     return {
         "name": name,
         "rows": len(df),
@@ -86,10 +448,16 @@ def apply_mapping(
 
 
 def normalize_case(df: pd.DataFrame, label_col: str, strategy: str) -> pd.DataFrame:
-    """Normalise string case for the label column in-place (copy)."""
+    """
+    Normalise string case for the label column in-place (copy).  A categorical
+    label is normalised on its categories and stays categorical.
+    """
     df = df.copy()
     if label_col and label_col in df.columns and strategy != "keep":
-        if strategy == "lowercase":
+        if isinstance(df[label_col].dtype, pd.CategoricalDtype):
+            if strategy in ("lowercase", "uppercase"):
+                df[label_col] = _cased_categories(df[label_col], df[label_col], strategy)
+        elif strategy == "lowercase":
             df[label_col] = df[label_col].astype(str).str.lower()
         elif strategy == "uppercase":
             df[label_col] = df[label_col].astype(str).str.upper()
@@ -100,72 +468,70 @@ def detect_conflicts(
     dfs: Dict[str, pd.DataFrame],
     key_column: str,
     label_col: str,
+    rules: Optional[Dict] = None,
 ) -> Dict:
     """
-    Detect three categories of issues across the supplied DataFrames:
-      - case_issues      : same label value with different capitalisation
-      - exact_duplicates : fully identical rows
-      - key_conflicts    : same key value mapped to different labels
+    Detect the categories of issues across the supplied DataFrames:
+      - case_issues        : same label value with different capitalisation
+      - exact_duplicates   : fully identical rows
+      - key_conflicts      : same key value mapped to different labels
+      - fuzzy_key_clusters : near-identical key values (only when the rules
+                             enable fuzzyKeyStrategy, see datafusion_fuzzy)
     """
+    # ── Concatenate all frames ────────────────────────────────────────────────
+    combined = concat_frames(dfs.values())
+
     # ── Case issues ───────────────────────────────────────────────────────────
     case_issues: List[Dict] = []
-    all_labels: List[str] = []
-    for df in dfs.values():
-        if label_col and label_col in df.columns:
-            all_labels.extend(df[label_col].dropna().astype(str).tolist())
-
-    lower_map: Dict[str, set] = {}
-    for v in all_labels:
-        lower_map.setdefault(v.lower(), set()).add(v)
-
-    for k, variants in lower_map.items():
-        if len(variants) > 1:
-            case_issues.append({"lower": k, "variants": sorted(variants)})
-
-    # ── Concatenate all frames ────────────────────────────────────────────────
-    combined = pd.concat(list(dfs.values()), ignore_index=True)
+    labels = None
+    if label_col and label_col in combined.columns:
+        labels = _label_categories(combined[label_col])
+        case_issues = _case_issues(labels)
 
     # ── Exact duplicates ──────────────────────────────────────────────────────
     exact_dupes = int(combined.duplicated().sum())
 
     # ── Key conflicts ─────────────────────────────────────────────────────────
     key_conflicts: List[Dict] = []
-    if (
-        key_column and key_column in combined.columns
-        and label_col and label_col in combined.columns
-    ):
-        grouped = (
-            combined.groupby(key_column)[label_col]
-            .apply(lambda x: sorted(set(x.dropna().astype(str).tolist())))
-        )
-        for key, labels in grouped.items():
-            if len(labels) > 1:
-                key_conflicts.append({"key": str(key), "labels": labels})
+    if key_column and key_column in combined.columns and labels is not None:
+        keys = combined[key_column]
+        nunique = labels.groupby(keys, observed=True).nunique()
+        key_conflicts = _key_conflicts(keys, labels, nunique.index[nunique > 1][:KEY_CONFLICTS_LIMIT])
+
+    # ── Fuzzy key clusters ────────────────────────────────────────────────────
+    fuzzy_clusters: List[Dict] = []
+    fuzzy = fuzzy_options(rules or {})
+    if fuzzy and key_column and key_column in combined.columns:
+        _, fuzzy_clusters, _ = resolve_keys(combined[key_column], fuzzy["threshold"], fuzzy["ngram"])
 
     return {
-        "case_issues": case_issues[:20],
+        "case_issues": case_issues,
         "exact_duplicates": exact_dupes,
-        "key_conflicts": key_conflicts[:50],
+        "key_conflicts": key_conflicts,
+        "fuzzy_key_clusters": fuzzy_clusters,
     }
 
 
-def merge_datasets(
+def merge_frame(
     dfs: Dict[str, pd.DataFrame],
     key_column: str,
     label_col: str,
     rules: Dict,
-    dry_run: bool = False,
-) -> Dict:
+) -> Tuple[pd.DataFrame, Dict]:
     """
-    Merge all DataFrames applying the requested rules; return data + stats.
+    Merge all DataFrames applying the requested rules; return (merged frame, stats).
 
     rules:
       caseStrategy      : "lowercase" | "uppercase" | "keep"
       duplicateStrategy : "first" | "last"
       conflictStrategy  : "flag"  (always — adds _conflict column)
+      fuzzyKeyStrategy  : "off" | "report" | "merge" (rewrite near-identical
+                          keys to their cluster's canonical value before dedup)
+      fuzzyThreshold, fuzzyNgram : see datafusion_fuzzy
     """
     case_strategy = rules.get("caseStrategy", "lowercase")
     dup_strategy = rules.get("duplicateStrategy", "first")
+    fuzzy = fuzzy_options(rules)
 
     # ── Normalise case ────────────────────────────────────────────────────────
     normalized = {
@@ -174,9 +540,19 @@ def merge_datasets(
     }
 
     # ── Concatenate ───────────────────────────────────────────────────────────
-    combined = pd.concat(list(normalized.values()), ignore_index=True)
+    combined = concat_frames(normalized.values())
     total_input = len(combined)
 
+    # ── Resolve fuzzy keys ────────────────────────────────────────────────────
+    keys_merged = 0
+    if (
+        fuzzy and fuzzy["strategy"] == "merge"
+        and key_column and key_column in combined.columns and key_column != label_col
+    ):
+        combined[key_column], _, keys_merged = resolve_keys(
+            combined[key_column], fuzzy["threshold"], fuzzy["ngram"]
+        )
+
     # ── Remove exact duplicates ───────────────────────────────────────────────
     before_dedup = len(combined)
     if dup_strategy in ("first", "last"):
@@ -190,7 +566,7 @@ def merge_datasets(
         key_column and key_column in combined.columns
         and label_col and label_col in combined.columns
     ):
-        nunique = combined.groupby(key_column)[label_col].transform("nunique")
+        nunique = combined.groupby(key_column, observed=True)[label_col].transform("nunique")
         combined["_conflict"] = (nunique > 1).astype(bool)
         conflicts_found = int(combined["_conflict"].sum())
 
@@ -199,14 +575,280 @@ def merge_datasets(
         "total_output": len(combined),
         "duplicates_removed": duplicates_removed,
         "conflicts_found": conflicts_found,
+        "fuzzy_keys_merged": keys_merged,
     }
+    return combined, stats
+
+
+def merge_datasets(
+    dfs: Dict[str, pd.DataFrame],
+    key_column: str,
+    label_col: str,
+    rules: Dict,
+    dry_run: bool = False,
+) -> Dict:
+    """Merge all DataFrames (see merge_frame); return data + stats."""
+    combined, stats = merge_frame(dfs, key_column, label_col, rules)
 
     if dry_run:
         return {"stats": stats, "data": None}
 
-    # ── Serialise to records ──────────────────────────────────────────────────
-    records = []
-    for row in combined.to_dict(orient="records"):
-        records.append({k: _safe_scalar(v) for k, v in row.items()})
+    return {"data": to_records(combined), "stats": stats}
+
+
+def analyze_merge(
+    dfs: Dict[str, pd.DataFrame],
+    key_column: str,
+    label_col: str,
+    rules: Dict,
+) -> Dict:
+    """
+    Dry-run in a single pass: the same {conflicts, stats} as detect_conflicts
+    followed by merge_datasets(dry_run=True), without their second concat,
+    the normalised copy of every frame and the repeated duplicate/groupby scans.
+
+      - frames are concatenated once; case normalisation touches only the label
+        column, fuzzy key resolution only the key column
+      - rows are hashed once per column: the label and key columns are hashed
+        raw and normalised and combined with the hash of the other columns,
+        which gives both the exact-duplicate count and the dedup mask of the merge
+      - one groupby on the key computes the raw label conflicts (report) and the
+        normalised ones on the deduplicated rows (stats); a second one is needed
+        only when fuzzy resolution rewrites keys
+    """
+    case_strategy = rules.get("caseStrategy", "lowercase")
+    dup_strategy = rules.get("duplicateStrategy", "first")
+    fuzzy = fuzzy_options(rules)
+
+    frames = list(dfs.values())
+    combined = concat_frames(frames)
+    total_input = len(combined)
+    has_label = bool(label_col) and label_col in combined.columns
+    has_key = bool(key_column) and key_column in combined.columns
+
+    # ── Normalised label and key columns ─────────────────────────────────────
+    normalised: Dict[str, Tuple[pd.Series, pd.Series]] = {}
+    case_issues: List[Dict] = []
+    if has_label:
+        labels = combined[label_col]
+        raw_labels = _label_categories(labels)
+        if case_strategy in ("lowercase", "uppercase"):
+            # merge_frame normalises per frame: rows of frames without the label stay null
+            present = np.repeat([label_col in df.columns for df in frames], [len(df) for df in frames])
+            norm_labels = _cased_categories(labels, raw_labels, case_strategy, present)
+        else:
+            norm_labels = labels
+        normalised[label_col] = (labels, norm_labels)
+        case_issues = _case_issues(raw_labels)
+
+    fuzzy_clusters: List[Dict] = []
+    keys_merged = 0
+    if has_key:
+        keys = norm_keys = combined[key_column]
+        if fuzzy:
+            resolved, fuzzy_clusters, rewritten = resolve_keys(keys, fuzzy["threshold"], fuzzy["ngram"])
+            if fuzzy["strategy"] == "merge" and key_column != label_col:
+                norm_keys, keys_merged = resolved, rewritten
+                normalised[key_column] = (keys, norm_keys)
+
+    # ── Row hashes: raw (exact duplicates) and normalised (merge dedup) ──────
+    h_raw = h_norm = _hash_rows(combined.drop(columns=list(normalised)))
+    for raw, norm in normalised.values():
+        h_col = cell_hashes(raw)
+        h_raw, h_norm = (
+            _combine_hashes(h_raw, h_col),
+            _combine_hashes(h_norm, h_col if norm is raw else cell_hashes(norm)),
+        )
+
+    exact_dupes = int(pd.Series(h_raw).duplicated().sum())
+    if dup_strategy in ("first", "last"):
+        dropped = pd.Series(h_norm).duplicated(keep=dup_strategy).to_numpy()
+    else:
+        dropped = np.zeros(total_input, dtype=bool)
+    duplicates_removed = int(dropped.sum())
+
+    # ── Key conflicts: one groupby for the report and for the merge stats ────
+    key_conflicts: List[Dict] = []
+    conflicts_found = 0
+    if has_key and has_label:
+        labels_by_row = pd.DataFrame({
+            "raw": raw_labels,
+            "norm": norm_labels.where(~dropped),
+            "kept": ~dropped,
+        })
+        if norm_keys is keys:
+            groups = labels_by_row.groupby(keys, observed=True).agg(
+                raw=("raw", "nunique"), norm=("norm", "nunique"), kept=("kept", "sum")
+            )
+            raw_nunique = groups["raw"]
+        else:
+            raw_nunique = labels_by_row["raw"].groupby(keys, observed=True).nunique()
+            groups = labels_by_row.groupby(norm_keys, observed=True).agg(
+                norm=("norm", "nunique"), kept=("kept", "sum")
+            )
+
+        conflicts_found = int(groups.loc[groups["norm"] > 1, "kept"].sum())
+        key_conflicts = _key_conflicts(keys, raw_labels, raw_nunique.index[raw_nunique > 1][:KEY_CONFLICTS_LIMIT])
+
+    return {
+        "conflicts": {
+            "case_issues": case_issues,
+            "exact_duplicates": exact_dupes,
+            "key_conflicts": key_conflicts,
+            "fuzzy_key_clusters": fuzzy_clusters,
+        },
+        "stats": {
+            "total_input": total_input,
+            "total_output": total_input - duplicates_removed,
+            "duplicates_removed": duplicates_removed,
+            "conflicts_found": conflicts_found,
+            "fuzzy_keys_merged": keys_merged,
+        },
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Merged-data export
+# ──────────────────────────────────────────────────────────────────────────────
+
+EXPORT_CHUNK_ROWS = 50_000
+PREVIEW_MAX_ROWS = 1_000
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def preview_page(df: pd.DataFrame, offset: int = 0, limit: int = 50) -> Dict:
+    """One page of the merged frame as JSON records."""
+    offset = max(int(offset), 0)
+    limit = min(max(int(limit), 0), PREVIEW_MAX_ROWS)
+    return {
+        "columns": [str(c) for c in df.columns],
+        "data": to_records(df.iloc[offset:offset + limit]),
+        "offset": offset,
+        "limit": limit,
+        "total": len(df),
+    }
+
+
+def iter_export(df: pd.DataFrame, fmt: str, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Encode the merged frame chunk by chunk: only one chunk's encoded bytes
+    exist at a time.  Raises ValueError for an unknown format and
+    RuntimeError if parquet is requested without pyarrow (before any byte is produced).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' (expected one of {', '.join(EXPORT_FORMATS)})")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow")
+        return _iter_parquet(df, chunk_rows)
+    if fmt == "csv":
+        return _iter_csv(df, chunk_rows)
+    return _iter_ndjson(df, chunk_rows)
+
+
+def _chunks(df: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _iter_csv(df: pd.DataFrame, chunk_rows: int) -> Iterator[bytes]:
+    yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+    for chunk in _chunks(df, chunk_rows):
+        yield chunk.to_csv(index=False, header=False).encode("utf-8")
 
-    return {"data": records, "stats": stats}
+
+def _iter_ndjson(df: pd.DataFrame, chunk_rows: int) -> Iterator[bytes]:
+    for chunk in _chunks(df, chunk_rows):
+        lines = map(functools.partial(json.dumps, default=str), to_records(chunk))
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ByteSink:
+    """Write-only file object that hands what was written since the last drain() to the caller."""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def _parquet_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Object and categorical columns that hold several Python types (1 and "1"
+    from files parsed differently) as strings: an Arrow column has one type.
+    Nulls stay null.
+    """
+    mixed = {}
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        values = col.cat.categories if isinstance(col.dtype, pd.CategoricalDtype) else col
+        if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ("mixed", "mixed-integer"):
+            mixed[i] = col.astype(str).where(col.notna(), None)
+    if not mixed:
+        return df
+    df = df.copy(deep=False)
+    for i, col in mixed.items():
+        df.isetitem(i, col)
+    return df
+
+
+def _iter_parquet(df: pd.DataFrame, chunk_rows: int) -> Iterator[bytes]:
+    """
+    One row group per chunk; the footer is written after the last one.  The
+    schema and the first row group are built before the iterator is returned,
+    so a frame Arrow cannot convert raises ValueError before any byte is sent.
+    """
+    import pyarrow as pa
+
+    df = _parquet_ready(df)
+    chunks = _chunks(df, chunk_rows)
+    try:
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        first = next(chunks, None)
+        if first is not None:
+            first = pa.Table.from_pandas(first, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as exc:
+        raise ValueError(f"Cannot export as parquet: {exc}") from exc
+    return _write_parquet(schema, first, chunks)
+
+
+def _write_parquet(schema, first, chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ByteSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        if first is not None:
+            writer.write_table(first)
+            yield sink.drain()
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,220 @@
+"""
+DataFusion sessions — parse once, reuse across info → mapping → dry-run → merge.
+
+Files are uploaded and parsed once into a session.  Later steps refer to
+the session id and reuse what is still valid:
+
+  - per-file mapped frames are cached by that file's mapping, so editing
+    the mapping of one file re-maps only that file;
+  - the dry-run analysis (analyze_merge, one pass for conflicts and stats)
+    is cached by (mappings, files, key column, label column, rules);
+  - the merged frame is cached by the same signature, so preview pages and
+    exports of one merge do not re-run it.
+
+Sessions expire after DATAFUSION_SESSION_TTL seconds without access (default
+30 min).  The parsed frames of all sessions are capped at
+DATAFUSION_SESSION_MAX_MB (default 1024): least-recently-used sessions are
+evicted first.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.datafusion_service import analyze_merge, apply_mapping, get_file_info, merge_frame, preview_page, to_records
+
+SESSION_TTL = float(os.environ.get("DATAFUSION_SESSION_TTL", 1800))
+SESSION_MAX_BYTES = int(float(os.environ.get("DATAFUSION_SESSION_MAX_MB", 1024)) * 1024 * 1024)
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _signature(value) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class FusionSession:
+    """Parsed files of one DataFusion workflow plus the derived results that are still valid."""
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._mapped: Dict[str, Tuple[str, pd.DataFrame]] = {}     # file → (mapping signature, frame)
+        self._analysis: Optional[Tuple[str, Dict]] = None           # (signature, dry-run result)
+        self._merged: Optional[Tuple[str, pd.DataFrame, Dict]] = None  # (signature, frame, stats)
+        self.size_bytes = 0
+        self.lock = threading.RLock()
+
+    def _recompute_size(self):
+        size = sum(_frame_bytes(df) for df in self.frames.values())
+        size += sum(_frame_bytes(df) for _, df in self._mapped.values())
+        if self._merged is not None:
+            size += _frame_bytes(self._merged[1])
+        self.size_bytes = size
+
+    def add_frames(self, dfs: Dict[str, pd.DataFrame]):
+        with self.lock:
+            for name, df in dfs.items():
+                self.frames[name] = df
+                self._mapped.pop(name, None)
+            self._analysis = None
+            self._merged = None
+            self._recompute_size()
+
+    def remove_file(self, name: str):
+        with self.lock:
+            if name not in self.frames:
+                raise ValueError(f"File '{name}' not in session")
+            del self.frames[name]
+            self._mapped.pop(name, None)
+            self._analysis = None
+            self._merged = None
+            self._recompute_size()
+
+    def infos(self):
+        with self.lock:
+            return [get_file_info(name, df) for name, df in self.frames.items()]
+
+    def mapped_frames(self, column_mapping: Dict, key_column: str) -> Dict[str, pd.DataFrame]:
+        """apply_mapping per file, redone only for files whose mapping changed."""
+        with self.lock:
+            result: Dict[str, pd.DataFrame] = {}
+            for name, df in self.frames.items():
+                mapping = column_mapping.get(name)
+                if not mapping:
+                    self._mapped.pop(name, None)
+                    result[name] = df
+                    continue
+                sig = _signature(mapping)
+                cached = self._mapped.get(name)
+                if cached is None or cached[0] != sig:
+                    cached = (sig, apply_mapping({name: df}, {name: mapping}, key_column)[name])
+                    self._mapped[name] = cached
+                result[name] = cached[1]
+            self._recompute_size()
+            return result
+
+    def _options(self, options: Dict):
+        column_mapping = options.get("column_mapping", {}) or {}
+        key_column = options.get("key_column", "")
+        label_col = options.get("label_col", "")
+        rules = options.get("rules", {})
+        dfs = self.mapped_frames(column_mapping, key_column)
+        if not dfs:
+            raise ValueError("Session has no files")
+        sig = _signature([column_mapping.get(name) for name in self.frames] + [list(self.frames), key_column, label_col, rules])
+        return dfs, key_column, label_col, rules, sig
+
+    def merged(self, options: Dict) -> Tuple[pd.DataFrame, Dict]:
+        """(merged frame, stats), cached until files, mapping or rules change."""
+        with self.lock:
+            dfs, key_column, label_col, rules, sig = self._options(options)
+            if self._merged is None or self._merged[0] != sig:
+                self._merged = None                      # release the old frame first
+                self._merged = (sig, *merge_frame(dfs, key_column, label_col, rules))
+                self._recompute_size()
+            return self._merged[1], self._merged[2]
+
+    def merge(self, options: Dict) -> Dict:
+        """Same contract as POST /datafusion/merge, on the session's frames."""
+        with self.lock:
+            if not options.get("dry_run", False):
+                frame, stats = self.merged(options)
+                return {"data": to_records(frame), "stats": stats}
+
+            dfs, key_column, label_col, rules, sig = self._options(options)
+            if self._analysis is None or self._analysis[0] != sig:
+                self._analysis = (sig, analyze_merge(dfs, key_column, label_col, rules))
+            return self._analysis[1]
+
+    def preview(self, options: Dict) -> Dict:
+        """Stats plus one page (options "offset", "limit") of the merged frame."""
+        frame, stats = self.merged(options)
+        return {"stats": stats, **preview_page(frame, options.get("offset", 0), options.get("limit", 50))}
+
+
+class SessionStore:
+    """Session registry with idle TTL and a global memory cap (LRU eviction)."""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_bytes: int = SESSION_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, FusionSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, dfs: Dict[str, pd.DataFrame]) -> FusionSession:
+        session = FusionSession(uuid.uuid4().hex)
+        session.add_frames(dfs)
+        self._check_size(session)
+        with self._lock:
+            self._sessions[session.id] = session
+        self._evict(keep=session.id)
+        return session
+
+    def get(self, session_id: str) -> FusionSession:
+        """Return a live session and mark it as recently used. Raises ValueError if unknown or expired."""
+        self._evict()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise ValueError(f"Session {session_id} not found or expired")
+            session.last_access = time.time()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def add_files(self, session_id: str, dfs: Dict[str, pd.DataFrame]) -> FusionSession:
+        session = self.get(session_id)
+        session.add_frames(dfs)
+        self._check_size(session)
+        self._evict(keep=session.id)
+        return session
+
+    def touch(self, session: FusionSession):
+        """Re-run eviction after an operation that may have grown the session (mapped frames)."""
+        self._evict(keep=session.id)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                raise ValueError(f"Session {session_id} not found or expired")
+
+    def _check_size(self, session: FusionSession):
+        if session.size_bytes > self.max_bytes:
+            with self._lock:
+                self._sessions.pop(session.id, None)
+            raise ValueError(
+                f"Session data ({session.size_bytes / 2**20:.0f} MB) exceeds the "
+                f"{self.max_bytes / 2**20:.0f} MB session memory cap"
+            )
+
+    def _evict(self, keep: Optional[str] = None):
+        """Drop expired sessions, then least-recently-used ones until the memory cap holds."""
+        now = time.time()
+        with self._lock:
+            for sid in [sid for sid, s in self._sessions.items() if now - s.last_access > self.ttl and sid != keep]:
+                del self._sessions[sid]
+            total = sum(s.size_bytes for s in self._sessions.values())
+            for sid in list(self._sessions):
+                if total <= self.max_bytes:
+                    break
+                if sid == keep:
+                    continue
+                total -= self._sessions.pop(sid).size_bytes
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": sum(s.size_bytes for s in self._sessions.values()),
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+            }
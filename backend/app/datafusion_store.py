@@ -0,0 +1,383 @@
+"""
+Persistent DataFusion datasets with incremental append.
+
+A dataset is a merged result kept on disk — one SQLite database per dataset
+under DATAFUSION_STORE_DIR (default "fusion_datasets") — together with the
+key column, label column and rules it was created with.  Appending files
+merges only the incoming rows:
+
+  - row-hash index — every stored row keeps a 64-bit hash of its values after
+    mapping and case normalisation (numbers hash as float64, other values by
+    their string form; a null and a missing column hash alike, so a file may
+    bring new columns).  Incoming rows are deduplicated among themselves and
+    looked up in the index; a hash match counts only if the stored row has
+    the same values, so a 64-bit collision never drops a distinct row.  With
+    duplicateStrategy "first" the matches are dropped, with "last" the
+    stored row is replaced by the incoming one;
+  - key index — every stored row keeps the hash of its key and of its label;
+    conflict flags are recomputed, and updated in place, only for the keys
+    the appended or replaced rows carry;
+  - stats — total_input / total_output / duplicates_removed / conflicts_found
+    are updated from those counts.
+
+An append costs index lookups for the incoming rows plus the rows of the
+keys they touch, not a re-merge of the history.  Rows, order, values,
+_conflict flags and stats are those merge_frame gives on all the files
+merged at once.
+
+Rules are fixed when the dataset is created.  fuzzyKeyStrategy "merge" is
+not supported: a new key can change the canonical key of stored rows.
+"""
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.datafusion_fuzzy import fuzzy_options
+from app.datafusion_service import (
+    PREVIEW_MAX_ROWS,
+    apply_mapping,
+    cell_hashes,
+    concat_frames,
+    normalize_case,
+    to_records,
+)
+
+STORE_DIR = Path(os.environ.get("DATAFUSION_STORE_DIR", "fusion_datasets"))
+
+CACHE_KIB = 64 * 1024             # SQLite page cache per connection
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_SELECT_ROWS = "SELECT data, conflict FROM rows ORDER BY id"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Hashing
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _column_weight(name) -> np.uint64:
+    h = pd.util.hash_array(np.array([str(name)], dtype=object))[0]
+    return np.uint64(h | np.uint64(1))
+
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Weighted sum of the cell hashes: independent of column order, nulls add nothing."""
+    h = np.zeros(len(df), dtype=np.uint64)
+    for name in df.columns:
+        h += cell_hashes(df[name]) * _column_weight(name)
+    return h
+
+
+def _row_values(record: Dict) -> Dict:
+    """
+    A row's non-null values compared the way its hash is built: numbers as
+    float, other values by their string form (as stored by json.dumps(default=str)).
+    """
+    return {
+        str(k): float(v) if isinstance(v, (int, float)) else str(v)
+        for k, v in record.items() if v is not None
+    }
+
+
+def _sql_hashes(h: np.ndarray, null: Optional[np.ndarray] = None) -> List[Optional[int]]:
+    """uint64 hashes as SQLite INTEGERs (signed 64-bit); None where null."""
+    values = h.view(np.int64).tolist()
+    if null is not None:
+        for i in np.flatnonzero(null):
+            values[i] = None
+    return values
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+#  Store
+# ──────────────────────────────────────────────────────────────────────────────
+
+class DatasetStore:
+    """Persistent merged datasets: create from files, append deltas, read back."""
+
+    def __init__(self, root: Path = STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    # ── Files and connections ────────────────────────────────────────────────
+
+    def _path(self, name: str) -> Path:
+        if not _NAME_RE.match(name or ""):
+            raise ValueError("Dataset names are 1-64 characters: letters, digits, '_' and '-'")
+        return self.root / name / "dataset.sqlite3"
+
+    def _connect(self, name: str, must_exist: bool = True) -> sqlite3.Connection:
+        path = self._path(name)
+        if must_exist and not path.exists():
+            raise ValueError(f"Dataset '{name}' not found")
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")              # safe under WAL
+        conn.execute(f"PRAGMA cache_size=-{CACHE_KIB}")         # hash indexes are written at random
+        return conn
+
+    def _lock(self, name: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection) -> Dict:
+        return {k: json.loads(v) for k, v in conn.execute("SELECT k, v FROM meta")}
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, **values):
+        conn.executemany(
+            "INSERT INTO meta (k, v) VALUES (?, ?) ON CONFLICT(k) DO UPDATE SET v = excluded.v",
+            [(k, json.dumps(v)) for k, v in values.items()],
+        )
+
+    # ── Datasets ─────────────────────────────────────────────────────────────
+
+    def create(self, name: str, dfs: Dict[str, pd.DataFrame], options: Dict) -> Dict:
+        """
+        New dataset from parsed files {filename: df}.
+        options: {column_mapping, key_column, label_col, rules} as /datafusion/merge.
+        """
+        rules = options.get("rules", {}) or {}
+        fuzzy = fuzzy_options(rules)
+        if fuzzy and fuzzy["strategy"] == "merge":
+            raise ValueError("fuzzyKeyStrategy 'merge' is not supported for persisted datasets")
+        path = self._path(name)
+        with self._lock(name):
+            if path.exists():
+                raise ValueError(f"Dataset '{name}' already exists")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                with self._connect(name, must_exist=False) as conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("CREATE TABLE meta (k TEXT PRIMARY KEY, v TEXT NOT NULL)")
+                    conn.execute("""
+                        CREATE TABLE rows (
+                            id         INTEGER PRIMARY KEY,   -- output order
+                            row_hash   INTEGER NOT NULL,
+                            key_hash   INTEGER,
+                            label_hash INTEGER,
+                            conflict   INTEGER NOT NULL DEFAULT 0,
+                            data       TEXT NOT NULL          -- JSON {column: value}, non-null values only
+                        )
+                    """)
+                    conn.execute("CREATE INDEX idx_rows_hash ON rows (row_hash)")
+                    conn.execute("CREATE INDEX idx_rows_key ON rows (key_hash)")
+                    conn.execute("""
+                        CREATE TABLE files (
+                            id          INTEGER PRIMARY KEY,
+                            name        TEXT NOT NULL,
+                            rows        INTEGER NOT NULL,
+                            appended_at REAL NOT NULL
+                        )
+                    """)
+                    self._set_meta(
+                        conn,
+                        key_column=options.get("key_column", "") or "",
+                        label_col=options.get("label_col", "") or "",
+                        rules=rules,
+                        columns=[],
+                        stats={"total_input": 0, "total_output": 0, "duplicates_removed": 0, "conflicts_found": 0},
+                        created_at=time.time(),
+                    )
+                result = self._append(name, dfs, options.get("column_mapping", {}) or {})
+            except BaseException:
+                shutil.rmtree(path.parent, ignore_errors=True)
+                raise
+        return result
+
+    def append(self, name: str, dfs: Dict[str, pd.DataFrame], column_mapping: Optional[Dict] = None) -> Dict:
+        """Merge parsed files {filename: df} into the dataset; return its info plus what the append did."""
+        with self._lock(name):
+            return self._append(name, dfs, column_mapping or {})
+
+    def _append(self, name: str, dfs: Dict[str, pd.DataFrame], column_mapping: Dict) -> Dict:
+        with self._connect(name) as conn:
+            meta = self._meta(conn)
+            key_column, label_col, rules = meta["key_column"], meta["label_col"], meta["rules"]
+            case_strategy = rules.get("caseStrategy", "lowercase")
+            dup_strategy = rules.get("duplicateStrategy", "first")
+            stats = meta["stats"]
+
+            # ── Incoming rows, mapped and normalised as merge_frame does ─────
+            dfs = apply_mapping(dfs, column_mapping, key_column)
+            frames = [normalize_case(df, label_col, case_strategy) for df in dfs.values()]
+            delta = concat_frames(frames) if frames else pd.DataFrame()
+            columns = meta["columns"] + [str(c) for c in delta.columns if str(c) not in meta["columns"]]
+
+            row_hash = _row_hashes(delta)
+            keep = np.ones(len(delta), dtype=bool)
+            if dup_strategy in ("first", "last"):
+                keep = ~delta.duplicated(keep=dup_strategy).to_numpy()
+
+            # ── Row-hash index: stored duplicates of the incoming rows ───────
+            conn.execute("CREATE TEMP TABLE incoming (row_hash INTEGER PRIMARY KEY)")
+            conn.execute("CREATE TEMP TABLE affected (key_hash INTEGER PRIMARY KEY)")
+            replaced_ids: List[int] = []
+            if dup_strategy in ("first", "last"):
+                conn.executemany("INSERT OR IGNORE INTO incoming VALUES (?)", ((h,) for h in _sql_hashes(row_hash[keep])))
+                stored: Dict[int, List[Tuple[int, Optional[int], Dict]]] = {}
+                for row_id, h, key_h, data in conn.execute(
+                    "SELECT r.id, r.row_hash, r.key_hash, r.data FROM rows r JOIN incoming i ON r.row_hash = i.row_hash"
+                ):
+                    stored.setdefault(h, []).append((row_id, key_h, _row_values(json.loads(data))))
+
+                # Hash matches, confirmed on the values of the rows involved only
+                signed = row_hash.view(np.int64)
+                candidates = np.flatnonzero(keep & np.isin(signed, list(stored)))
+                for i, record in zip(candidates, to_records(delta.iloc[candidates])):
+                    values = _row_values(record)
+                    same = [(row_id, key_h) for row_id, key_h, v in stored[int(signed[i])] if v == values]
+                    if not same:
+                        continue                    # hash collision: a different row
+                    if dup_strategy == "first":
+                        keep[i] = False
+                    else:
+                        replaced_ids += [row_id for row_id, _ in same]
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO affected VALUES (?)", ((k,) for _, k in same if k is not None)
+                        )
+
+            # ── Key index: keys whose conflict flags may change ──────────────
+            added = delta[keep]
+            key_hash = label_hash = None
+            if key_column and key_column in added.columns:
+                keys = added[key_column]
+                key_hash = _sql_hashes(cell_hashes(keys), keys.isna().to_numpy())
+                conn.executemany("INSERT OR IGNORE INTO affected VALUES (?)", ((h,) for h in key_hash if h is not None))
+            if label_col and label_col in added.columns:
+                labels = added[label_col]
+                label_hash = _sql_hashes(cell_hashes(labels), labels.isna().to_numpy())
+            flagged_before = conn.execute(
+                "SELECT COUNT(*) FROM rows WHERE conflict = 1 AND key_hash IN (SELECT key_hash FROM affected)"
+            ).fetchone()[0]
+
+            # ── Replace / insert ─────────────────────────────────────────────
+            conn.executemany("DELETE FROM rows WHERE id = ?", ((i,) for i in replaced_ids))
+            hashes = _sql_hashes(row_hash[keep])
+            n_added = len(added)
+            conn.executemany(
+                "INSERT INTO rows (row_hash, key_hash, label_hash, data) VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        hashes[i],
+                        key_hash[i] if key_hash is not None else None,
+                        label_hash[i] if label_hash is not None else None,
+                        json.dumps({k: v for k, v in record.items() if v is not None}, default=str),
+                    )
+                    for i, record in zip(range(n_added), to_records(added))
+                ),
+            )
+
+            # ── Conflict flags of the affected keys, updated in place ────────
+            conn.execute("CREATE TEMP TABLE key_flags (key_hash INTEGER PRIMARY KEY, conflict INTEGER NOT NULL)")
+            conn.execute("""
+                INSERT INTO key_flags
+                SELECT key_hash, COUNT(DISTINCT label_hash) > 1
+                FROM rows WHERE key_hash IN (SELECT key_hash FROM affected) GROUP BY key_hash
+            """)
+            conn.execute("""
+                UPDATE rows SET conflict = (SELECT conflict FROM key_flags k WHERE k.key_hash = rows.key_hash)
+                WHERE key_hash IN (SELECT key_hash FROM key_flags)
+                  AND conflict != (SELECT conflict FROM key_flags k WHERE k.key_hash = rows.key_hash)
+            """)
+            flagged_after = conn.execute(
+                "SELECT COUNT(*) FROM rows WHERE conflict = 1 AND key_hash IN (SELECT key_hash FROM affected)"
+            ).fetchone()[0]
+            keys_touched = conn.execute("SELECT COUNT(*) FROM affected").fetchone()[0]
+            for table in ("incoming", "affected", "key_flags"):
+                conn.execute(f"DROP TABLE temp.{table}")
+
+            # ── Stats ────────────────────────────────────────────────────────
+            stats["total_input"] += len(delta)
+            stats["total_output"] += n_added - len(replaced_ids)
+            stats["duplicates_removed"] = stats["total_input"] - stats["total_output"]
+            stats["conflicts_found"] += flagged_after - flagged_before
+            self._set_meta(conn, columns=columns, stats=stats)
+            now = time.time()
+            conn.executemany(
+                "INSERT INTO files (name, rows, appended_at) VALUES (?, ?, ?)",
+                [(fname, len(df), now) for fname, df in dfs.items()],
+            )
+
+        return {
+            **self.info(name),
+            "append": {
+                "input_rows": len(delta),
+                "inserted": n_added,
+                "replaced": len(replaced_ids),
+                "duplicates": len(delta) - n_added,
+                "keys_touched": keys_touched,
+            },
+        }
+
+    def info(self, name: str) -> Dict:
+        with self._connect(name) as conn:
+            meta = self._meta(conn)
+            files = conn.execute("SELECT name, rows, appended_at FROM files ORDER BY id").fetchall()
+        return {
+            "name": name,
+            "key_column": meta["key_column"],
+            "label_col": meta["label_col"],
+            "rules": meta["rules"],
+            "columns": meta["columns"],
+            "stats": meta["stats"],
+            "files": [{"name": f, "rows": n, "appended_at": t} for f, n, t in files],
+        }
+
+    def list(self) -> List[Dict]:
+        return [
+            self.info(path.parent.name)
+            for path in sorted(self.root.glob("*/dataset.sqlite3"))
+            if _NAME_RE.match(path.parent.name)
+        ]
+
+    def delete(self, name: str):
+        path = self._path(name)
+        with self._lock(name):
+            if not path.exists():
+                raise ValueError(f"Dataset '{name}' not found")
+            shutil.rmtree(path.parent)
+
+    # ── Reading ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _frame(rows: List, columns: List[str]) -> pd.DataFrame:
+        df = pd.DataFrame.from_records([json.loads(data) for data, _ in rows], columns=columns)
+        df["_conflict"] = np.array([bool(c) for _, c in rows], dtype=bool)
+        return df
+
+    def frame(self, name: str) -> Tuple[pd.DataFrame, Dict]:
+        """(merged dataset with its _conflict column, in merge order; stats)."""
+        with self._connect(name) as conn:
+            conn.execute("BEGIN")               # meta and rows from the same snapshot
+            meta = self._meta(conn)
+            rows = conn.execute(_SELECT_ROWS).fetchall()
+        return self._frame(rows, meta["columns"]), meta["stats"]
+
+    def page(self, name: str, offset: int = 0, limit: int = 50) -> Dict:
+        """Same shape as preview_page, read with LIMIT/OFFSET instead of loading the dataset."""
+        offset = max(int(offset), 0)
+        limit = min(max(int(limit), 0), PREVIEW_MAX_ROWS)
+        with self._connect(name) as conn:
+            conn.execute("BEGIN")
+            meta = self._meta(conn)
+            rows = conn.execute(f"{_SELECT_ROWS} LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+        df = self._frame(rows, meta["columns"])
+        return {
+            "stats": meta["stats"],
+            "columns": [str(c) for c in df.columns],
+            "data": to_records(df),
+            "offset": offset,
+            "limit": limit,
+            "total": meta["stats"]["total_output"],
+        }
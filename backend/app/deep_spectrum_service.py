@@ -11,6 +11,8 @@ import threading
 from pathlib import Path
 from typing import Any, List, Dict, Optional
 
+from app.instrumentation import span, timed
+
 # matchms emits a lot of WARNING-level noise (missing precursor_mz, etc.)
 # that is expected for bulk public databases — suppress below ERROR.
 logging.getLogger("matchms").setLevel(logging.ERROR)
@@ -33,6 +35,7 @@ _extra_library_cache: Dict[str, List[Dict]] = {}
 #  Parsers
 # ──────────────────────────────────────────────────────────────
 
+@timed("mgf_parse")
 def _parse_mgf(path: Optional[Path] = None) -> List[Dict]:
     """Parse an MGF file and return a list of spectrum dicts."""
     spectra: List[Dict] = []
@@ -241,6 +244,13 @@ def _spectrum_to_embedding(spectrum: Dict, intensity_power: float = 0.5) -> "np.
     return vec
 
 
+def _embedding_matrix(spectra: List[Dict]) -> "np.ndarray":
+    """Embeddings of a list of spectra as rows of a matrix, timed as one "embedding" span."""
+    import numpy as np
+
+    with span("embedding"):
+        return np.array([_spectrum_to_embedding(sp) for sp in spectra])
+
 
 _pca_model_cache = None
 _extra_pca_cache: Dict[str, Any] = {}
@@ -258,7 +268,7 @@ def _get_pca(lib_id: Optional[str] = None):
             return _extra_pca_cache[lib_id]
         if lib_id not in _extra_spectra_cache:
             _extra_spectra_cache[lib_id] = _parse_mgf(DATASETS_DIR / f"{lib_id}.mgf")
-        matrix = np.array([_spectrum_to_embedding(sp) for sp in _extra_spectra_cache[lib_id]])
+        matrix = _embedding_matrix(_extra_spectra_cache[lib_id])
         pca = PCA(n_components=3, random_state=42)
         pca.fit(matrix)
         _extra_pca_cache[lib_id] = pca
@@ -268,7 +278,7 @@ def _get_pca(lib_id: Optional[str] = None):
         return _pca_model_cache
     if _spectra_cache is None:
         _spectra_cache = _parse_mgf()
-    matrix = np.array([_spectrum_to_embedding(sp) for sp in _spectra_cache])
+    matrix = _embedding_matrix(_spectra_cache)
     pca = PCA(n_components=3, random_state=42)
     pca.fit(matrix)
     _pca_model_cache = pca
@@ -314,7 +324,7 @@ def get_embeddings_3d(lib_id: Optional[str] = None) -> List[Dict]:
         spectra = _extra_spectra_cache[lib_id]
         library = get_library(lib_id)
         pca     = _get_pca(lib_id)
-        matrix  = np.array([_spectrum_to_embedding(sp) for sp in spectra])
+        matrix  = _embedding_matrix(spectra)
         coords  = pca.transform(matrix)
         result  = [{"id": i, "name": mol["name"], "formula": mol["formula"],
                     "tox_score": mol["tox_score"],
@@ -328,7 +338,7 @@ def get_embeddings_3d(lib_id: Optional[str] = None) -> List[Dict]:
     if _spectra_cache is None:
         _spectra_cache = _parse_mgf()
     pca    = _get_pca()
-    matrix = np.array([_spectrum_to_embedding(sp) for sp in _spectra_cache])
+    matrix = _embedding_matrix(_spectra_cache)
     coords = pca.transform(matrix)
     library = get_library()
     result: List[Dict] = []
@@ -362,9 +372,7 @@ def get_all_embeddings() -> List[Dict]:
 
     library = get_library()
     result = []
-    for i, (sp, mol) in enumerate(zip(_spectra_cache, library)):
-        import numpy as np
-        vec = _spectrum_to_embedding(sp)
+    for i, (vec, mol) in enumerate(zip(_embedding_matrix(_spectra_cache), library)):
         result.append({
             "id":        i,
             "name":      mol["name"],
@@ -456,47 +464,48 @@ def spectral_match(query_peaks: List[Dict], precursor_mz: float,
     scorer  = ModifiedCosine(tolerance=tolerance)
     results = []
 
-    for i, (spectrum, mol) in enumerate(zip(spectra, library)):
-        lib_peaks = spectrum["peaks"]
-        if not lib_peaks:
-            continue
+    with span("scoring"):
+        for i, (spectrum, mol) in enumerate(zip(spectra, library)):
+            lib_peaks = spectrum["peaks"]
+            if not lib_peaks:
+                continue
 
-        l_mz  = np.array([p["mz"]       for p in lib_peaks], dtype=float)
-        l_int = np.array([p["intensity"] for p in lib_peaks], dtype=float)
-        order = np.argsort(l_mz)
+            l_mz  = np.array([p["mz"]       for p in lib_peaks], dtype=float)
+            l_int = np.array([p["intensity"] for p in lib_peaks], dtype=float)
+            order = np.argsort(l_mz)
 
-        # Precursor m/z: PEPMASS field, else EXACTMASS + H
-        pepmass_raw = spectrum["metadata"].get("PEPMASS", "")
-        try:
-            lib_prec = float(pepmass_raw.split()[0]) if pepmass_raw else 0.0
-        except (ValueError, IndexError):
-            lib_prec = 0.0
-        if not lib_prec:
+            # Precursor m/z: PEPMASS field, else EXACTMASS + H
+            pepmass_raw = spectrum["metadata"].get("PEPMASS", "")
             try:
-                lib_prec = float(spectrum["metadata"].get("EXACTMASS", 0)) + 1.007276
-            except ValueError:
+                lib_prec = float(pepmass_raw.split()[0]) if pepmass_raw else 0.0
+            except (ValueError, IndexError):
                 lib_prec = 0.0
+            if not lib_prec:
+                try:
+                    lib_prec = float(spectrum["metadata"].get("EXACTMASS", 0)) + 1.007276
+                except ValueError:
+                    lib_prec = 0.0
 
-        lib_spec = Spectrum(mz=l_mz[order], intensities=l_int[order],
-                            metadata={"precursor_mz": lib_prec})
-        lib_spec = normalize_intensities(lib_spec)
+            lib_spec = Spectrum(mz=l_mz[order], intensities=l_int[order],
+                                metadata={"precursor_mz": lib_prec})
+            lib_spec = normalize_intensities(lib_spec)
 
-        try:
-            result = scorer.pair(query, lib_spec)
-            r      = result.item()          # → (score, n_matches) tuple
-            score, n_matches = float(r[0]), int(r[1])
-        except Exception:
-            score, n_matches = 0.0, 0
+            try:
+                result = scorer.pair(query, lib_spec)
+                r      = result.item()          # → (score, n_matches) tuple
+                score, n_matches = float(r[0]), int(r[1])
+            except Exception:
+                score, n_matches = 0.0, 0
 
-        results.append({
-            "id":         i,
-            "name":       mol["name"],
-            "formula":    mol["formula"],
-            "tox_score":  mol["tox_score"],
-            "cas":        mol["cas"],
-            "similarity": round(score, 4),
-            "n_matches":  n_matches,
-        })
+            results.append({
+                "id":         i,
+                "name":       mol["name"],
+                "formula":    mol["formula"],
+                "tox_score":  mol["tox_score"],
+                "cas":        mol["cas"],
+                "similarity": round(score, 4),
+                "n_matches":  n_matches,
+            })
 
     results.sort(key=lambda x: x["similarity"], reverse=True)
     return results[:top_n]
@@ -522,7 +531,7 @@ def _get_lof_model():
     if _spectra_cache is None:
         _spectra_cache = _parse_mgf()
 
-    matrix = np.array([_spectrum_to_embedding(sp) for sp in _spectra_cache])
+    matrix = _embedding_matrix(_spectra_cache)
 
     # novelty=True allows scoring new points without re-fitting
     lof = LocalOutlierFactor(n_neighbors=8, novelty=True, metric="cosine")
@@ -570,9 +579,10 @@ def anomaly_score(query_peaks: List[Dict]) -> Dict:
 
     # Nearest neighbours in Spec2Vec space
     library = get_library()
+    lib_vecs = _embedding_matrix(_spectra_cache)
     sims    = sorted(
-        [(float(np.dot(query_vec, _spectrum_to_embedding(sp))), i)
-         for i, sp in enumerate(_spectra_cache)],
+        [(float(np.dot(query_vec, lib_vec)), i)
+         for i, lib_vec in enumerate(lib_vecs)],
         reverse=True,
     )
     nearest = [
@@ -634,20 +644,22 @@ def spec2vec_match(query_peaks: List[Dict], top_n: int = 10,
     if not query_peaks:
         return []
 
-    query_vec = _spectrum_to_embedding({"peaks": query_peaks})
+    with span("embedding"):
+        query_vec = _spectrum_to_embedding({"peaks": query_peaks})
     results   = []
 
-    for i, (sp, mol) in enumerate(zip(spectra, library)):
-        lib_vec    = _spectrum_to_embedding(sp)
-        similarity = float(np.dot(query_vec, lib_vec))
-        results.append({
-            "id":         i,
-            "name":       mol["name"],
-            "formula":    mol["formula"],
-            "tox_score":  mol["tox_score"],
-            "cas":        mol["cas"],
-            "similarity": round(max(0.0, similarity), 4),
-        })
+    lib_vecs = _embedding_matrix(spectra)
+    with span("scoring"):
+        for i, (lib_vec, mol) in enumerate(zip(lib_vecs, library)):
+            similarity = float(np.dot(query_vec, lib_vec))
+            results.append({
+                "id":         i,
+                "name":       mol["name"],
+                "formula":    mol["formula"],
+                "tox_score":  mol["tox_score"],
+                "cas":        mol["cas"],
+                "similarity": round(max(0.0, similarity), 4),
+            })
 
     results.sort(key=lambda x: x["similarity"], reverse=True)
     return results[:top_n]
@@ -909,14 +921,15 @@ def spec2vec_broad_match(query_peaks: List[Dict], top_n: int = 10) -> List[Dict]
     if not query_peaks:
         return []
 
-    query_vec = _spectrum_to_embedding({"peaks": query_peaks}).astype(np.float32)
+    with span("embedding"):
+        query_vec = _spectrum_to_embedding({"peaks": query_peaks}).astype(np.float32)
     norm = float(np.linalg.norm(query_vec))
     if norm > 0:
         query_vec /= norm
 
-    sims = (_broad_vectors @ query_vec).tolist()
-
-    indexed = sorted(enumerate(sims), key=lambda x: x[1], reverse=True)
+    with span("scoring"):
+        sims = (_broad_vectors @ query_vec).tolist()
+        indexed = sorted(enumerate(sims), key=lambda x: x[1], reverse=True)
     results = []
     seen_names: set = set()
     for idx, sim in indexed:
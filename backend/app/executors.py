@@ -0,0 +1,253 @@
+"""
+Execution layer — dedicated, separately sized pools for blocking work.
+
+  cpu_process : ProcessPoolExecutor for stateless, GIL-bound hot paths
+                (matchms scoring, Spec2Vec embedding).  Each worker process
+                keeps its own warm module-level caches.
+  cpu         : ThreadPoolExecutor for CPU work that needs in-process state
+                (MLService caches, DataFusion frames, the broad index) —
+                NumPy / pandas / sklearn release the GIL in their kernels.
+  io          : ThreadPoolExecutor for disk and network I/O and for
+                long-running coordinators that mostly wait.
+
+Every pool records in-flight tasks, completions, failures and the time a
+task spent queued before a worker picked it up.  Thread tasks run in a copy
+of the caller's context, so spans they record land in the current request;
+process tasks ship their spans back with the result.  While a profiled
+request is being served, tasks run under cProfile (see app.profiling).
+"""
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app import instrumentation
+from app import profiling
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    """Runs inside the worker: returns (wall-clock start time, result, spans) so queue wait can be measured."""
+    started = time.time()
+    return started, fn(*args, **kwargs), None
+
+
+def _timed_call_process(fn: Callable, args: tuple, kwargs: dict):
+    """Process-pool variant: spans recorded in the child are returned for replay in the parent."""
+    started = time.time()
+    result, spans = instrumentation.collect_spans(fn, *args, **kwargs)
+    return started, result, spans
+
+
+class _PoolFuture(Future):
+    """Result of InstrumentedPool.submit: cancellable exactly when the underlying task is."""
+
+    def __init__(self, task: Future):
+        super().__init__()
+        self._task = task
+
+    def cancel(self) -> bool:
+        # the task's done-callback moves this future to CANCELLED as well
+        return self._task.cancel()
+
+
+class InstrumentedPool:
+    """Lazily created executor with queue-depth and queue-wait accounting."""
+
+    def __init__(self, name: str, kind: str, max_workers: int):
+        self.name = name
+        self.kind = kind              # "process" | "thread"
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # spawn: forking a process that already runs threads (uvicorn, loaders) is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix=self.name
+                    )
+            return self._executor
+
+    def _record_wait(self, wait: float):
+        with self._lock:
+            self.completed += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        instrumentation.QUEUE_WAIT.observe(wait, self.name)
+        instrumentation.record("queue_wait", wait)
+
+    def _discard(self, executor):
+        """A crashed worker breaks the whole pool: recreate it on the next call."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on this pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        profiled = profiling.active() is not None
+        if profiled:
+            fn, args, kwargs = profiling.run_profiled, (fn, args, kwargs), {}
+        submitted = time.time()
+        with self._lock:
+            self.in_flight += 1
+        executor = self.executor
+        try:
+            if self.kind == "process":
+                started, result, spans = await loop.run_in_executor(
+                    executor, _timed_call_process, fn, args, kwargs)
+            else:
+                ctx = contextvars.copy_context()
+                started, result, spans = await loop.run_in_executor(
+                    executor, ctx.run, _timed_call, fn, args, kwargs)
+        except BrokenExecutor:
+            with self._lock:
+                self.failed += 1
+            self._discard(executor)
+            raise
+        except BaseException as e:
+            with self._lock:
+                self.failed += 1
+            if profiled:
+                profiling.record(getattr(e, "profile_report", None))
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        self._record_wait(max(0.0, started - submitted))
+        if spans:
+            instrumentation.replay_spans(spans)
+        if profiled:
+            result, report = result
+            profiling.record(report)
+        return result
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Blocking counterpart of run() for coordinators that already run on a
+        worker thread (e.g. a search fanning out over cpu_process): returns a
+        concurrent.futures.Future of fn's result.  Cancelling it cancels the task
+        if no worker has picked it up yet.  Pool accounting is the same; spans
+        recorded in a child process are not replayed.
+        """
+        submitted = time.time()
+        executor = self.executor
+        with self._lock:
+            self.in_flight += 1
+        try:
+            if self.kind == "process":
+                inner = executor.submit(_timed_call_process, fn, args, kwargs)
+            else:
+                inner = executor.submit(contextvars.copy_context().run, _timed_call, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+                self.failed += 1
+            raise
+
+        outer = _PoolFuture(inner)
+
+        def done(inner: Future):
+            with self._lock:
+                self.in_flight -= 1
+            if inner.cancelled():
+                Future.cancel(outer)
+                outer.set_running_or_notify_cancel()
+                return
+            try:
+                started, result, _ = inner.result()
+            except BaseException as e:
+                with self._lock:
+                    self.failed += 1
+                if isinstance(e, BrokenExecutor):
+                    self._discard(executor)
+                outer.set_exception(e)
+                return
+            self._record_wait(max(0.0, started - submitted))
+            outer.set_result(result)
+
+        inner.add_done_callback(done)
+        return outer
+
+    async def iterate(self, iterator):
+        """Async wrapper around a blocking iterator: each next() runs on this pool."""
+        sentinel = object()
+        while True:
+            item = await self.run(next, iterator, sentinel)
+            if item is sentinel:
+                break
+            yield item
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.max_workers,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.max_workers),
+                "completed": self.completed,
+                "failed": self.failed,
+                "queue_wait_avg_ms": round(1000 * self.wait_total / self.completed, 3) if self.completed else 0.0,
+                "queue_wait_max_ms": round(1000 * self.wait_max, 3),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_cores = os.cpu_count() or 2
+
+cpu_process = InstrumentedPool("cpu-process", "process", int(os.environ.get("CPU_PROCESS_WORKERS", _cores)))
+cpu = InstrumentedPool("cpu", "thread", int(os.environ.get("CPU_WORKERS", _cores)))
+io = InstrumentedPool("io", "thread", int(os.environ.get("IO_WORKERS", 4 * _cores)))
+
+POOLS = (cpu_process, cpu, io)
+
+
+def stats() -> Dict[str, Dict]:
+    return {pool.name: pool.stats() for pool in POOLS}
+
+
+def prometheus_lines():
+    """Pool gauges/counters in Prometheus text format, appended to GET /metrics."""
+    snapshot = stats()
+    lines = []
+    for metric, kind, field, help_text in (
+        ("executor_in_flight", "gauge", "in_flight", "Tasks submitted and not yet finished."),
+        ("executor_queue_depth", "gauge", "queue_depth", "Tasks waiting for a free worker."),
+        ("executor_workers", "gauge", "workers", "Configured worker count."),
+        ("executor_tasks_completed_total", "counter", "completed", "Tasks completed."),
+        ("executor_tasks_failed_total", "counter", "failed", "Tasks that raised."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, pool_stats in snapshot.items():
+            lines.append(f'{metric}{{pool="{name}"}} {pool_stats[field]}')
+    return lines
+
+
+def shutdown():
+    for pool in POOLS:
+        pool.shutdown()
@@ -0,0 +1,176 @@
+"""
+Latency instrumentation — histograms, hot-path spans and a Prometheus text exporter.
+
+  span(stage)      : context manager timing one stage of a request
+                     (json_decode, queue_wait, mgf_parse, embedding, scoring,
+                     serialize, train_fit, ...).  Recorded into the
+                     stage_duration_seconds histogram and, while a request is
+                     being served, into that request's span list (→ Server-Timing).
+  timed(stage)     : decorator form of span().
+  render_prometheus: text exposition format (version 0.0.4) for GET /metrics.
+"""
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Seconds — from sub-millisecond hot-path stages up to multi-minute training runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Spans of the request currently being served: list of (stage, seconds), or None outside a request
+_request_spans: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = \
+    contextvars.ContextVar("request_spans", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        # labels → [per-bucket counts (last one is +Inf)..., sum, count]; made cumulative on render
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[slot] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+REQUEST_ERRORS = Counter(
+    "http_request_errors_total", "HTTP requests that ended in a 5xx or an unhandled exception.", ("method", "route"))
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Duration of instrumented hot-path stages.", ("stage",))
+QUEUE_WAIT = Histogram(
+    "executor_queue_wait_seconds", "Time a task waited before an executor worker picked it up.", ("pool",))
+
+
+# ──────────────────────────────────────────────────────────────
+#  Spans
+# ──────────────────────────────────────────────────────────────
+
+def record(stage: str, seconds: float):
+    """Record a finished stage into the histogram and the current request's span list."""
+    STAGE_DURATION.observe(seconds, stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def timed(stage: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def begin_request() -> Tuple[List[Tuple[str, float]], contextvars.Token]:
+    spans: List[Tuple[str, float]] = []
+    return spans, _request_spans.set(spans)
+
+
+def end_request(token: contextvars.Token):
+    _request_spans.reset(token)
+
+
+def collect_spans(fn, *args, **kwargs):
+    """Run fn with a fresh span list and return (result, spans) — used inside worker processes."""
+    spans: List[Tuple[str, float]] = []
+    token = _request_spans.set(spans)
+    try:
+        return fn(*args, **kwargs), spans
+    finally:
+        _request_spans.reset(token)
+
+
+def replay_spans(spans: List[Tuple[str, float]]):
+    """Record spans measured in another process into this process's histograms and request."""
+    for stage, seconds in spans:
+        record(stage, seconds)
+
+
+def server_timing_header(spans: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing value: spans of the same stage are summed, durations in milliseconds."""
+    totals: Dict[str, float] = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    parts = [f"total;dur={total * 1000:.2f}"]
+    parts += [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items()]
+    return ", ".join(parts)
+
+
+def render_prometheus(extra_lines: Optional[List[str]] = None) -> str:
+    lines: List[str] = []
+    for metric in (REQUEST_DURATION, REQUEST_ERRORS, STAGE_DURATION, QUEUE_WAIT):
+        lines.extend(metric.render())
+    if extra_lines:
+        lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
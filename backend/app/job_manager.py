@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """Sollevata ai checkpoint di un job quando ne è stata richiesta la cancellazione"""
+
+
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+
+
+class Job:
+    """Un job di training: stato, progresso, storico eventi e sottoscrittori"""
+
+    def __init__(self, key: tuple, model: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.model = model
+        self.status = "queued"          # queued | running | completed | failed | cancelled
+        self.fraction: Optional[float] = None   # progresso reale (0-1) se noto, altrimenti None
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict] = []
+        self.cancel_event = threading.Event()
+        # True se la cancellazione interrompe il training in corso (checkpoint durante il fit);
+        # False se il job si ferma solo prima di iniziare: il fit in memoria di quello stimatore
+        # non ha checkpoint e, una volta partito, arriva al termine
+        self.interruptible = True
+        self._subscribers: List[tuple] = []     # (event loop, asyncio.Queue)
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def check_cancelled(self):
+        """Checkpoint cooperativo: da chiamare tra le fasi del training"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def set_fraction(self, fraction: float):
+        """Callback di progresso: aggiorna il progresso ed è anche un checkpoint di cancellazione"""
+        self.fraction = fraction
+        self.check_cancelled()
+
+    def emit(self, event: Dict):
+        """Registra un evento e lo inoltra (thread-safe) a tutti i sottoscrittori"""
+        event = {"job_id": self.id, "model": self.model, **event}
+        with self._lock:
+            self.events.append(event)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def subscribe(self, loop, queue):
+        """Aggiunge un sottoscrittore e gli rimanda lo storico degli eventi"""
+        with self._lock:
+            self._subscribers.append((loop, queue))
+            history = list(self.events)
+        for event in history:
+            queue.put_nowait(event)
+
+    def unsubscribe(self, queue) -> int:
+        with self._lock:
+            self._subscribers = [(l, q) for l, q in self._subscribers if q is not queue]
+            return len(self._subscribers)
+
+    def snapshot(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "model": self.model,
+            "status": self.status,
+            "fraction": self.fraction,
+            "interruptible": self.interruptible,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Coda di job di training con pool limitato di worker.
+
+    - Deduplica: una richiesta identica (stessa chiave) a un job ancora attivo
+      restituisce il job esistente invece di crearne un altro.
+    - Cancellazione cooperativa: il job si ferma al primo checkpoint (check_cancelled / set_fraction).
+      Job.interruptible dice se il training ha checkpoint anche durante il fit.
+    - Riconnessione: i client si iscrivono a un job per id e ricevono lo storico degli eventi.
+    - Job orfani: se un job attivo resta senza sottoscrittori per orphan_timeout secondi viene cancellato.
+    """
+
+    def __init__(self, max_workers: int = 2, orphan_timeout: float = 60.0, max_history: int = 200):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="train-job")
+        self.orphan_timeout = orphan_timeout
+        self.max_history = max_history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active_by_key: Dict[tuple, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: tuple, model: str, fn: Callable[[Job], Dict]):
+        """Accoda fn(job) o restituisce il job attivo con la stessa chiave. Returns: (job, deduplicato)"""
+        with self._lock:
+            existing = self._active_by_key.get(key)
+            if existing is not None and not existing.finished:
+                return existing, True
+
+            job = Job(key, model)
+            self._jobs[job.id] = job
+            self._active_by_key[key] = job
+            self._trim_history()
+
+        self._pool.submit(self._run, job, fn)
+        return job, False
+
+    def _run(self, job: Job, fn: Callable[[Job], Dict]):
+        try:
+            job.check_cancelled()
+            job.started_at = time.time()
+            job.status = "running"
+            job.result = fn(job)
+            job.status = "completed"
+            job.emit({"status": "completed", "progress": 100, "metrics": job.result,
+                      "message": f"{job.model} completed"})
+        except JobCancelled:
+            job.status = "cancelled"
+            job.emit({"status": "cancelled", "progress": 0, "metrics": None,
+                      "message": f"{job.model} cancelled"})
+        except Exception as e:
+            logger.exception("Error training %s", job.model)
+            job.status = "failed"
+            job.error = str(e)
+            job.emit({"status": "model_error", "progress": 0, "metrics": None,
+                      "message": f"{job.model} failed: {str(e)}"})
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active_by_key.get(job.key) is job:
+                    del self._active_by_key[job.key]
+
+    def _trim_history(self):
+        """Mantiene al massimo max_history job, scartando i più vecchi già terminati"""
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_history:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Job {job_id} not found")
+        return job
+
+    def list(self) -> List[Dict]:
+        return [job.snapshot() for job in self._jobs.values()]
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if not job.finished:
+            job.cancel_event.set()
+        return job
+
+    def subscribe(self, job_id: str, loop, queue) -> Job:
+        job = self.get(job_id)
+        job.subscribe(loop, queue)
+        return job
+
+    def unsubscribe(self, job: Job, queue):
+        """Rimuove un sottoscrittore; se il job resta orfano ne programma la cancellazione"""
+        if job.unsubscribe(queue) == 0 and not job.finished:
+            timer = threading.Timer(self.orphan_timeout, self._cancel_if_orphaned, args=(job,))
+            timer.daemon = True
+            timer.start()
+
+    def _cancel_if_orphaned(self, job: Job):
+        with job._lock:
+            orphaned = not job._subscribers
+        if orphaned and not job.finished:
+            job.cancel_event.set()
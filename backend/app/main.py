@@ -1,20 +1,93 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 import asyncio
+import functools
 import json
 import math
+import os
+import logging
+import shutil
+import tempfile
 import time
-from typing import List, Optional
+from typing import Dict, List, Optional
 import traceback
 
-from app.ml_service import MLService
+from fastapi.responses import PlainTextResponse, Response
+
+from app.ml_service import MLService, INTERRUPTIBLE_MODELS
+from app import executors
+from app import instrumentation
+from app import profiling
+from app import tuning_service
+from app.job_manager import JobManager
 from app.models import (
-    DatasetInfo, TrainingRequest, PredictionRequest,
+    DatasetInfo, TrainingRequest, PredictionRequest, InferenceRequest,
     TrainingProgress, PredictionResult, FeatureImportanceRequest
 )
 
-app = FastAPI(title="ML Training API")
+logger = logging.getLogger("app")
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse che registra il tempo di serializzazione come span "serialize" """
+
+    def render(self, content) -> bytes:
+        with instrumentation.span("serialize"):
+            return super().render(content)
+
+
+app = FastAPI(title="ML Training API", default_response_class=TimedJSONResponse)
+
+# SERVER_TIMING=1 aggiunge l'header Server-Timing a ogni risposta;
+# altrimenti solo su richiesta (header "X-Server-Timing: 1" o query ?server_timing=1)
+SERVER_TIMING_ALWAYS = os.environ.get("SERVER_TIMING", "0") == "1"
+
+
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    """Latenza per route (istogramma) e, su richiesta, breakdown per fase nell'header Server-Timing"""
+    spans, token = instrumentation.begin_request()
+    # Profiling opt-in (richiede il token admin): i task inviati ai pool girano sotto cProfile
+    profile_token = None
+    if profiling.authorized(request.headers.get("x-profile") or request.query_params.get("profile")):
+        profile_token = profiling.begin_request(request.url.path)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    except Exception:
+        logger.exception("Unhandled error on %s %s", request.method, request.url.path)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        instrumentation.end_request(token)
+        profile = None
+        if profile_token is not None:
+            profile = profiling.active()
+            profiling.end_request(profile_token)
+        # Template della route (/models/{dataset}) e non il path: cardinalità limitata
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        instrumentation.REQUEST_DURATION.observe(elapsed, request.method, route_path, str(status))
+        if status >= 500:
+            instrumentation.REQUEST_ERRORS.inc(request.method, route_path)
+
+    if (SERVER_TIMING_ALWAYS or request.headers.get("x-server-timing") == "1"
+            or request.query_params.get("server_timing") == "1"):
+        response.headers["Server-Timing"] = instrumentation.server_timing_header(spans, elapsed)
+    if profile is not None and profile["ids"]:
+        response.headers["X-Profile-Ids"] = ",".join(profile["ids"])
+    return response
+
+
+async def _read_json(request: Request):
+    """Decodifica il body JSON registrando lo span "json_decode" """
+    body = await request.body()
+    with instrumentation.span("json_decode"):
+        return json.loads(body)
 
 # CORS
 app.add_middleware(
@@ -26,26 +99,35 @@ app.add_middleware(
 )
 
 # Service instance
-ml_service = MLService()
+# MODEL_COMPRESS: livello di compressione joblib degli artefatti (0 = non compressi, caricati in mmap)
+# SPLITS_CACHE_SIZE: split train/test (e insiemi di fold di CV) tenuti in memoria (LRU)
+ml_service = MLService(
+    model_compress=int(os.environ.get("MODEL_COMPRESS", 0)),
+    splits_cache_size=int(os.environ.get("SPLITS_CACHE_SIZE", 4)),
+)
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    executors.shutdown()
 
 @app.get("/")
 def read_root():
     return {"message": "ML Training API is running"}
 
 @app.get("/datasets", response_model=List[str])
-def list_datasets():
+async def list_datasets():
     """Lista tutti i dataset disponibili"""
     try:
-        datasets = ml_service.list_datasets()
+        datasets = await executors.io.run(ml_service.list_datasets)
         return datasets
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/datasets/{filename}", response_model=DatasetInfo)
-def get_dataset_info(filename: str):
-    """Ottieni informazioni su un dataset specifico"""
+async def get_dataset_info(filename: str):
+    """Ottieni informazioni su un dataset specifico (parsing CSV sul pool CPU)"""
     try:
-        info = ml_service.load_dataset(filename)
+        info = await executors.cpu.run(ml_service.load_dataset, filename)
         return info
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Dataset not found")
@@ -53,106 +135,162 @@ def get_dataset_info(filename: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/models/{dataset}")
-def get_trained_models(dataset: str):
-    """Ottieni lista modelli trainati per un dataset"""
+async def get_trained_models(dataset: str, model_name: Optional[str] = None, task_type: Optional[str] = None):
+    """Ottieni lista modelli trainati per un dataset (filtri opzionali: model_name, task_type)"""
     try:
-        models = ml_service.get_trained_models(dataset)
+        models = await executors.io.run(ml_service.get_trained_models, dataset, model_name, task_type)
         return {"models": models}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Job manager: pool limitato di worker per il training, deduplica e riconnessione ai job
+job_manager = JobManager(max_workers=int(os.environ.get("TRAIN_WORKERS", 2)))
+
+TERMINAL_EVENTS = ("completed", "model_error", "cancelled")
+
+def _training_job_key(request: dict, model_name: str) -> tuple:
+    """Richieste identiche (stesso dataset, modello, feature, seed e modalità) condividono lo stesso job"""
+    selected_features = request.get("selected_features", None)
+    return (
+        request["dataset"],
+        model_name,
+        tuple(selected_features) if selected_features else None,
+        float(request.get("test_size", 0.2)),
+        request.get("random_state", 42),
+        request.get("mode", "memory"),
+        int(request.get("chunksize", 50000)),
+        int(request.get("cv_folds", 0) or 0),
+        bool(request.get("stratified", True)),
+    )
+
+def run_training_job(job, request: dict, model_name: str):
+    """Eseguito nel pool del job manager: allena un modello secondo la modalità richiesta"""
+    dataset = request["dataset"]
+    test_size = request.get("test_size", 0.2)
+    random_state = request.get("random_state", 42)
+    selected_features = request.get("selected_features", None)
+    # "streaming": training out-of-core con partial_fit (solo SGD / Naive Bayes)
+    streaming = request.get("mode") == "streaming"
+    chunksize = int(request.get("chunksize", 50000))
+    # cv_folds ≥ 2: cross-validation k-fold con fold in parallelo
+    cv_folds = int(request.get("cv_folds", 0) or 0)
+    stratified = bool(request.get("stratified", True))
+
+    if cv_folds >= 2:
+        def on_fold(fold, fold_metrics, done, total):
+            job.emit({
+                "status": "fold_completed",
+                "fold": fold,
+                "progress": round(90.0 * done / total, 1),
+                "metrics": fold_metrics,
+                "message": f"{model_name}: fold {done}/{total} completed"
+            })
+            job.set_fraction(done / total)
+
+        return ml_service.cross_validate_model(
+            dataset, model_name, selected_features,
+            n_splits=cv_folds, stratified=stratified, random_state=random_state,
+            test_size=test_size, on_fold=on_fold
+        )
+
+    if streaming:
+        return ml_service.train_model_streaming(
+            dataset, model_name, selected_features,
+            test_size=test_size, random_state=random_state, chunksize=chunksize,
+            progress_callback=job.set_fraction
+        )
+
+    # Il fit in memoria si interrompe solo per gli stimatori con checkpoint (INTERRUPTIBLE_MODELS)
+    job.interruptible = model_name in INTERRUPTIBLE_MODELS
+    X_train, X_test, y_train, y_test = ml_service.prepare_data(
+        dataset, test_size, random_state, selected_features
+    )
+    job.check_cancelled()
+    return ml_service.train_model(dataset, model_name, X_train, y_train, X_test, y_test, selected_features,
+                                  checkpoint=job.check_cancelled)
+
 @app.websocket("/ws/train")
 async def train_models(websocket: WebSocket):
-    """WebSocket per training in tempo reale"""
+    """
+    WebSocket per training in tempo reale.
+    Ogni modello diventa un job nel job manager; il socket inoltra il progresso dei job.
+    Messaggio {"job_ids": [...]} → riconnessione ai job esistenti (con storico eventi).
+    """
     await websocket.accept()
-    
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    jobs = []
+
     try:
-        # Ricevi richiesta di training
+        # Ricevi richiesta di training (o di riconnessione)
         data = await websocket.receive_text()
         request = json.loads(data)
-        
-        dataset = request["dataset"]
-        models = request["models"]
-        test_size = request.get("test_size", 0.2)
-        random_state = request.get("random_state", 42)
-        selected_features = request.get("selected_features", None)
 
-        # Prepara i dati una volta sola
-        await websocket.send_text(json.dumps({
-            "status": "preparing",
-            "message": "Preparing dataset..."
-        }))
-
-        X_train, X_test, y_train, y_test = ml_service.prepare_data(
-            dataset, test_size, random_state, selected_features
-        )
-        
-        # Allena ogni modello con progresso reale
-        loop = asyncio.get_event_loop()
-        for idx, model_name in enumerate(models):
-            try:
-                # Segnala inizio training
+        if "job_ids" in request:
+            for job_id in request["job_ids"]:
+                jobs.append(job_manager.subscribe(job_id, loop, events))
+        else:
+            await websocket.send_text(json.dumps({
+                "status": "preparing",
+                "message": "Preparing dataset..."
+            }))
+
+            # ?profile=<token admin> sull'URL del socket: ogni job di training gira sotto cProfile
+            profile = profiling.authorized(websocket.query_params.get("profile"))
+
+            submitted = []
+            for model_name in request["models"]:
+                job_fn = functools.partial(run_training_job, request=request, model_name=model_name)
+                if profile:
+                    job_fn = profiling.profiled(job_fn, route="/ws/train")
+                job, deduplicated = job_manager.submit(
+                    _training_job_key(request, model_name),
+                    model_name,
+                    job_fn
+                )
+                job.subscribe(loop, events)
+                jobs.append(job)
+                submitted.append({"job_id": job.id, "model": model_name, "deduplicated": deduplicated})
+
+            await websocket.send_text(json.dumps({"status": "jobs", "jobs": submitted}))
+
+        # Inoltra eventi e progresso finché ogni job ha emesso il suo evento finale.
+        # Curva asintotica: avanza veloce all'inizio, rallenta verso il 90%
+        # (streaming e cross-validation riportano il progresso reale)
+        tau = 1.5  # costante di tempo — controlla la velocità della curva
+        pending = {job.id for job in jobs}
+        while pending:
+            while not events.empty():
+                event = events.get_nowait()
+                if event["status"] in TERMINAL_EVENTS:
+                    pending.discard(event["job_id"])
+                await websocket.send_text(json.dumps(event))
+
+            for job in jobs:
+                if job.id not in pending or job.status != "running" or job.started_at is None:
+                    continue
+                if job.fraction is not None:
+                    progress = 90.0 * job.fraction
+                else:
+                    progress = 90.0 * (1.0 - math.exp(-(time.time() - job.started_at) / tau))
                 await websocket.send_text(json.dumps({
                     "status": "training",
-                    "model": model_name,
-                    "progress": 0,
+                    "job_id": job.id,
+                    "model": job.model,
+                    "progress": round(progress, 1),
                     "metrics": None,
-                    "message": f"Training {model_name}..."
+                    "message": f"Training {job.model}... {progress:.0f}%"
                 }))
+            await asyncio.sleep(0.15)
 
-                # Esegui train_model in un thread separato
-                train_future = loop.run_in_executor(
-                    None,
-                    ml_service.train_model,
-                    dataset, model_name, X_train, y_train, X_test, y_test, selected_features
-                )
-
-                # Manda aggiornamenti di progresso reali mentre il training gira
-                # Curva asintotica: avanza veloce all'inizio, rallenta verso il 90%
-                t_start = time.time()
-                tau = 1.5  # costante di tempo — controlla la velocità della curva
-                while not train_future.done():
-                    elapsed = time.time() - t_start
-                    progress = 90.0 * (1.0 - math.exp(-elapsed / tau))
-                    await websocket.send_text(json.dumps({
-                        "status": "training",
-                        "model": model_name,
-                        "progress": round(progress, 1),
-                        "metrics": None,
-                        "message": f"Training {model_name}... {progress:.0f}%"
-                    }))
-                    await asyncio.sleep(0.15)
-
-                metrics = train_future.result()
-
-                # Completato — salta a 100%
-                await websocket.send_text(json.dumps({
-                    "status": "completed",
-                    "model": model_name,
-                    "progress": 100,
-                    "metrics": metrics,
-                    "message": f"{model_name} completed"
-                }))
-
-                await asyncio.sleep(0.3)
-            except Exception as e:
-                print(f"Error training {model_name}: {str(e)}")
-                traceback.print_exc()
-                await websocket.send_text(json.dumps({
-                    "status": "model_error",
-                    "model": model_name,
-                    "progress": 0,
-                    "metrics": None,
-                    "message": f"{model_name} failed: {str(e)}"
-                }))
-        
         # Training completato
         await websocket.send_text(json.dumps({
             "status": "all_completed",
             "progress": 100,
             "message": "All models trained successfully"
         }))
-        
+
     except WebSocketDisconnect:
         print("Client disconnected")
     except Exception as e:
@@ -162,34 +300,200 @@ async def train_models(websocket: WebSocket):
             "status": "error",
             "message": str(e)
         }))
+    finally:
+        # I job continuano: un client può riconnettersi; se nessuno lo fa vengono cancellati
+        for job in jobs:
+            job_manager.unsubscribe(job, events)
+        await websocket.close()
+
+@app.get("/jobs")
+def list_jobs():
+    """Lista dei job di training (attivi e recenti)"""
+    return {"jobs": job_manager.list()}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Stato di un job di training"""
+    try:
+        return job_manager.get(job_id).snapshot()
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Richiede la cancellazione cooperativa di un job"""
+    try:
+        return job_manager.cancel(job_id).snapshot()
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.websocket("/ws/tune")
+async def tune_model(websocket: WebSocket):
+    """WebSocket per la ricerca iperparametri (successive halving) con best-so-far in tempo reale"""
+    await websocket.accept()
+
+    try:
+        data = await websocket.receive_text()
+        request = json.loads(data)
+
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def on_event(event):
+            # Chiamato dal thread del tuning → inoltra all'event loop
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        # Il coordinatore della ricerca attende il suo process pool: gira sul pool I/O
+        tune_future = asyncio.ensure_future(executors.io.run(
+            functools.partial(
+                tuning_service.tune_model,
+                ml_service,
+                request["dataset"],
+                request["model"],
+                request.get("selected_features", None),
+                test_size=request.get("test_size", 0.2),
+                random_state=request.get("random_state", 42),
+                n_candidates=int(request.get("n_candidates", 27)),
+                eta=int(request.get("eta", 3)),
+                max_workers=request.get("max_workers", None),
+                on_event=on_event,
+            )
+        ))
+
+        def finite(value):
+            return value if value is not None and math.isfinite(value) else None
+
+        while not (tune_future.done() and events.empty()):
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=0.15)
+            except asyncio.TimeoutError:
+                continue
+            await websocket.send_text(json.dumps({
+                "status": "tuning",
+                "model": request["model"],
+                "progress": round(90.0 * event["done"] / event["total"], 1),
+                "rung": event["rung"],
+                "n_samples": event["n_samples"],
+                "params": event["params"],
+                "score": finite(event["score"]),
+                "best_params": event["best_params"],
+                "best_score": finite(event["best_score"]),
+                "message": f"Tuning {request['model']}... {event['done']}/{event['total']}"
+            }))
+
+        result = tune_future.result()
+        await websocket.send_text(json.dumps({
+            "status": "completed",
+            "model": request["model"],
+            "progress": 100,
+            "best_params": result["best_params"],
+            "best_score": finite(result["best_score"]),
+            "metrics": result["metrics"],
+            "message": f"{request['model']} tuned and saved"
+        }))
+
+    except WebSocketDisconnect:
+        print("Client disconnected")
+    except Exception as e:
+        print(f"Error during tuning: {str(e)}")
+        traceback.print_exc()
+        await websocket.send_text(json.dumps({
+            "status": "error",
+            "message": str(e)
+        }))
     finally:
         await websocket.close()
 
 @app.post("/predict")
 async def predict(request: PredictionRequest):
-    """Fa predizioni con un modello trainato"""
+    """Fa predizioni con un modello trainato (paginato, calcolato fuori dall'event loop)"""
     try:
-        results, metrics = ml_service.predict(request.dataset, request.model_name)
+        results, metrics, total = await executors.cpu.run(
+            ml_service.predict,
+            request.dataset, request.model_name,
+            request.offset, request.limit, request.filter
+        )
         
         return {
             "predictions": results,
-            "metrics": metrics
+            "metrics": metrics,
+            "total": total,
+            "offset": request.offset,
+            "limit": request.limit
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _inference_stream(dataset: str, model_name: str, X, features, chunk_size: int, return_proba: bool):
+    """NDJSON: una riga di intestazione, poi una riga per blocco di predizioni"""
+    model = ml_service.trained_models[f"{dataset}_{model_name.replace(' ', '_')}"]["model"]
+    classes = getattr(model, "classes_", None)
+    yield json.dumps({
+        "model": model_name,
+        "features": features,
+        "n_rows": len(X),
+        "classes": classes.tolist() if classes is not None else None
+    }) + "\n"
+    chunks = ml_service.predict_batch(dataset, model_name, X, chunk_size, return_proba)
+    async for chunk in executors.cpu.iterate(chunks):
+        yield json.dumps(chunk) + "\n"
+
+@app.post("/infer")
+async def infer(request: InferenceRequest):
+    """Inferenza su nuovi campioni (JSON) con un modello trainato, risposta NDJSON in streaming"""
+    try:
+        X, features = await executors.cpu.run(
+            ml_service.prepare_inference_input, request.dataset, request.model_name, rows=request.rows
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        _inference_stream(request.dataset, request.model_name, X, features, request.chunk_size, request.return_proba),
+        media_type="application/x-ndjson"
+    )
+
+NPY_MAGIC = b"\x93NUMPY"
+
+@app.post("/infer/upload")
+async def infer_upload(
+    dataset: str = Form(...),
+    model_name: str = Form(...),
+    chunk_size: int = Form(10000),
+    return_proba: bool = Form(True),
+    file: UploadFile = File(...)
+):
+    """Inferenza su un file caricato: CSV con header oppure array NumPy .npy (riconosciuto dal magic number)"""
+    try:
+        content = await file.read()
+        # Il content type non basta: curl e molti client inviano anche i CSV come application/octet-stream
+        is_npy = content.startswith(NPY_MAGIC)
+        X, features = await executors.cpu.run(
+            ml_service.prepare_inference_input,
+            dataset, model_name,
+            npy_bytes=content if is_npy else None,
+            csv_bytes=None if is_npy else content
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        _inference_stream(dataset, model_name, X, features, chunk_size, return_proba),
+        media_type="application/x-ndjson"
+    )
+
 @app.post("/feature-importance")
 async def feature_importance(request: FeatureImportanceRequest):
     """Restituisce feature importances per un modello trainato"""
     try:
-        loop = asyncio.get_running_loop()
-        importances = await loop.run_in_executor(
-            None,
-            ml_service.get_feature_importance,
-            request.dataset,
-            request.model_name
+        importances = await executors.cpu.run(
+            ml_service.get_feature_importance, request.dataset, request.model_name
         )
         return {"feature_importances": importances}
     except ValueError as e:
@@ -197,6 +501,58 @@ async def feature_importance(request: FeatureImportanceRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/executors")
+def executor_stats():
+    """Stato dei pool di esecuzione: worker, task in corso, profondità coda, attesa in coda"""
+    return executors.stats()
+
+def _require_admin(request: Request):
+    if not profiling.authorized(request.headers.get("x-admin-token") or request.query_params.get("token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    """Profili catturati (più recenti prima): route, funzione, durata"""
+    _require_admin(request)
+    return {"capacity": profiling.BUFFER_SIZE, "profiles": profiling.list_profiles()}
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, request: Request):
+    """Report pstats testuale (top funzioni per tempo cumulativo)"""
+    _require_admin(request)
+    try:
+        return PlainTextResponse(profiling.get_profile(profile_id)["text"])
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/admin/profiles/{profile_id}/pstats")
+def download_profile(profile_id: str, request: Request):
+    """File .pstats binario (pstats.Stats / snakeviz)"""
+    _require_admin(request)
+    try:
+        profile = profiling.get_profile(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(
+        profile["pstats"],
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+    )
+
+@app.delete("/admin/profiles")
+def clear_profiles(request: Request):
+    _require_admin(request)
+    profiling.clear()
+    return {"cleared": True}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Metriche in formato testo Prometheus: latenze per route e per fase, attesa in coda, stato dei pool"""
+    return PlainTextResponse(
+        instrumentation.render_prometheus(executors.prometheus_lines()),
+        media_type="text/plain; version=0.0.4",
+    )
+
 # ──────────────────────────────────────────────────────────────
 #  Deep Spectrum MS endpoints  (flusso separato)
 # ──────────────────────────────────────────────────────────────
@@ -221,19 +577,19 @@ from app.deep_spectrum_service import (
 )
 
 @app.get("/deep-spectrum/libraries")
-def deep_spectrum_libraries():
+async def deep_spectrum_libraries():
     """Lista le librerie spettrali disponibili nella cartella datasets."""
     try:
-        return ns_list_libraries()
+        return await executors.io.run(ns_list_libraries)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/deep-spectrum/library")
-def deep_spectrum_library(lib: Optional[str] = None):
+async def deep_spectrum_library(lib: Optional[str] = None):
     """Restituisce la libreria spettrale specificata (default: ECRFS)."""
     try:
-        return ns_get_library(lib)
+        return await executors.cpu.run(ns_get_library, lib)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -241,10 +597,10 @@ def deep_spectrum_library(lib: Optional[str] = None):
 
 
 @app.get("/deep-spectrum/embedding/{spectrum_id}")
-def deep_spectrum_embedding(spectrum_id: int, lib: Optional[str] = None):
+async def deep_spectrum_embedding(spectrum_id: int, lib: Optional[str] = None):
     """Restituisce il vettore 300-D Spec2Vec per una molecola della libreria specificata."""
     try:
-        return ns_get_embedding(spectrum_id, lib)
+        return await executors.cpu.run(ns_get_embedding, spectrum_id, lib)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -252,10 +608,10 @@ def deep_spectrum_embedding(spectrum_id: int, lib: Optional[str] = None):
 
 
 @app.get("/deep-spectrum/embeddings-3d")
-def deep_spectrum_embeddings_3d(lib: Optional[str] = None):
+async def deep_spectrum_embeddings_3d(lib: Optional[str] = None):
     """Restituisce le coordinate PCA 3-D per tutte le molecole della libreria specificata."""
     try:
-        return ns_get_embeddings_3d(lib)
+        return await executors.cpu.run(ns_get_embeddings_3d, lib)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -263,10 +619,10 @@ def deep_spectrum_embeddings_3d(lib: Optional[str] = None):
 
 
 @app.get("/deep-spectrum/spectrum/{spectrum_id}")
-def deep_spectrum_spectrum(spectrum_id: int, lib: Optional[str] = None):
+async def deep_spectrum_spectrum(spectrum_id: int, lib: Optional[str] = None):
     """Restituisce il set di picchi MS2 completo per una molecola (per indice)."""
     try:
-        return ns_get_spectrum(spectrum_id, lib)
+        return await executors.cpu.run(ns_get_spectrum, spectrum_id, lib)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -281,13 +637,12 @@ async def deep_spectrum_project_query_3d(request: Request):
     Returns: { label, x, y, z }
     """
     try:
-        body        = await request.json()
+        body        = await _read_json(request)
         query_peaks = body.get("peaks", [])
         label       = str(body.get("label", "Query"))
         lib_id      = body.get("lib") or None
-        loop        = asyncio.get_running_loop()
-        result      = await loop.run_in_executor(
-            None, lambda: ns_project_query_to_3d(query_peaks, label, lib_id)
+        result      = await executors.cpu_process.run(
+            ns_project_query_to_3d, query_peaks, label, lib_id
         )
         return result
     except Exception as e:
@@ -295,28 +650,28 @@ async def deep_spectrum_project_query_3d(request: Request):
 
 
 @app.get("/deep-spectrum/all-embeddings")
-def deep_spectrum_all_embeddings():
+async def deep_spectrum_all_embeddings():
     """Restituisce i vettori 300-D per tutte le 102 molecole (per similarity search lato client)."""
     try:
-        return ns_get_all_embeddings()
+        return await executors.cpu.run(ns_get_all_embeddings)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/deep-spectrum/chromatograms")
-def deep_spectrum_list_chromatograms():
+async def deep_spectrum_list_chromatograms():
     """Lista i file cromatogramma JSON disponibili."""
     try:
-        return ns_list_chromatograms()
+        return await executors.io.run(ns_list_chromatograms)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/deep-spectrum/chromatogram/{filename}")
-def deep_spectrum_get_chromatogram(filename: str):
+async def deep_spectrum_get_chromatogram(filename: str):
     """Restituisce un cromatogramma JSON per filename."""
     try:
-        return ns_get_chromatogram(filename)
+        return await executors.io.run(ns_get_chromatogram, filename)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -330,17 +685,15 @@ async def deep_spectrum_spectral_match(request: Request):
     Body: { peaks: [{mz, intensity}], precursor_mz, tolerance?, top_n?, lib? }
     """
     try:
-        body        = await request.json()
+        body        = await _read_json(request)
         query_peaks = body.get("peaks", [])
         precursor   = float(body.get("precursor_mz", 0.0))
         tolerance   = float(body.get("tolerance", 0.01))
         top_n       = int(body.get("top_n", 10))
         lib_id      = body.get("lib") or None
 
-        loop = asyncio.get_running_loop()
-        results = await loop.run_in_executor(
-            None,
-            lambda: ns_spectral_match(query_peaks, precursor, tolerance, top_n, lib_id)
+        results = await executors.cpu_process.run(
+            ns_spectral_match, query_peaks, precursor, tolerance, top_n, lib_id
         )
         return {"results": results}
     except Exception as e:
@@ -354,12 +707,9 @@ async def deep_spectrum_anomaly_score(request: Request):
     Body: { peaks: [{mz, intensity}] }
     """
     try:
-        body        = await request.json()
+        body        = await _read_json(request)
         query_peaks = body.get("peaks", [])
-        loop        = asyncio.get_running_loop()
-        result      = await loop.run_in_executor(
-            None, lambda: ns_anomaly_score(query_peaks)
-        )
+        result      = await executors.cpu_process.run(ns_anomaly_score, query_peaks)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -372,16 +722,12 @@ async def deep_spectrum_spec2vec_match(request: Request):
     Body: { peaks: [{mz, intensity}], top_n?, lib? }
     """
     try:
-        body        = await request.json()
+        body        = await _read_json(request)
         query_peaks = body.get("peaks", [])
         top_n       = int(body.get("top_n", 10))
         lib_id      = body.get("lib") or None
 
-        loop = asyncio.get_running_loop()
-        results = await loop.run_in_executor(
-            None,
-            lambda: ns_spec2vec_match(query_peaks, top_n, lib_id)
-        )
+        results = await executors.cpu_process.run(ns_spec2vec_match, query_peaks, top_n, lib_id)
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -403,8 +749,7 @@ async def deep_spectrum_build_broad_index():
     Returns current status immediately; poll /broad-index-status for progress.
     """
     try:
-        loop = asyncio.get_running_loop()
-        status = await loop.run_in_executor(None, ns_start_build_broad_index)
+        status = await executors.io.run(ns_start_build_broad_index)
         return status
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -418,15 +763,12 @@ async def deep_spectrum_spec2vec_broad_match(request: Request):
     Requires broad index to be built first.
     """
     try:
-        body        = await request.json()
+        body        = await _read_json(request)
         query_peaks = body.get("peaks", [])
         top_n       = int(body.get("top_n", 10))
 
-        loop = asyncio.get_running_loop()
-        results = await loop.run_in_executor(
-            None,
-            lambda: ns_spec2vec_broad_match(query_peaks, top_n)
-        )
+        # L'indice broad vive nel processo principale: pool CPU a thread
+        results = await executors.cpu.run(ns_spec2vec_broad_match, query_peaks, top_n)
         return {"results": results}
     except RuntimeError as e:
         raise HTTPException(status_code=503, detail=str(e))
@@ -441,17 +783,15 @@ async def deep_spectrum_massbank_search(request: Request):
     Body: { peaks: [{mz, intensity}], precursor_mz, ion_mode?, threshold?, top_n? }
     """
     try:
-        body        = await request.json()
+        body        = await _read_json(request)
         query_peaks = body.get("peaks", [])
         precursor   = float(body.get("precursor_mz", 0.0))
         ion_mode    = str(body.get("ion_mode", "POSITIVE"))
         threshold   = float(body.get("threshold", 0.5))
         top_n       = int(body.get("top_n", 5))
 
-        loop = asyncio.get_running_loop()
-        results = await loop.run_in_executor(
-            None,
-            lambda: ns_massbank_search(query_peaks, precursor, ion_mode, threshold, top_n),
+        results = await executors.io.run(
+            ns_massbank_search, query_peaks, precursor, ion_mode, threshold, top_n
         )
         return {"results": results}
     except Exception as e:
@@ -463,12 +803,42 @@ async def deep_spectrum_massbank_search(request: Request):
 # ──────────────────────────────────────────────────────────────
 
 from app.datafusion_service import (
-    parse_files as df_parse_files,
+    parse_text as df_parse_text,
+    parse_csv_path as df_parse_csv_path,
+    spool_upload as df_spool_upload,
     get_file_info as df_get_file_info,
     apply_mapping as df_apply_mapping,
-    detect_conflicts as df_detect_conflicts,
+    analyze_merge as df_analyze_merge,
     merge_datasets as df_merge_datasets,
+    iter_export as df_iter_export,
+    EXPORT_FORMATS as DF_EXPORT_FORMATS,
 )
+from app.datafusion_outofcore import merge_out_of_core as df_merge_out_of_core
+
+
+async def _parse_concurrently(parse, sources: Dict) -> Dict:
+    """
+    Parse {filename: source} with one task per file on the CPU pool, so a
+    multi-file request takes about as long as its largest file.  Per-file
+    errors are collected into a single ValueError.
+    """
+    names = list(sources)
+    results = await asyncio.gather(
+        *(executors.cpu.run(parse, sources[name], name) for name in names),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, ValueError):
+            raise result
+    errors = [str(result) for result in results if isinstance(result, ValueError)]
+    if errors:
+        raise ValueError("; ".join(errors))
+    return dict(zip(names, results))
+
+
+def _json_files(files: List[Dict]) -> Dict:
+    """{name, content} list → {name: content} (a repeated name keeps the last content)."""
+    return {f.get("name", "unknown.csv"): f.get("content", "") for f in files}
 
 
 @app.post("/datafusion/info")
@@ -477,10 +847,9 @@ async def datafusion_info(request: Request):
     Receive {files: [{name, content}]}, return metadata per file.
     """
     try:
-        body = await request.json()
+        body = await _read_json(request)
         files = body.get("files", [])
-        loop = asyncio.get_running_loop()
-        dfs = await loop.run_in_executor(None, lambda: df_parse_files(files))
+        dfs = await _parse_concurrently(df_parse_text, _json_files(files))
         infos = [df_get_file_info(name, df) for name, df in dfs.items()]
         return {"files": infos}
     except ValueError as e:
@@ -489,6 +858,25 @@ async def datafusion_info(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _datafusion_merge(dfs: Dict, options: Dict) -> Dict:
+    """Mapping → (single-pass dry-run analysis | merge) on already parsed frames."""
+    column_mapping = options.get("column_mapping", {})
+    key_column = options.get("key_column", "")
+    label_col = options.get("label_col", "")
+    rules = options.get("rules", {})
+    dry_run = bool(options.get("dry_run", False))
+
+    if column_mapping:
+        dfs = await executors.cpu.run(df_apply_mapping, dfs, column_mapping, key_column)
+
+    if dry_run:
+        return await executors.cpu.run(df_analyze_merge, dfs, key_column, label_col, rules)
+
+    return await executors.cpu.run(
+        df_merge_datasets, dfs, key_column, label_col, rules, dry_run=False
+    )
+
+
 @app.post("/datafusion/merge")
 async def datafusion_merge(request: Request):
     """
@@ -496,36 +884,206 @@ async def datafusion_merge(request: Request):
     If dry_run=true, returns conflict analysis without full merge.
     """
     try:
-        body = await request.json()
-        files = body.get("files", [])
-        column_mapping = body.get("column_mapping", {})
-        key_column = body.get("key_column", "")
-        label_col = body.get("label_col", "")
-        rules = body.get("rules", {})
-        dry_run = bool(body.get("dry_run", False))
+        body = await _read_json(request)
+        dfs = await _parse_concurrently(df_parse_text, _json_files(body.get("files", [])))
+        return await _datafusion_merge(dfs, body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
 
-        loop = asyncio.get_running_loop()
-        dfs = await loop.run_in_executor(None, lambda: df_parse_files(files))
 
-        if column_mapping:
-            dfs = await loop.run_in_executor(
-                None, lambda: df_apply_mapping(dfs, column_mapping, key_column)
-            )
+async def _spool_uploads(files: List[UploadFile], directory: str) -> Dict:
+    """Spool multipart uploads to `directory` block by block → {client filename: path}."""
+    paths = {}
+    for i, upload in enumerate(files):
+        name = upload.filename or f"upload_{i}.csv"
+        if name in paths:
+            raise ValueError(f"Duplicate file name '{name}'")
+        paths[name] = await executors.io.run(df_spool_upload, upload.file, directory, f"{i}_{os.path.basename(name)}")
+    return paths
+
+
+async def _parse_uploads(files: List[UploadFile], directory: str) -> Dict:
+    """
+    Spool multipart uploads to `directory`, then parse them concurrently.
+    Keyed by the client filename, like the JSON endpoints.
+    """
+    paths = await _spool_uploads(files, directory)
+    return await _parse_concurrently(df_parse_csv_path, paths)
+
+
+@app.post("/datafusion/upload/info")
+async def datafusion_upload_info(files: List[UploadFile] = File(...)):
+    """
+    Multipart variant of /datafusion/info: files are streamed to temporary
+    storage instead of being embedded as text in a JSON body.
+    """
+    try:
+        with tempfile.TemporaryDirectory(prefix="datafusion_") as tmp:
+            dfs = await _parse_uploads(files, tmp)
+        infos = [df_get_file_info(name, df) for name, df in dfs.items()]
+        return {"files": infos}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/datafusion/upload/merge")
+async def datafusion_upload_merge(files: List[UploadFile] = File(...), options: str = Form("{}")):
+    """
+    Multipart variant of /datafusion/merge.
+    options: JSON string {column_mapping, key_column, label_col, rules, dry_run}.
+    """
+    try:
+        opts = json.loads(options)
+        with tempfile.TemporaryDirectory(prefix="datafusion_") as tmp:
+            dfs = await _parse_uploads(files, tmp)
+        return await _datafusion_merge(dfs, opts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if dry_run:
-            conflicts = await loop.run_in_executor(
-                None, lambda: df_detect_conflicts(dfs, key_column, label_col)
-            )
-            result = await loop.run_in_executor(
-                None,
-                lambda: df_merge_datasets(dfs, key_column, label_col, rules, dry_run=True),
-            )
-            return {"conflicts": conflicts, "stats": result["stats"]}
 
-        result = await loop.run_in_executor(
-            None,
-            lambda: df_merge_datasets(dfs, key_column, label_col, rules, dry_run=False),
+@app.post("/datafusion/upload/merge-large")
+async def datafusion_upload_merge_large(files: List[UploadFile] = File(...), options: str = Form("{}")):
+    """
+    Out-of-core variant of /datafusion/upload/merge for inputs larger than memory.
+    Rows are hash-partitioned by key into spill files and merged partition by
+    partition; the result is returned as CSV (rows grouped by partition, not in
+    input order), with the merge stats in the X-Merge-Stats header.
+    """
+    tmp = tempfile.mkdtemp(prefix="datafusion_")
+    try:
+        opts = json.loads(options)
+        paths = await _spool_uploads(files, tmp)
+        output = os.path.join(tmp, "merged_dataset.csv")
+        stats = await executors.cpu.run(
+            df_merge_out_of_core, paths, opts, output, os.path.join(tmp, "spill")
         )
+    except ValueError as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return FileResponse(
+        output,
+        media_type="text/csv",
+        filename="merged_dataset.csv",
+        headers={"X-Merge-Stats": json.dumps(stats)},
+        background=BackgroundTask(shutil.rmtree, tmp, ignore_errors=True),
+    )
+
+
+# ── Sessions: file caricati e parsati una volta, poi riferiti per id ────────────
+
+from app.datafusion_sessions import SessionStore
+
+fusion_sessions = SessionStore()
+
+
+def _get_fusion_session(session_id: str):
+    try:
+        return fusion_sessions.get(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/datafusion/sessions")
+async def datafusion_create_session(files: List[UploadFile] = File(...)):
+    """
+    Upload (multipart) and parse files once; returns {session_id, files: [info]}.
+    Later steps use /datafusion/sessions/{session_id}/... instead of resending contents.
+    """
+    try:
+        with tempfile.TemporaryDirectory(prefix="datafusion_") as tmp:
+            dfs = await _parse_uploads(files, tmp)
+        session = await executors.cpu.run(fusion_sessions.create, dfs)
+        return {"session_id": session.id, "files": await executors.cpu.run(session.infos)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/datafusion/sessions/{session_id}")
+async def datafusion_get_session(session_id: str):
+    session = _get_fusion_session(session_id)
+    return {"session_id": session.id, "files": await executors.cpu.run(session.infos)}
+
+
+@app.post("/datafusion/sessions/{session_id}/files")
+async def datafusion_add_session_files(session_id: str, files: List[UploadFile] = File(...)):
+    """Add (or replace, by filename) files in an existing session."""
+    _get_fusion_session(session_id)
+    try:
+        with tempfile.TemporaryDirectory(prefix="datafusion_") as tmp:
+            dfs = await _parse_uploads(files, tmp)
+        session = await executors.cpu.run(fusion_sessions.add_files, session_id, dfs)
+        return {"session_id": session.id, "files": await executors.cpu.run(session.infos)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/datafusion/sessions/{session_id}/files/{filename}")
+def datafusion_remove_session_file(session_id: str, filename: str):
+    session = _get_fusion_session(session_id)
+    try:
+        session.remove_file(filename)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"session_id": session.id, "files": [info["name"] for info in session.infos()]}
+
+
+@app.delete("/datafusion/sessions/{session_id}")
+def datafusion_delete_session(session_id: str):
+    try:
+        fusion_sessions.delete(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"deleted": session_id}
+
+
+@app.post("/datafusion/sessions/{session_id}/merge")
+async def datafusion_session_merge(session_id: str, request: Request):
+    """
+    Same body and response as /datafusion/merge, without "files".
+    Only files whose mapping changed are re-mapped; dry-run analysis and
+    merged frame are reused while files, mapping and rules are unchanged.
+    """
+    session = _get_fusion_session(session_id)
+    try:
+        body = await _read_json(request)
+        result = await executors.cpu.run(session.merge, body)
+        fusion_sessions.touch(session)
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/datafusion/sessions/{session_id}/preview")
+async def datafusion_session_preview(session_id: str, request: Request):
+    """
+    Body as /datafusion/sessions/{id}/merge plus "offset" and "limit" (max 1000).
+    Returns {stats, columns, data, offset, limit, total}: one page of the merged rows.
+    """
+    session = _get_fusion_session(session_id)
+    try:
+        body = await _read_json(request)
+        result = await executors.cpu.run(session.preview, body)
+        fusion_sessions.touch(session)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -534,6 +1092,151 @@ async def datafusion_merge(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/datafusion/sessions/{session_id}/export")
+async def datafusion_session_export(session_id: str, request: Request):
+    """
+    Body as /datafusion/sessions/{id}/merge plus "format": csv | ndjson | parquet.
+    The merged dataset is streamed in chunks instead of one JSON response;
+    the merge stats are returned in the X-Merge-Stats header.
+    """
+    session = _get_fusion_session(session_id)
+    try:
+        body = await _read_json(request)
+        fmt = body.get("format", "csv")
+        frame, stats = await executors.cpu.run(session.merged, body)
+        fusion_sessions.touch(session)
+        chunks = df_iter_export(frame, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    media_type, extension = DF_EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        executors.cpu.iterate(chunks),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="merged_dataset.{extension}"',
+            "X-Merge-Stats": json.dumps(stats),
+        },
+    )
+
+
+# ── Dataset persistiti: risultato del merge su disco, aggiornato in append ──────
+
+from app.datafusion_store import DatasetStore
+
+fusion_datasets = DatasetStore()
+
+
+def _get_fusion_dataset(name: str) -> Dict:
+    try:
+        return fusion_datasets.info(name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/datafusion/datasets")
+async def datafusion_list_datasets():
+    return {"datasets": await executors.io.run(fusion_datasets.list)}
+
+
+@app.post("/datafusion/datasets")
+async def datafusion_create_dataset(files: List[UploadFile] = File(...), options: str = Form("{}")):
+    """
+    Merge the uploaded files into a new persisted dataset.
+    options: JSON string {name, column_mapping, key_column, label_col, rules};
+    the rules are kept for every later append.
+    """
+    try:
+        opts = json.loads(options)
+        with tempfile.TemporaryDirectory(prefix="datafusion_") as tmp:
+            dfs = await _parse_uploads(files, tmp)
+        return await executors.cpu.run(fusion_datasets.create, opts.get("name", ""), dfs, opts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/datafusion/datasets/{name}")
+def datafusion_get_dataset(name: str):
+    return _get_fusion_dataset(name)
+
+
+@app.post("/datafusion/datasets/{name}/append")
+async def datafusion_append_dataset(name: str, files: List[UploadFile] = File(...), options: str = Form("{}")):
+    """
+    Merge the uploaded files into the dataset: only the incoming rows are
+    deduplicated, and conflict flags are recomputed only for the keys they touch.
+    options: JSON string {column_mapping}.  Returns the dataset info with the
+    updated stats plus "append": {input_rows, inserted, replaced, duplicates, keys_touched}.
+    """
+    _get_fusion_dataset(name)
+    try:
+        opts = json.loads(options)
+        with tempfile.TemporaryDirectory(prefix="datafusion_") as tmp:
+            dfs = await _parse_uploads(files, tmp)
+        return await executors.cpu.run(fusion_datasets.append, name, dfs, opts.get("column_mapping", {}))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/datafusion/datasets/{name}/preview")
+async def datafusion_preview_dataset(name: str, offset: int = 0, limit: int = 50):
+    """One page of the merged rows: {stats, columns, data, offset, limit, total}."""
+    _get_fusion_dataset(name)
+    try:
+        return await executors.io.run(fusion_datasets.page, name, offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/datafusion/datasets/{name}/export")
+async def datafusion_export_dataset(name: str, format: str = "csv"):
+    """Stream the dataset as csv | ndjson | parquet; stats in the X-Merge-Stats header."""
+    _get_fusion_dataset(name)
+    try:
+        frame, stats = await executors.io.run(fusion_datasets.frame, name)
+        chunks = df_iter_export(frame, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    media_type, extension = DF_EXPORT_FORMATS[format]
+    return StreamingResponse(
+        executors.cpu.iterate(chunks),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}.{extension}"',
+            "X-Merge-Stats": json.dumps(stats),
+        },
+    )
+
+
+@app.delete("/datafusion/datasets/{name}")
+def datafusion_delete_dataset(name: str):
+    try:
+        fusion_datasets.delete(name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"deleted": name}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+import io
+from sklearn.model_selection import train_test_split, KFold, StratifiedKFold
 from sklearn.ensemble import AdaBoostClassifier, GradientBoostingClassifier, RandomForestClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.linear_model import SGDClassifier
@@ -9,31 +10,181 @@ from sklearn.naive_bayes import GaussianNB
 from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix, r2_score, roc_auc_score
 from sklearn.inspection import permutation_importance
-import joblib
 import os
 from pathlib import Path
 import json
 import time
+from datetime import datetime
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import as_completed, wait
+
+from app import executors
+from app import instrumentation
+from app.model_registry import ModelRegistry
+from app.model_store import ModelStore
+
+MODEL_CLASSES = {
+    "AdaBoost": AdaBoostClassifier,
+    "Gradient Boosting": GradientBoostingClassifier,
+    "Random Forest": RandomForestClassifier,
+    "Decision Tree": DecisionTreeClassifier,
+    "SGD": SGDClassifier,
+    "KNN": KNeighborsClassifier,
+    "Naive Bayes": GaussianNB,
+    "SVM": SVC
+}
+
+# Stimatori il cui fit in memoria ha dei checkpoint di cancellazione (vedi _fit):
+# Gradient Boosting dopo ogni stage, Random Forest tra un blocco di alberi e il successivo
+INTERRUPTIBLE_MODELS = {"Gradient Boosting", "Random Forest"}
+FOREST_BATCHES = 10
+
+
+def _fit(ModelClass, params: dict, X_train, y_train, checkpoint=None):
+    """
+    Allena ModelClass(**params). checkpoint() (che solleva per interrompere) è chiamato
+    durante il fit degli stimatori in INTERRUPTIBLE_MODELS, altrimenti solo prima del fit.
+    """
+    model = ModelClass(**params)
+    if checkpoint is None:
+        model.fit(X_train, y_train)
+    elif isinstance(model, GradientBoostingClassifier):
+        # Il monitor è chiamato dopo ogni stage di boosting (un valore vero fermerebbe il fit)
+        model.fit(X_train, y_train, monitor=lambda i, estimator, env: checkpoint())
+    elif isinstance(model, RandomForestClassifier) and not model.warm_start:
+        # warm_start aggiunge alberi a blocchi: con lo stesso random_state la foresta
+        # finale è identica a quella di un fit unico
+        total = model.n_estimators
+        step = max(1, -(-total // FOREST_BATCHES))
+        model.set_params(warm_start=True)
+        for n_estimators in range(step, total + step, step):
+            checkpoint()
+            model.set_params(n_estimators=min(n_estimators, total))
+            model.fit(X_train, y_train)
+        model.set_params(warm_start=False)
+    else:
+        checkpoint()
+        model.fit(X_train, y_train)
+    return model
+
+
+def fit_and_evaluate(ModelClass, params: dict, task_type: str, X_train, y_train, X_test, y_test,
+                     checkpoint=None):
+    """Allena un modello e calcola le metriche train/test. Returns: (modello, metriche)"""
+    start_time = time.time()
+
+    with instrumentation.span("train_fit"):
+        model = _fit(ModelClass, params, X_train, y_train, checkpoint)
+
+    training_time = time.time() - start_time
+
+    with instrumentation.span("train_predict"):
+        y_pred = model.predict(X_test)
+        y_train_pred = model.predict(X_train)
+
+    # Fase "train_metrics": dal calcolo delle metriche fino al return
+    metrics_start = time.perf_counter()
+    metrics = {
+        "accuracy": float(accuracy_score(y_test, y_pred)),
+        "precision": float(precision_score(y_test, y_pred, average='weighted', zero_division=0)),
+        "recall": float(recall_score(y_test, y_pred, average='weighted', zero_division=0)),
+        "f1_score": float(f1_score(y_test, y_pred, average='weighted', zero_division=0)),
+    }
+
+    if task_type == 'regression':
+        metrics["r2_score"] = float(r2_score(y_test, y_pred))
+        metrics["train_r2"] = float(r2_score(y_train, y_train_pred))
+    else:
+        metrics["r2_score"] = None
+        metrics["train_r2"] = None
+
+    # AUC-ROC (solo per classificazione)
+    if task_type != 'regression':
+        try:
+            if hasattr(model, 'predict_proba'):
+                y_proba = model.predict_proba(X_test)
+                if y_proba.shape[1] == 2:
+                    metrics["auc_roc"] = float(roc_auc_score(y_test, y_proba[:, 1]))
+                else:
+                    metrics["auc_roc"] = float(roc_auc_score(y_test, y_proba, multi_class='ovr', average='weighted'))
+            else:
+                metrics["auc_roc"] = None
+        except Exception:
+            metrics["auc_roc"] = None
+    else:
+        metrics["auc_roc"] = None
+
+    metrics["train_accuracy"] = float(accuracy_score(y_train, y_train_pred))
+    metrics["overfit_gap"] = metrics["train_accuracy"] - metrics["accuracy"]
+    metrics["training_time_seconds"] = round(training_time, 3)
+    metrics["n_train_samples"] = len(y_train)
+    metrics["n_test_samples"] = len(y_test)
+
+    instrumentation.record("train_metrics", time.perf_counter() - metrics_start)
+    return model, metrics
+
+
+def _cv_fold_worker(model_name: str, params: dict, task_type: str, data_dir: str, fold: int):
+    """Eseguito in un processo figlio: allena e valuta un fold leggendo X/y in memory-map"""
+    data = Path(data_dir)
+    X = np.load(data / "X.npy", mmap_mode="r")
+    y = np.load(data / "y.npy", mmap_mode="r")
+    folds = np.load(data / "folds.npz")
+    train_idx, test_idx = folds[f"train_{fold}"], folds[f"test_{fold}"]
+
+    _, metrics = fit_and_evaluate(
+        MODEL_CLASSES[model_name], params, task_type, X[train_idx], y[train_idx], X[test_idx], y[test_idx]
+    )
+    return fold, metrics
+
 
 class MLService:
-    def __init__(self):
+    def __init__(self, persist_splits: bool = False, split_dtype=np.float64, model_compress: int = 0,
+                 splits_cache_size: int = 4):
         self.datasets_dir = Path("datasets")
         self.models_dir = Path("trained_models")
-        self.models_dir.mkdir(exist_ok=True)
-        
-        self.model_classes = {
-            "AdaBoost": AdaBoostClassifier,
-            "Gradient Boosting": GradientBoostingClassifier,
-            "Random Forest": RandomForestClassifier,
-            "Decision Tree": DecisionTreeClassifier,
-            "SGD": SGDClassifier,
-            "KNN": KNeighborsClassifier,
-            "Naive Bayes": GaussianNB,
-            "SVM": SVC
+        # Artefatti: scrittura atomica, compressione configurabile, caricamento in mmap se non compressi
+        self.model_store = ModelStore(self.models_dir, compress=model_compress)
+        # Indice dei modelli (SQLite): elenco/filtri senza aprire ogni _metadata.json
+        self.registry = ModelRegistry(self.models_dir / "registry.sqlite3")
+        if self.registry.is_empty():
+            self.registry.rebuild(self.models_dir)
+        self.splits_dir = self.models_dir / "splits"
+        self.persist_splits = persist_splits
+        self.split_dtype = split_dtype
+        
+        self.model_classes = MODEL_CLASSES
+        
+        self.model_params = {
+            "AdaBoost": {"n_estimators": 100, "learning_rate": 1.0, "random_state": 42},
+            "Gradient Boosting": {"n_estimators": 100, "learning_rate": 0.1, "max_depth": 3, "random_state": 42},
+            "Random Forest": {"n_estimators": 100, "random_state": 42, "n_jobs": -1},
+            "Decision Tree": {"random_state": 42},
+            "SGD": {"loss": "hinge", "max_iter": 1000, "random_state": 42},
+            "KNN": {"n_neighbors": 5},
+            "Naive Bayes": {},
+            "SVM": {"probability": True, "random_state": 42}
         }
-        
+
+        # Modelli addestrabili in streaming (partial_fit) su dataset più grandi della memoria
+        self.streaming_models = {"SGD", "Naive Bayes"}
+
         self.trained_models = {}
         self.datasets_cache = {}
+        # Split memoizzati: (dataset, features, test_size, random_state) → array contigui.
+        # LRU limitata: ogni voce tiene copie complete di X_train/X_test/y_train/y_test
+        self.splits_cache = OrderedDict()
+        self.splits_cache_size = max(int(splits_cache_size), 1)
+        self._splits_lock = threading.Lock()
+        # Predizioni sul test set per versione dell'artefatto: model_key → {version, ...}
+        self.predictions_cache = {}
+        self._predictions_lock = threading.Lock()
+        # Indici dei fold di cross-validation: (dataset, feature, k, stratified, seed) → [(train, test)].
+        # LRU con lo stesso limite degli split: ogni voce tiene k copie degli indici di riga
+        self.folds_cache = OrderedDict()
     
     def _detect_task_type(self, y):
         """
@@ -136,105 +287,117 @@ class MLService:
         
         return info
     
+    def _resolve_features(self, filename: str, selected_features: list = None):
+        """Colonne numeriche effettivamente usate per una selezione di feature"""
+        numeric_features = self.datasets_cache[filename]["info"]["features"]
+        if selected_features:
+            # Filtra solo le colonne numeriche tra quelle selezionate
+            return [c for c in selected_features if c in numeric_features]
+        return list(numeric_features)
+
+    def _split_path(self, key):
+        """Percorso su disco degli indici di split per una chiave"""
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+        return self.splits_dir / f"{digest}.npz"
+
+    def _split_indices(self, key, n_rows: int, stratify):
+        """Indici train/test: da disco se persistiti, altrimenti train_test_split"""
+        path = self._split_path(key)
+        if self.persist_splits and path.exists():
+            stored = np.load(path)
+            if int(stored["n_rows"]) == n_rows:
+                return stored["train_idx"], stored["test_idx"]
+
+        _, _, test_size, random_state = key
+        train_idx, test_idx = train_test_split(
+            np.arange(n_rows), test_size=test_size, random_state=random_state, stratify=stratify
+        )
+
+        if self.persist_splits:
+            self.splits_dir.mkdir(exist_ok=True)
+            np.savez(path, train_idx=train_idx, test_idx=test_idx, n_rows=n_rows)
+        return train_idx, test_idx
+
+    def _feature_matrix(self, filename: str, cols: list):
+        """X (contiguo, self.split_dtype) e y per le colonne date, senza righe con NaN"""
+        df = self.datasets_cache[filename]["data"]
+        target_col = df.columns[-1]
+
+        # Rimuovi righe con NaN nelle colonne usate (senza copiare l'intero frame)
+        subset = df[cols + [target_col]]
+        keep = subset.notna().all(axis=1).to_numpy()
+        X = np.ascontiguousarray(subset[cols].to_numpy(dtype=self.split_dtype)[keep])
+        y = subset[target_col].to_numpy()[keep]
+        return X, y
+
     def prepare_data(self, filename: str, test_size: float, random_state: int, selected_features: list = None):
-        """Prepara i dati per training e test"""
+        """
+        Prepara i dati per training e test.
+        Lo split è memoizzato per (dataset, feature, test_size, random_state):
+        chiamate ripetute (predict, permutation importance) restituiscono gli stessi array.
+        """
         if filename not in self.datasets_cache:
             self.load_dataset(filename)
 
-        df = self.datasets_cache[filename]["data"].copy()
-        target_col = df.columns[-1]
-        task_type = self.datasets_cache[filename]["info"]["task_type"]
-        numeric_features = self.datasets_cache[filename]["info"]["features"]
+        cols = self._resolve_features(filename, selected_features)
+        key = (filename, tuple(cols), float(test_size), random_state)
 
-        if selected_features:
-            # Filtra solo le colonne numeriche tra quelle selezionate
-            cols = [c for c in selected_features if c in numeric_features]
-        else:
-            cols = numeric_features
+        cached = self.splits_cache.get(key)
+        if cached is not None:
+            self._touch_split(key)
+            return cached
 
-        # Rimuovi righe con NaN nelle colonne usate
-        subset = df[cols + [target_col]].dropna()
-        X = subset[cols].values
-        y = subset[target_col].values
+        with self._splits_lock:
+            cached = self.splits_cache.get(key)
+            if cached is not None:
+                self.splits_cache.move_to_end(key)
+                return cached
 
-        stratify = y if task_type == 'classification' else None
+            task_type = self.datasets_cache[filename]["info"]["task_type"]
+            X, y = self._feature_matrix(filename, cols)
 
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state, stratify=stratify
-        )
+            stratify = y if task_type == 'classification' else None
+            train_idx, test_idx = self._split_indices(key, len(y), stratify)
 
-        return X_train, X_test, y_train, y_test
-    
-    def train_model(self, dataset: str, model_name: str, X_train, y_train, X_test, y_test, selected_features=None):
-        """Allena un singolo modello"""
-        start_time = time.time()
-        
+            split = (
+                np.ascontiguousarray(X[train_idx]),
+                np.ascontiguousarray(X[test_idx]),
+                y[train_idx],
+                y[test_idx],
+            )
+            self.splits_cache[key] = split
+            while len(self.splits_cache) > self.splits_cache_size:
+                self.splits_cache.popitem(last=False)
+
+        return split
+
+    def _touch_split(self, key):
+        """Segna uno split come usato di recente (può essere stato appena rimosso da un altro thread)"""
+        try:
+            self.splits_cache.move_to_end(key)
+        except KeyError:
+            pass
+
+    def train_model(self, dataset: str, model_name: str, X_train, y_train, X_test, y_test, selected_features=None,
+                    params=None, checkpoint=None):
+        """
+        Allena un singolo modello (params: iperparametri espliciti, default self.model_params).
+        checkpoint: callback di cancellazione chiamato durante il fit (vedi _fit)
+        """
         task_type = self.datasets_cache[dataset]["info"]["task_type"]
         
         ModelClass = self.model_classes[model_name]
         
-        params = {
-            "AdaBoost": {"n_estimators": 100, "learning_rate": 1.0, "random_state": 42},
-            "Gradient Boosting": {"n_estimators": 100, "learning_rate": 0.1, "max_depth": 3, "random_state": 42},
-            "Random Forest": {"n_estimators": 100, "random_state": 42, "n_jobs": -1},
-            "Decision Tree": {"random_state": 42},
-            "SGD": {"loss": "hinge", "max_iter": 1000, "random_state": 42},
-            "KNN": {"n_neighbors": 5},
-            "Naive Bayes": {},
-            "SVM": {"probability": True, "random_state": 42}
-        }
-        
-        model = ModelClass(**params[model_name])
-        model.fit(X_train, y_train)
+        if params is None:
+            params = self.model_params[model_name]
         
-        training_time = time.time() - start_time
-        
-        y_pred = model.predict(X_test)
-        y_train_pred = model.predict(X_train)
-        
-        metrics = {
-            "accuracy": float(accuracy_score(y_test, y_pred)),
-            "precision": float(precision_score(y_test, y_pred, average='weighted', zero_division=0)),
-            "recall": float(recall_score(y_test, y_pred, average='weighted', zero_division=0)),
-            "f1_score": float(f1_score(y_test, y_pred, average='weighted', zero_division=0)),
-        }
-        
-        if task_type == 'regression':
-            metrics["r2_score"] = float(r2_score(y_test, y_pred))
-            metrics["train_r2"] = float(r2_score(y_train, y_train_pred))
-        else:
-            metrics["r2_score"] = None
-            metrics["train_r2"] = None
-        
-        # AUC-ROC (solo per classificazione)
-        if task_type != 'regression':
-            try:
-                if hasattr(model, 'predict_proba'):
-                    y_proba = model.predict_proba(X_test)
-                    if y_proba.shape[1] == 2:
-                        metrics["auc_roc"] = float(roc_auc_score(y_test, y_proba[:, 1]))
-                    else:
-                        metrics["auc_roc"] = float(roc_auc_score(y_test, y_proba, multi_class='ovr', average='weighted'))
-                else:
-                    metrics["auc_roc"] = None
-            except Exception:
-                metrics["auc_roc"] = None
-        else:
-            metrics["auc_roc"] = None
-
-        metrics["train_accuracy"] = float(accuracy_score(y_train, y_train_pred))
-        metrics["overfit_gap"] = metrics["train_accuracy"] - metrics["accuracy"]
-        metrics["training_time_seconds"] = round(training_time, 3)
-        metrics["n_train_samples"] = len(y_train)
-        metrics["n_test_samples"] = len(y_test)
+        model, metrics = fit_and_evaluate(ModelClass, params, task_type, X_train, y_train, X_test, y_test,
+                                          checkpoint)
         
         model_key = f"{dataset}_{model_name.replace(' ', '_')}"
-        model_path = self.models_dir / f"{model_key}.joblib"
-        joblib.dump(model, model_path)
         
-        from datetime import datetime
-        all_features = self.datasets_cache[dataset]["info"]["features"]
-        used_features = selected_features if selected_features else all_features
+        # Salva le colonne effettivamente usate (stesso ordine delle colonne di X)
+        used_features = self._resolve_features(dataset, selected_features)
 
         metadata = {
             "dataset": dataset,
@@ -244,100 +407,540 @@ class MLService:
             "feature_count": X_train.shape[1],
             "selected_features": used_features,
             "trained_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "parameters": params[model_name]
+            "parameters": params
         }
         
-        metadata_path = self.models_dir / f"{model_key}_metadata.json"
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        with instrumentation.span("train_save"):
+            self._save_model(model_key, model, metadata)
         
+        return metrics
+
+    def _cv_folds(self, filename: str, cols: list, y, n_splits: int, stratified: bool, random_state: int):
+        """Indici dei fold (memoizzati per dataset, feature e seed)"""
+        key = (filename, tuple(cols), n_splits, stratified, random_state)
+        with self._splits_lock:
+            folds = self.folds_cache.get(key)
+            if folds is not None:
+                self.folds_cache.move_to_end(key)
+                return folds
+            splitter_class = StratifiedKFold if stratified else KFold
+            splitter = splitter_class(n_splits=n_splits, shuffle=True, random_state=random_state)
+            folds = self.folds_cache[key] = list(splitter.split(np.zeros(len(y)), y))
+            while len(self.folds_cache) > self.splits_cache_size:
+                self.folds_cache.popitem(last=False)
+        return folds
+
+    def cross_validate_model(self, dataset: str, model_name: str, selected_features=None,
+                             n_splits: int = 5, stratified: bool = True, random_state: int = 42,
+                             test_size: float = 0.2, on_fold=None):
+        """
+        K-fold (o stratified k-fold) con i fold eseguiti in parallelo sul process pool
+        condiviso (executors.cpu_process, contesto spawn).
+        X/y sono scritti una volta su .npy e letti in memory-map dai worker.
+        In parallelo ai fold viene allenato e salvato il modello sul consueto split train/test,
+        così /predict e feature importance restano disponibili.
+        on_fold(fold, metrics, completati, totale) è chiamato a ogni fold terminato.
+        Returns: metriche del modello salvato + "cv": {mean, std, folds}
+        """
+        if dataset not in self.datasets_cache:
+            self.load_dataset(dataset)
+
+        task_type = self.datasets_cache[dataset]["info"]["task_type"]
+        params = dict(self.model_params[model_name])
+        cols = self._resolve_features(dataset, selected_features)
+        X, y = self._feature_matrix(dataset, cols)
+        stratified = stratified and task_type == 'classification'
+        folds = self._cv_folds(dataset, cols, y, n_splits, stratified, random_state)
+
+        fold_params = dict(params)
+        if "n_jobs" in fold_params:
+            fold_params["n_jobs"] = 1   # il parallelismo è sui fold
+
+        fold_metrics = [None] * len(folds)
+        with tempfile.TemporaryDirectory(prefix="cv_") as data_dir:
+            np.save(Path(data_dir) / "X.npy", X)
+            # Etichette stringa → codici interi (ordinati) per poterle mappare in memoria
+            y_shared = np.unique(y, return_inverse=True)[1] if y.dtype == object else y
+            np.save(Path(data_dir) / "y.npy", y_shared)
+            np.savez(
+                Path(data_dir) / "folds.npz",
+                **{f"train_{i}": tr for i, (tr, _) in enumerate(folds)},
+                **{f"test_{i}": te for i, (_, te) in enumerate(folds)}
+            )
+
+            futures = [
+                executors.cpu_process.submit(_cv_fold_worker, model_name, fold_params, task_type, data_dir, i)
+                for i in range(len(folds))
+            ]
+            try:
+                # Il modello finale si allena nel thread corrente mentre i fold girano
+                X_train, X_test, y_train, y_test = self.prepare_data(dataset, test_size, random_state, selected_features)
+                metrics = self.train_model(dataset, model_name, X_train, y_train, X_test, y_test, selected_features)
+
+                for done, future in enumerate(as_completed(futures), start=1):
+                    fold, result = future.result()
+                    fold_metrics[fold] = result
+                    if on_fold:
+                        on_fold(fold, result, done, len(folds))
+            except BaseException:
+                # es. cancellazione del job da on_fold: i fold non ancora avviati non partono,
+                # quelli in corso finiscono prima che la directory con X/y venga rimossa
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                raise
+
+        summary = {"mean": {}, "std": {}, "folds": fold_metrics, "n_splits": len(folds), "stratified": stratified}
+        for name in metrics:
+            values = [m[name] for m in fold_metrics if m.get(name) is not None]
+            if values and name not in ("n_train_samples", "n_test_samples"):
+                summary["mean"][name] = float(np.mean(values))
+                summary["std"][name] = float(np.std(values))
+
+        # metrics è lo stesso dict salvato nel metadata del modello
+        metrics["cv"] = summary
+        model_key = f"{dataset}_{model_name.replace(' ', '_')}"
+        self._write_metadata(model_key, self.trained_models[model_key]["metadata"])
+
+        return metrics
+
+    def _save_model(self, model_key: str, model, metadata: dict):
+        """Salva modello (joblib) e metadata su disco e aggiorna la cache in memoria"""
+        model_path = self.model_store.save_model(model_key, model)
+
+        self._write_metadata(model_key, metadata, model_path)
+
         self.trained_models[model_key] = {
             "model": model,
-            "metadata": metadata
+            "metadata": metadata,
+            "version": model_path.stat().st_mtime_ns
         }
-        
-        return metrics
     
-    def predict(self, dataset: str, model_name: str):
-        """Usa un modello trainato per fare predizioni sul test set"""
+    def _write_metadata(self, model_key: str, metadata: dict, model_path: Path = None):
+        """Scrive il _metadata.json di un modello e aggiorna il registry"""
+        self.model_store.save_metadata(model_key, metadata)
+        self.registry.upsert(model_key, metadata, model_path)
+
+    # ──────────────────────────────────────────────────────────────
+    #  Training out-of-core (partial_fit su chunk del CSV)
+    # ──────────────────────────────────────────────────────────────
+
+    def _read_csv_chunks(self, filepath: Path, chunksize: int, encoding: str):
+        """Itera il CSV a blocchi di chunksize righe"""
+        return pd.read_csv(filepath, chunksize=chunksize, encoding=encoding)
+
+    def _holdout_mask(self, start: int, n_rows: int, test_size: float, random_state: int):
+        """
+        Partizione di test riproducibile: hash dell'indice globale di riga (con seed)
+        → la stessa riga finisce sempre nella stessa partizione, indipendentemente dal chunksize.
+        """
+        seed_offset = np.uint64((random_state * 0x9E3779B97F4A7C15) % 2**64)
+        row_idx = np.arange(start, start + n_rows, dtype=np.uint64) + seed_offset
+        hashed = pd.util.hash_array(row_idx)
+        return (hashed % np.uint64(10000)) < np.uint64(int(test_size * 10000))
+
+    @staticmethod
+    def _metrics_from_confusion(cm: np.ndarray):
+        """Accuracy e metriche pesate (come average='weighted', zero_division=0) da una confusion matrix"""
+        cm = cm.astype(float)
+        tp = np.diag(cm)
+        support = cm.sum(axis=1)
+        predicted = cm.sum(axis=0)
+        total = support.sum()
+
+        precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+        recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+        denom = precision + recall
+        f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+        weights = support / total if total > 0 else support
+
+        return {
+            "accuracy": float(tp.sum() / total) if total > 0 else 0.0,
+            "precision": float((precision * weights).sum()),
+            "recall": float((recall * weights).sum()),
+            "f1_score": float((f1 * weights).sum()),
+        }
+
+    @staticmethod
+    def _numeric_chunk(chunk: pd.DataFrame, cols: list, target_col: str) -> pd.DataFrame:
+        """
+        Colonne usate di un chunk, feature convertite a numero: i tipi sono dedotti
+        dalle prime 100 righe, un valore non numerico più avanti diventa NaN (riga scartata)
+        """
+        features = chunk[cols].apply(pd.to_numeric, errors="coerce")
+        features[target_col] = chunk[target_col]
+        return features
+
+    def train_model_streaming(self, dataset: str, model_name: str, selected_features=None,
+                              test_size: float = 0.2, random_state: int = 42,
+                              chunksize: int = 50000, progress_callback=None):
+        """
+        Allena un modello con partial_fit leggendo il CSV a chunk (memoria limitata dal chunksize).
+        Pass 1: classi e numero di righe. Pass 2: training sulle righe di train.
+        Pass 3: valutazione in streaming (confusion matrix accumulata) su train e test.
+        """
+        if model_name not in self.streaming_models:
+            raise ValueError(f"Model {model_name} does not support streaming training")
+
+        start_time = time.time()
+        filepath = self.datasets_dir / "testing_station" / dataset
+
+        # Header con lo stesso fallback di encoding delle passate successive
+        encoding = "utf-8"
+        try:
+            header = pd.read_csv(filepath, nrows=100, encoding=encoding)
+        except UnicodeDecodeError:
+            encoding = "latin-1"
+            header = pd.read_csv(filepath, nrows=100, encoding=encoding)
+        target_col = header.columns[-1]
+        numeric_features = [c for c in header.columns[:-1] if pd.api.types.is_numeric_dtype(header[c])]
+        cols = [c for c in selected_features if c in numeric_features] if selected_features else numeric_features
+
+        # ── Pass 1: classi del target e numero di righe ─────────────
+        try:
+            classes, n_rows = self._scan_classes(filepath, target_col, chunksize, encoding)
+        except UnicodeDecodeError:
+            encoding = "latin-1"
+            classes, n_rows = self._scan_classes(filepath, target_col, chunksize, encoding)
+        total_steps = 2 * max(1, -(-n_rows // chunksize))
+        step = 0
+
+        def report():
+            if progress_callback:
+                progress_callback(step / total_steps)
+
+        model = self.model_classes[model_name](**self.model_params[model_name])
+
+        # ── Pass 2: partial_fit sulle righe di train ────────────────
+        offset = 0
+        n_train = n_test = 0
+        for chunk in self._read_csv_chunks(filepath, chunksize, encoding):
+            is_test = self._holdout_mask(offset, len(chunk), test_size, random_state)
+            offset += len(chunk)
+            chunk = self._numeric_chunk(chunk, cols, target_col)
+            valid = chunk.notna().all(axis=1).to_numpy()
+            train_rows = valid & ~is_test
+            n_test += int((valid & is_test).sum())
+            if train_rows.any():
+                X = chunk[cols].to_numpy(dtype=np.float64)[train_rows]
+                y = chunk[target_col].to_numpy()[train_rows]
+                model.partial_fit(X, y, classes=classes)
+                n_train += len(y)
+            step += 1
+            report()
+
+        if n_train == 0:
+            raise ValueError("No training rows available after NaN removal")
+        training_time = time.time() - start_time
+
+        # ── Pass 3: valutazione in streaming ────────────────────────
+        cm_test = np.zeros((len(classes), len(classes)), dtype=np.int64)
+        cm_train = np.zeros_like(cm_test)
+        offset = 0
+        for chunk in self._read_csv_chunks(filepath, chunksize, encoding):
+            is_test = self._holdout_mask(offset, len(chunk), test_size, random_state)
+            offset += len(chunk)
+            chunk = self._numeric_chunk(chunk, cols, target_col)
+            valid = chunk.notna().all(axis=1).to_numpy()
+            if valid.any():
+                X = chunk[cols].to_numpy(dtype=np.float64)[valid]
+                y = chunk[target_col].to_numpy()[valid]
+                y_pred = model.predict(X)
+                test_rows = is_test[valid]
+                cm_test += confusion_matrix(y[test_rows], y_pred[test_rows], labels=classes)
+                cm_train += confusion_matrix(y[~test_rows], y_pred[~test_rows], labels=classes)
+            step += 1
+            report()
+
+        metrics = self._metrics_from_confusion(cm_test)
+        metrics["r2_score"] = None
+        metrics["train_r2"] = None
+        metrics["auc_roc"] = None
+        metrics["train_accuracy"] = self._metrics_from_confusion(cm_train)["accuracy"]
+        metrics["overfit_gap"] = metrics["train_accuracy"] - metrics["accuracy"]
+        metrics["training_time_seconds"] = round(training_time, 3)
+        metrics["n_train_samples"] = n_train
+        metrics["n_test_samples"] = n_test
+
+        metadata = {
+            "dataset": dataset,
+            "model_name": model_name,
+            "task_type": "classification",
+            "metrics": metrics,
+            "feature_count": len(cols),
+            "selected_features": cols,
+            "trained_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "parameters": self.model_params[model_name],
+            "training_mode": "streaming",
+            "chunksize": chunksize,
+            # Partizione di test (_holdout_mask): /predict la ricostruisce con la stessa regola
+            "test_size": test_size,
+            "random_state": random_state,
+            "encoding": encoding
+        }
         model_key = f"{dataset}_{model_name.replace(' ', '_')}"
-        
+        self._save_model(model_key, model, metadata)
+
+        return metrics
+
+    def _streaming_test_set(self, dataset: str, cols: list, test_size: float, random_state: int,
+                            chunksize: int, encoding: str):
+        """
+        Righe di test di un modello allenato in streaming: stessa regola di hash
+        (_holdout_mask) e stesso filtro delle righe del training, letti a chunk
+        """
+        filepath = self.datasets_dir / "testing_station" / dataset
+        target_col = pd.read_csv(filepath, nrows=0, encoding=encoding).columns[-1]
+        X_parts, y_parts = [], []
+        offset = 0
+        for chunk in self._read_csv_chunks(filepath, chunksize, encoding):
+            is_test = self._holdout_mask(offset, len(chunk), test_size, random_state)
+            offset += len(chunk)
+            chunk = self._numeric_chunk(chunk, cols, target_col)
+            rows = chunk.notna().all(axis=1).to_numpy() & is_test
+            X_parts.append(chunk[cols].to_numpy(dtype=np.float64)[rows])
+            y_parts.append(chunk[target_col].to_numpy()[rows])
+        return np.concatenate(X_parts), np.concatenate(y_parts)
+
+    def _evaluation_set(self, dataset: str, metadata: dict, features):
+        """Test set su cui valutare un modello salvato: lo split train/test oppure l'holdout dello streaming"""
+        if metadata.get("training_mode") == "streaming":
+            # Il test set del training in streaming non è quello di train_test_split
+            return self._streaming_test_set(
+                dataset, features,
+                metadata.get("test_size", 0.2), metadata.get("random_state", 42),
+                metadata.get("chunksize", 50000), metadata.get("encoding", "utf-8"),
+            )
+        X_train, X_test, y_train, y_test = self.prepare_data(dataset, 0.2, 42, features)
+        return X_test, y_test
+
+    def _scan_classes(self, filepath: Path, target_col: str, chunksize: int, encoding: str):
+        """Primo passaggio in streaming: valori distinti del target e numero totale di righe"""
+        classes = None
+        n_rows = 0
+        for chunk in pd.read_csv(filepath, usecols=[target_col], chunksize=chunksize, encoding=encoding):
+            n_rows += len(chunk)
+            values = np.unique(chunk[target_col].dropna().to_numpy())
+            classes = values if classes is None else np.union1d(classes, values)
+        if classes is None or len(classes) < 2:
+            raise ValueError("Streaming training needs at least two target classes")
+        return classes, n_rows
+
+    def _load_model(self, model_key: str):
+        """Carica modello + metadata (da memoria o da disco) e restituisce la entry in cache"""
         if model_key not in self.trained_models:
-            model_path = self.models_dir / f"{model_key}.joblib"
-            if not model_path.exists():
-                raise ValueError(f"Model {model_key} not found. Train it first.")
-            
-            model = joblib.load(model_path)
-            
-            metadata_path = self.models_dir / f"{model_key}_metadata.json"
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-            
+            model = self.model_store.load_model(model_key)
+            metadata = self.model_store.load_metadata(model_key)
+
             self.trained_models[model_key] = {
                 "model": model,
-                "metadata": metadata
+                "metadata": metadata,
+                "version": self.model_store.model_path(model_key).stat().st_mtime_ns
             }
-        
-        task_type = self.trained_models[model_key]["metadata"]["task_type"]
-        selected_features = self.trained_models[model_key]["metadata"].get("selected_features")
 
-        X_train, X_test, y_train, y_test = self.prepare_data(dataset, 0.2, 42, selected_features)
-        
-        model = self.trained_models[model_key]["model"]
-        y_pred = model.predict(X_test)
-        
+        return self.trained_models[model_key]
+
+    def _cached_predictions(self, dataset: str, model_name: str):
+        """
+        Predizioni e metriche sul test set, calcolate una volta per versione dell'artefatto.
+        Un nuovo training dello stesso modello cambia la versione e invalida la cache.
+        """
+        model_key = f"{dataset}_{model_name.replace(' ', '_')}"
+        entry = self._load_model(model_key)
+        version = entry["version"]
+
+        cached = self.predictions_cache.get(model_key)
+        if cached is not None and cached["version"] == version:
+            return cached
+
+        with self._predictions_lock:
+            cached = self.predictions_cache.get(model_key)
+            if cached is not None and cached["version"] == version:
+                return cached
+
+            metadata = entry["metadata"]
+            task_type = metadata["task_type"]
+            selected_features = metadata.get("selected_features")
+
+            X_test, y_test = self._evaluation_set(dataset, metadata, selected_features)
+            y_pred = entry["model"].predict(X_test)
+
+            metrics = {
+                "accuracy": float(accuracy_score(y_test, y_pred)),
+                "precision": float(precision_score(y_test, y_pred, average='weighted', zero_division=0)),
+                "recall": float(recall_score(y_test, y_pred, average='weighted', zero_division=0)),
+                "f1_score": float(f1_score(y_test, y_pred, average='weighted', zero_division=0)),
+                "confusion_matrix": confusion_matrix(y_test, y_pred).tolist()
+            }
+
+            if task_type == 'regression':
+                metrics["r2_score"] = float(r2_score(y_test, y_pred))
+                correct = None
+                error = np.abs(y_test.astype(float) - y_pred.astype(float))
+            else:
+                metrics["r2_score"] = None
+                correct = y_test == y_pred
+                error = None
+
+            cached = {
+                "version": version,
+                "task_type": task_type,
+                "true_value": y_test.astype(str),
+                "predicted_value": y_pred.astype(str),
+                "correct": correct,
+                "error": error,
+                "metrics": metrics,
+            }
+            self.predictions_cache[model_key] = cached
+
+        return cached
+
+    def predict(self, dataset: str, model_name: str, offset: int = 0, limit: int = None, filter: str = None):
+        """
+        Usa un modello trainato per fare predizioni sul test set.
+        Supporta paginazione (offset/limit) e filtro ("misclassified" | "correct", solo classificazione).
+        Returns: (risultati della pagina, metriche, numero totale di righe dopo il filtro)
+        """
+        if offset < 0 or (limit is not None and limit < 1):
+            raise ValueError("offset must be >= 0 and limit >= 1")
+        cached = self._cached_predictions(dataset, model_name)
+        task_type = cached["task_type"]
+
+        sample_ids = np.arange(len(cached["true_value"]))
+        if filter:
+            if task_type != 'classification':
+                raise ValueError("Filter is only supported for classification models")
+            if filter == "misclassified":
+                sample_ids = sample_ids[~cached["correct"]]
+            elif filter == "correct":
+                sample_ids = sample_ids[cached["correct"]]
+            else:
+                raise ValueError(f"Unknown filter '{filter}'")
+
+        total = len(sample_ids)
+        end = total if limit is None else offset + limit
+        page = sample_ids[offset:end]
+
         results = []
-        for i in range(len(y_test)):
+        for i in page.tolist():
             result_dict = {
                 "sample_id": i,
-                "true_value": str(y_test[i]),
-                "predicted_value": str(y_pred[i]),
+                "true_value": str(cached["true_value"][i]),
+                "predicted_value": str(cached["predicted_value"][i]),
             }
-            
+
             if task_type == 'classification':
-                result_dict["correct"] = bool(y_test[i] == y_pred[i])
+                result_dict["correct"] = bool(cached["correct"][i])
                 result_dict["error"] = None
             else:
                 result_dict["correct"] = None
-                result_dict["error"] = float(abs(y_test[i] - y_pred[i]))
-            
+                result_dict["error"] = float(cached["error"][i])
+
             results.append(result_dict)
-        
-        metrics = {
-            "accuracy": float(accuracy_score(y_test, y_pred)),
-            "precision": float(precision_score(y_test, y_pred, average='weighted', zero_division=0)),
-            "recall": float(recall_score(y_test, y_pred, average='weighted', zero_division=0)),
-            "f1_score": float(f1_score(y_test, y_pred, average='weighted', zero_division=0)),
-            "confusion_matrix": confusion_matrix(y_test, y_pred).tolist()
-        }
-        
-        if task_type == 'regression':
-            metrics["r2_score"] = float(r2_score(y_test, y_pred))
-        else:
-            metrics["r2_score"] = None
-        
-        return results, metrics
+
+        return results, cached["metrics"], total
     
-    def get_feature_importance(self, dataset: str, model_name: str):
-        """Estrae feature importance da un modello trainato"""
+    def _model_features(self, dataset: str, model_key: str):
+        """Feature attese dal modello, nello stesso ordine usato in training"""
+        metadata = self.trained_models[model_key]["metadata"]
+        features = metadata.get("selected_features")
+        if not features or len(features) != metadata.get("feature_count", len(features)):
+            # Metadata di vecchi modelli: le feature selezionate potevano includere colonne non numeriche
+            if dataset not in self.datasets_cache:
+                self.load_dataset(dataset)
+            features = self._resolve_features(dataset, features)
+        return features
+
+    def prepare_inference_input(self, dataset: str, model_name: str, rows=None, csv_bytes: bytes = None, npy_bytes: bytes = None):
+        """
+        Valida un batch di nuovi campioni contro le feature del modello.
+        Input: rows (lista di dict per nome feature o lista di liste ordinate),
+        csv_bytes (CSV con header) oppure npy_bytes (array NumPy 2-D serializzato).
+        Returns: (array float64 contiguo, lista feature)
+        """
         model_key = f"{dataset}_{model_name.replace(' ', '_')}"
+        self._load_model(model_key)
+        features = self._model_features(dataset, model_key)
 
-        if model_key not in self.trained_models:
-            model_path = self.models_dir / f"{model_key}.joblib"
-            if not model_path.exists():
-                raise ValueError(f"Model {model_key} not found. Train it first.")
+        if npy_bytes is not None:
+            X = np.load(io.BytesIO(npy_bytes), allow_pickle=False)
+        elif csv_bytes is not None:
+            X = pd.read_csv(io.BytesIO(csv_bytes))
+        elif rows and isinstance(rows[0], dict):
+            X = pd.DataFrame.from_records(rows)
+        else:
+            X = np.asarray(rows if rows is not None else [], dtype=np.float64)
 
-            model = joblib.load(model_path)
-            metadata_path = self.models_dir / f"{model_key}_metadata.json"
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
+        if isinstance(X, pd.DataFrame):
+            missing = [c for c in features if c not in X.columns]
+            if missing:
+                raise ValueError(f"Missing features: {', '.join(missing)}")
+            X = X[features].to_numpy(dtype=np.float64)
 
-            self.trained_models[model_key] = {
-                "model": model,
-                "metadata": metadata
+        if X.ndim != 2 or X.shape[1] != len(features):
+            raise ValueError(f"Expected a 2-D batch with {len(features)} features ({', '.join(features)})")
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if np.isnan(X).any():
+            raise ValueError("Batch contains NaN values")
+
+        return X, features
+
+    def predict_batch(self, dataset: str, model_name: str, X, chunk_size: int = 10000, return_proba: bool = True):
+        """
+        Inferenza vettorizzata su nuovi campioni, a blocchi di chunk_size righe.
+        Generatore: produce un dict per blocco (offset, predictions, probabilities).
+        """
+        model_key = f"{dataset}_{model_name.replace(' ', '_')}"
+        model = self._load_model(model_key)["model"]
+        with_proba = return_proba and hasattr(model, "predict_proba")
+        chunk_size = max(1, int(chunk_size))
+
+        for start in range(0, len(X), chunk_size):
+            chunk = X[start:start + chunk_size]
+            yield {
+                "offset": start,
+                "count": len(chunk),
+                "predictions": model.predict(chunk).tolist(),
+                "probabilities": model.predict_proba(chunk).round(6).tolist() if with_proba else None,
             }
 
-        model = self.trained_models[model_key]["model"]
+    def _adaptive_permutation_importance(self, model, X, y, start_size: int = 200,
+                                         n_repeats: int = 5, ci_tolerance: float = 0.01):
+        """
+        Permutation importance parallela (n_jobs=-1) con campione adattivo:
+        parte da start_size campioni e raddoppia finché l'intervallo di confidenza al 95%
+        della media (1.96 · std / √n_repeats) supera ci_tolerance per qualche feature.
+        """
+        rng = np.random.RandomState(42)
+        order = rng.permutation(len(X))
+        size = min(start_size, len(X))
+
+        while True:
+            idx = order[:size]
+            result = permutation_importance(
+                model, X[idx], y[idx], n_repeats=n_repeats, random_state=42, n_jobs=-1
+            )
+            ci_half_width = 1.96 * result.importances_std / np.sqrt(n_repeats)
+            if size >= len(X) or ci_half_width.max() <= ci_tolerance:
+                return result.importances_mean, size
+            size = min(2 * size, len(X))
+
+    def get_feature_importance(self, dataset: str, model_name: str):
+        """
+        Estrae feature importance da un modello trainato.
+        Il risultato è salvato nel _metadata.json del modello: le richieste successive sono immediate
+        (un nuovo training riscrive il metadata e quindi invalida il valore salvato).
+        """
+        model_key = f"{dataset}_{model_name.replace(' ', '_')}"
+        entry = self._load_model(model_key)
+        metadata = entry["metadata"]
+
+        if metadata.get("feature_importances") is not None:
+            return metadata["feature_importances"]
+
+        model = entry["model"]
+        # Nomi feature nello stesso ordine delle colonne usate in training
+        feature_names = self._model_features(dataset, model_key)
 
         if hasattr(model, 'feature_importances_'):
             importances = model.feature_importances_
@@ -348,32 +951,16 @@ class MLService:
                 coefs = coefs.mean(axis=0)
             importances = coefs / coefs.sum() if coefs.sum() > 0 else coefs
         else:
-            # KNN, Naive Bayes — usa permutation importance
-            selected_features = self.trained_models[model_key]["metadata"].get("selected_features")
-            X_train, X_test, y_train, y_test = self.prepare_data(
-                dataset, 0.2, 42, selected_features
-            )
-            # Subsampla il test set per velocizzare (max 200 campioni)
-            if len(X_test) > 200:
-                idx = np.random.RandomState(42).choice(len(X_test), 200, replace=False)
-                X_eval, y_eval = X_test[idx], y_test[idx]
-            else:
-                X_eval, y_eval = X_test, y_test
-            result = permutation_importance(model, X_eval, y_eval, n_repeats=5, random_state=42)
-            importances = result.importances_mean
+            # KNN, Naive Bayes, SVM RBF — usa permutation importance
+            X_test, y_test = self._evaluation_set(dataset, metadata, feature_names)
+            importances, n_samples = self._adaptive_permutation_importance(model, X_test, y_test)
+            metadata["feature_importance_samples"] = n_samples
             # Normalizza sui valori assoluti (evita il caso tutto-zero da negativi)
             importances = np.abs(importances)
             total = importances.sum()
             if total > 0:
                 importances = importances / total
 
-        # Recupera nomi feature da metadata (rispetta selezione colonne) o dal dataset cache
-        feature_names = self.trained_models[model_key]["metadata"].get("selected_features")
-        if not feature_names:
-            if dataset not in self.datasets_cache:
-                self.load_dataset(dataset)
-            feature_names = self.datasets_cache[dataset]["info"]["features"]
-
         # Crea lista ordinata per importanza decrescente
         feature_importance_list = [
             {"feature": name, "importance": float(imp)}
@@ -381,13 +968,11 @@ class MLService:
         ]
         feature_importance_list.sort(key=lambda x: x["importance"], reverse=True)
 
+        metadata["feature_importances"] = feature_importance_list
+        self._write_metadata(model_key, metadata)
+
         return feature_importance_list
 
-    def get_trained_models(self, dataset: str):
-        """Ottieni lista di modelli trainati per un dataset"""
-        trained = []
-        for file in self.models_dir.glob(f"{dataset}_*_metadata.json"):
-            with open(file, 'r') as f:
-                metadata = json.load(f)
-                trained.append(metadata)
-        return trained
\ No newline at end of file
+    def get_trained_models(self, dataset: str, model_name: str = None, task_type: str = None):
+        """Ottieni lista di modelli trainati per un dataset (lookup indicizzato sul registry)"""
+        return self.registry.list_models(dataset, model_name, task_type)
@@ -0,0 +1,103 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class ModelRegistry:
+    """
+    Indice SQLite dei modelli trainati (un record per dataset + modello).
+
+    Sostituisce il glob dei file *_metadata.json: elenco e filtri sono una query
+    indicizzata su `dataset`, indipendente dal numero di modelli salvati e senza
+    collisioni tra dataset con lo stesso prefisso. I _metadata.json restano la
+    fonte da cui l'indice viene ricostruito se il database è vuoto.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS models (
+                    model_key     TEXT PRIMARY KEY,
+                    dataset       TEXT NOT NULL,
+                    model_name    TEXT NOT NULL,
+                    task_type     TEXT,
+                    metrics       TEXT,
+                    features      TEXT,
+                    artifact_path TEXT,
+                    size_bytes    INTEGER,
+                    created_at    REAL NOT NULL,
+                    updated_at    REAL NOT NULL,
+                    metadata      TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_models_dataset ON models (dataset, model_name)")
+
+    def _connect(self):
+        # Una connessione per operazione: il registry è usato da più thread dell'executor
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def upsert(self, model_key: str, metadata: Dict, artifact_path: Optional[Path] = None):
+        """Inserisce o aggiorna il record di un modello in un'unica transazione"""
+        now = time.time()
+        size = artifact_path.stat().st_size if artifact_path is not None and artifact_path.exists() else None
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO models (model_key, dataset, model_name, task_type, metrics, features,
+                                    artifact_path, size_bytes, created_at, updated_at, metadata)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(model_key) DO UPDATE SET
+                    dataset = excluded.dataset,
+                    model_name = excluded.model_name,
+                    task_type = excluded.task_type,
+                    metrics = excluded.metrics,
+                    features = excluded.features,
+                    artifact_path = COALESCE(excluded.artifact_path, models.artifact_path),
+                    size_bytes = COALESCE(excluded.size_bytes, models.size_bytes),
+                    updated_at = excluded.updated_at,
+                    metadata = excluded.metadata
+            """, (
+                model_key,
+                metadata["dataset"],
+                metadata["model_name"],
+                metadata.get("task_type"),
+                json.dumps(metadata.get("metrics")),
+                json.dumps(metadata.get("selected_features")),
+                str(artifact_path) if artifact_path is not None else None,
+                size,
+                now,
+                now,
+                json.dumps(metadata),
+            ))
+
+    def list_models(self, dataset: str, model_name: Optional[str] = None,
+                    task_type: Optional[str] = None) -> List[Dict]:
+        """Metadata dei modelli di un dataset, con filtri opzionali"""
+        query = "SELECT metadata FROM models WHERE dataset = ?"
+        args: list = [dataset]
+        if model_name:
+            query += " AND model_name = ?"
+            args.append(model_name)
+        if task_type:
+            query += " AND task_type = ?"
+            args.append(task_type)
+        query += " ORDER BY model_name"
+        with self._connect() as conn:
+            rows = conn.execute(query, args).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def is_empty(self) -> bool:
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM models LIMIT 1").fetchone() is None
+
+    def rebuild(self, models_dir: Path):
+        """Importa i _metadata.json esistenti (modelli salvati prima dell'introduzione del registry)"""
+        for metadata_path in Path(models_dir).glob("*_metadata.json"):
+            model_key = metadata_path.name[:-len("_metadata.json")]
+            with open(metadata_path, "r") as f:
+                metadata = json.load(f)
+            if "dataset" in metadata and "model_name" in metadata:
+                self.upsert(model_key, metadata, Path(models_dir) / f"{model_key}.joblib")
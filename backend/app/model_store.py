@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import joblib
+
+
+class ModelStore:
+    """
+    Persistenza degli artefatti dei modelli (joblib) e dei relativi metadata.
+
+    - compress: livello di compressione joblib (0 = nessuna, 1-9 = zlib).
+      Gli artefatti non compressi vengono caricati con mmap_mode="r": gli array
+      NumPy dello stimatore restano su disco e sono condivisi tra processi
+      tramite la page cache invece di essere copiati in memoria.
+    - Ogni scrittura avviene su un file temporaneo nella stessa cartella,
+      poi os.replace: un lettore vede sempre il file vecchio o quello nuovo, mai uno parziale.
+    """
+
+    def __init__(self, root: Path, compress: int = 0, mmap: bool = True):
+        self.root = Path(root)
+        self.root.mkdir(exist_ok=True)
+        self.compress = int(compress)
+        self.mmap = mmap
+
+    def model_path(self, model_key: str) -> Path:
+        return self.root / f"{model_key}.joblib"
+
+    def metadata_path(self, model_key: str) -> Path:
+        return self.root / f"{model_key}_metadata.json"
+
+    def _atomic_write(self, path: Path, write):
+        """Scrive su un file temporaneo e lo rinomina atomicamente su path"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f".{path.name}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def save_model(self, model_key: str, model) -> Path:
+        """Salva il modello e restituisce il percorso dell'artefatto"""
+        path = self.model_path(model_key)
+        self._atomic_write(path, lambda tmp: joblib.dump(model, tmp, compress=self.compress))
+        return path
+
+    def load_model(self, model_key: str):
+        """Carica il modello (memory-mapped se l'artefatto non è compresso)"""
+        path = self.model_path(model_key)
+        if not path.exists():
+            raise ValueError(f"Model {model_key} not found. Train it first.")
+        mmap_mode = "r" if self.mmap and not self.is_compressed(path) else None
+        return joblib.load(path, mmap_mode=mmap_mode)
+
+    @staticmethod
+    def is_compressed(path: Path) -> bool:
+        """Un pickle non compresso inizia con l'opcode PROTO (0x80)"""
+        with open(path, "rb") as f:
+            return f.read(1) != b"\x80"
+
+    def save_metadata(self, model_key: str, metadata: dict):
+        def write(tmp):
+            with open(tmp, "w") as f:
+                json.dump(metadata, f, indent=2)
+        self._atomic_write(self.metadata_path(model_key), write)
+
+    def load_metadata(self, model_key: str) -> dict:
+        with open(self.metadata_path(model_key), "r") as f:
+            return json.load(f)
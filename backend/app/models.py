@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 
 class DatasetInfo(BaseModel):
@@ -21,11 +21,24 @@ class TrainingRequest(BaseModel):
     models: List[str]
     test_size: float = 0.2
     random_state: int = 42
+    mode: str = "memory"   # "memory" | "streaming" (partial_fit, SGD / Naive Bayes)
+    chunksize: int = 50000
 
 class PredictionRequest(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
     dataset: str
     model_name: str
+    offset: int = Field(0, ge=0)
+    limit: Optional[int] = Field(None, ge=1)
+    filter: Optional[str] = None
+
+class InferenceRequest(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+    dataset: str
+    model_name: str
+    rows: List[Any]
+    chunk_size: int = 10000
+    return_proba: bool = True
 
 class TrainingProgress(BaseModel):
     model: str
@@ -0,0 +1,147 @@
+"""
+Opt-in request profiling.
+
+A request carrying the admin token (header "X-Profile: <token>" or query
+"?profile=<token>"; for /ws/train the query parameter on the socket URL)
+has every function it sends to an executor pool run under cProfile.  The
+reports land in a bounded in-memory ring buffer and are served by the
+/admin/profiles endpoints, as pstats text or as a binary .pstats file
+for snakeviz / pstats.Stats.
+
+Profiling is disabled unless PROFILE_ADMIN_TOKEN is set.  The buffer
+keeps the last PROFILE_BUFFER_SIZE reports (default 32).
+"""
+import cProfile
+import contextvars
+import functools
+import hmac
+import io
+import marshal
+import os
+import pstats
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN", "")
+BUFFER_SIZE = int(os.environ.get("PROFILE_BUFFER_SIZE", 32))
+TOP_FUNCTIONS = 40
+
+# Profiling state of the current request: {"route": str, "ids": [profile ids]}, or None
+_active: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("profile_request", default=None)
+
+_buffer: "deque[Dict]" = deque(maxlen=BUFFER_SIZE)
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(ADMIN_TOKEN)
+
+
+def authorized(token: Optional[str]) -> bool:
+    """Constant-time check of an admin token; always False while profiling is disabled."""
+    return enabled() and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def begin_request(route: str) -> contextvars.Token:
+    return _active.set({"route": route, "ids": []})
+
+
+def end_request(token: contextvars.Token):
+    _active.reset(token)
+
+
+def active() -> Optional[Dict]:
+    return _active.get()
+
+
+def _label(fn: Callable) -> str:
+    target = getattr(fn, "func", fn)     # functools.partial → wrapped function
+    return f"{getattr(target, '__module__', '?')}.{getattr(target, '__qualname__', repr(target))}"
+
+
+def run_profiled(fn: Callable, args: tuple, kwargs: dict):
+    """
+    Run fn under cProfile and return (result, report).  Picklable, so it also
+    runs inside process-pool workers.  If fn raises, the report is attached
+    to the exception as `profile_report` (exception attributes survive pickling).
+    """
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        result = profiler.runcall(fn, *args, **kwargs)
+    except BaseException as e:
+        e.profile_report = _report(profiler, fn, time.perf_counter() - start, error=repr(e))
+        raise
+    return result, _report(profiler, fn, time.perf_counter() - start)
+
+
+def _report(profiler: cProfile.Profile, fn: Callable, duration: float, error: Optional[str] = None) -> Dict:
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    return {
+        "function": _label(fn),
+        "duration_ms": round(duration * 1000, 3),
+        "error": error,
+        "text": stream.getvalue(),
+        "pstats": marshal.dumps(stats.stats),     # same format as Stats.dump_stats
+    }
+
+
+def record(report: Optional[Dict], route: Optional[str] = None) -> Optional[str]:
+    """Store a report in the ring buffer (tagged with the current request's route) and return its id."""
+    if report is None:
+        return None
+    request = active()
+    profile_id = uuid.uuid4().hex[:12]
+    entry = {
+        "id": profile_id,
+        "created_at": time.time(),
+        "route": route or (request["route"] if request else None),
+        **report,
+    }
+    with _lock:
+        _buffer.append(entry)
+    if request is not None:
+        request["ids"].append(profile_id)
+    return profile_id
+
+
+def profiled(fn: Callable, route: str) -> Callable:
+    """Wrap fn so that every call is profiled and recorded — for work that does not go through a pool."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            result, report = run_profiled(fn, args, kwargs)
+        except BaseException as e:
+            record(getattr(e, "profile_report", None), route)
+            raise
+        record(report, route)
+        return result
+    return wrapper
+
+
+def list_profiles() -> List[Dict]:
+    """Summaries, newest first (without the report bodies)."""
+    with _lock:
+        entries = list(_buffer)
+    return [
+        {k: v for k, v in entry.items() if k not in ("text", "pstats")}
+        for entry in reversed(entries)
+    ]
+
+
+def get_profile(profile_id: str) -> Dict:
+    with _lock:
+        for entry in _buffer:
+            if entry["id"] == profile_id:
+                return entry
+    raise ValueError(f"Profile {profile_id} not found")
+
+
+def clear():
+    with _lock:
+        _buffer.clear()
@@ -0,0 +1,212 @@
+"""
+Hyperparameter tuning — successive halving on top of MLService.
+
+Candidates are sampled from PARAM_GRIDS and evaluated on growing subsets of
+the training split (budget = number of training rows).  After each rung only
+the best 1/eta candidates survive.  Evaluations run on the shared spawn-context
+process pool (executors.cpu_process), at most max_workers at a time; X and
+y are written once to .npy files and memory-mapped read-only by every worker,
+so the data is shared through the page cache instead of being pickled per task.
+The winning configuration is refitted through MLService.train_model, which
+saves it with the usual joblib + metadata path.
+"""
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from sklearn.model_selection import ParameterSampler, train_test_split
+
+from app import executors
+
+
+# Search spaces — merged on top of MLService.model_params for each estimator
+PARAM_GRIDS: Dict[str, Dict[str, List[Any]]] = {
+    "AdaBoost": {
+        "n_estimators": [50, 100, 200, 400],
+        "learning_rate": [0.05, 0.1, 0.5, 1.0],
+    },
+    "Gradient Boosting": {
+        "n_estimators": [50, 100, 200, 400],
+        "learning_rate": [0.01, 0.05, 0.1, 0.2],
+        "max_depth": [2, 3, 5],
+        "subsample": [0.7, 1.0],
+    },
+    "Random Forest": {
+        "n_estimators": [50, 100, 200, 400],
+        "max_depth": [None, 5, 10, 20],
+        "min_samples_leaf": [1, 2, 5],
+        "max_features": ["sqrt", "log2", None],
+    },
+    "Decision Tree": {
+        "max_depth": [None, 3, 5, 10, 20],
+        "min_samples_leaf": [1, 2, 5, 10],
+        "criterion": ["gini", "entropy"],
+    },
+    "SGD": {
+        "loss": ["hinge", "log_loss", "modified_huber"],
+        "alpha": [1e-5, 1e-4, 1e-3, 1e-2],
+        "penalty": ["l2", "l1", "elasticnet"],
+    },
+    "KNN": {
+        "n_neighbors": [3, 5, 7, 11, 15, 25],
+        "weights": ["uniform", "distance"],
+        "p": [1, 2],
+    },
+    "Naive Bayes": {
+        "var_smoothing": [1e-11, 1e-10, 1e-9, 1e-8, 1e-7, 1e-5],
+    },
+    "SVM": {
+        "C": [0.1, 1.0, 10.0, 100.0],
+        "gamma": ["scale", 0.01, 0.1, 1.0],
+        "kernel": ["rbf", "linear"],
+    },
+}
+
+
+# ──────────────────────────────────────────────────────────────
+#  Worker (runs in a child process)
+# ──────────────────────────────────────────────────────────────
+
+def _evaluate_candidate(model_name: str, params: Dict, data_dir: str, n_samples: int) -> float:
+    """Fit one candidate on the first n_samples shuffled training rows, score on validation."""
+    from app.ml_service import MODEL_CLASSES
+
+    data = Path(data_dir)
+    X_fit = np.load(data / "X_fit.npy", mmap_mode="r")
+    y_fit = np.load(data / "y_fit.npy", mmap_mode="r")
+    X_val = np.load(data / "X_val.npy", mmap_mode="r")
+    y_val = np.load(data / "y_val.npy", mmap_mode="r")
+
+    model = MODEL_CLASSES[model_name](**params)
+    try:
+        model.fit(X_fit[:n_samples], y_fit[:n_samples])
+        return float(model.score(X_val, y_val))
+    except ValueError:
+        # e.g. a small rung that happens to contain a single class
+        return float("-inf")
+
+
+# ──────────────────────────────────────────────────────────────
+#  Successive halving
+# ──────────────────────────────────────────────────────────────
+
+def _rung_budgets(n_train: int, n_candidates: int, eta: int, min_samples: int) -> List[int]:
+    """Training-set sizes per rung: the last rung uses all rows, each earlier one 1/eta of the next."""
+    # floor(log_eta(n_candidates)) in integers: math.log(243, 3) is 4.999…
+    n_rungs = 1
+    while eta ** n_rungs <= n_candidates:
+        n_rungs += 1
+    budgets = [max(min_samples, n_train // eta ** (n_rungs - 1 - i)) for i in range(n_rungs)]
+    return [min(b, n_train) for b in budgets]
+
+
+def tune_model(
+    ml_service,
+    dataset: str,
+    model_name: str,
+    selected_features: Optional[List[str]] = None,
+    test_size: float = 0.2,
+    random_state: int = 42,
+    n_candidates: int = 27,
+    eta: int = 3,
+    max_workers: Optional[int] = None,
+    on_event: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Successive-halving search for model_name on dataset.
+    on_event is called (from the calling thread) after every evaluation with
+    {rung, n_samples, params, score, best_params, best_score, done, total}.
+    Returns {best_params, best_score, metrics} where metrics come from the
+    final refit on the full training split (evaluated on the test split).
+    """
+    if model_name not in PARAM_GRIDS:
+        raise ValueError(f"No search space defined for {model_name}")
+    if eta < 2:
+        raise ValueError("eta must be >= 2")
+
+    X_train, X_test, y_train, y_test = ml_service.prepare_data(
+        dataset, test_size, random_state, selected_features
+    )
+
+    # Inner validation split from the training rows — the test split stays untouched
+    task_type = ml_service.datasets_cache[dataset]["info"]["task_type"]
+    stratify = y_train if task_type == "classification" else None
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=0.2, random_state=random_state, stratify=stratify
+    )
+    order = np.random.RandomState(random_state).permutation(len(X_fit))
+    X_fit, y_fit = X_fit[order], y_fit[order]
+
+    base_params = dict(ml_service.model_params[model_name])
+    if "n_jobs" in base_params:
+        base_params["n_jobs"] = 1   # parallelism comes from the process pool
+    candidates = [
+        {**base_params, **p}
+        for p in ParameterSampler(PARAM_GRIDS[model_name], n_iter=n_candidates, random_state=random_state)
+    ]
+    budgets = _rung_budgets(len(X_fit), len(candidates), eta, min_samples=50)
+    total, n_alive = 0, len(candidates)
+    for _ in budgets:
+        total += n_alive
+        n_alive = max(1, n_alive // eta)
+
+    best_params, best_score, best_rung, done = None, float("-inf"), -1, 0
+
+    with tempfile.TemporaryDirectory(prefix="tuning_") as data_dir:
+        # Labels are stored as integer codes so they can be memory-mapped
+        _, y_codes = np.unique(np.concatenate([y_fit, y_val]), return_inverse=True)
+        np.save(Path(data_dir) / "X_fit.npy", np.ascontiguousarray(X_fit))
+        np.save(Path(data_dir) / "y_fit.npy", y_codes[:len(y_fit)])
+        np.save(Path(data_dir) / "X_val.npy", np.ascontiguousarray(X_val))
+        np.save(Path(data_dir) / "y_val.npy", y_codes[len(y_fit):])
+
+        pool = executors.cpu_process
+        limit = max_workers or pool.max_workers
+        survivors = candidates
+        for rung, n_samples in enumerate(budgets):
+            queued = iter(survivors)
+            pending = {}
+            scored = []
+            while True:
+                # Keep at most `limit` evaluations in flight on the shared pool
+                for params in queued:
+                    future = pool.submit(_evaluate_candidate, model_name, params, data_dir, n_samples)
+                    pending[future] = params
+                    if len(pending) >= limit:
+                        break
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    params, score = pending.pop(future), future.result()
+                    scored.append((score, params))
+                    done += 1
+                    # Best-so-far: scores are only comparable within the same budget,
+                    # so a higher rung always supersedes the previous best
+                    if rung > best_rung or score > best_score:
+                        best_params, best_score, best_rung = params, score, rung
+                    if on_event:
+                        on_event({
+                            "rung": rung,
+                            "n_samples": n_samples,
+                            "params": params,
+                            "score": score,
+                            "best_params": best_params,
+                            "best_score": best_score,
+                            "done": done,
+                            "total": total,
+                        })
+
+            scored.sort(key=lambda item: item[0], reverse=True)
+            survivors = [p for _, p in scored[:max(1, len(scored) // eta)]]
+
+    # Refit the winner on the full training split and save it like a normal training run
+    winner = dict(best_params)
+    if "n_jobs" in ml_service.model_params[model_name]:
+        winner["n_jobs"] = ml_service.model_params[model_name]["n_jobs"]
+    metrics = ml_service.train_model(
+        dataset, model_name, X_train, y_train, X_test, y_test, selected_features, params=winner
+    )
+    return {"best_params": winner, "best_score": best_score, "metrics": metrics}
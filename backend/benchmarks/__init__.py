@@ -0,0 +1,6 @@
+"""
+Benchmarks and load tests for the backend hot paths.
+
+  synthetic : generators for MGF libraries, ML datasets and DataFusion files
+  run       : micro-benchmarks with JSON results and baseline comparison
+"""
@@ -0,0 +1,273 @@
+"""
+Asyncio load generator for the HTTP and WebSocket API.
+
+Usage (server already running, from backend/):
+
+    python -m benchmarks.loadtest --url http://localhost:8000 \\
+        --concurrency 1 2 4 8 16 32 --duration 20 --output load.json
+
+For every concurrency level, each scenario is first driven alone (one
+saturation curve per endpoint) and then as a weighted mix (--mix).  Virtual
+users run a closed loop: send a request, wait for the answer, send the next.
+Per level and scenario the report has throughput, p50 / p95 / p99 latency
+and the error rate, plus a snapshot of GET /executors.  The saturation point
+of a curve is the first level where throughput grows by less than
+--saturation-gain over the previous level.
+
+Scenarios:
+  spectral-match   POST /deep-spectrum/spectral-match
+  spec2vec-match   POST /deep-spectrum/spec2vec-match
+  datafusion-merge POST /datafusion/merge (synthetic CSVs, see --fusion-rows)
+  ws-train         one /ws/train session until "all_completed"; latency is the
+                   whole session.  Every session uses its own random_state, so
+                   the job manager does not deduplicate (--allow-dedup to test that)
+
+Needs httpx and websockets.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks import synthetic
+
+SCENARIOS = ("spectral-match", "spec2vec-match", "datafusion-merge", "ws-train")
+DEFAULT_MIX = "spectral-match=4,spec2vec-match=4,datafusion-merge=1,ws-train=1"
+
+
+class LoadClient:
+    """Payloads and one call per scenario. Each call returns (ok, detail)."""
+
+    def __init__(self, args, http):
+        self.args = args
+        self.http = http
+        self.ws_url = args.url.replace("http://", "ws://").replace("https://", "wss://")
+        rng = np.random.default_rng(args.seed)
+        grid = synthetic.mz_grid()
+        self.queries = [synthetic.random_peaks(rng, int(rng.integers(5, 40)), grid) for _ in range(50)]
+        self.fusion_files = synthetic.make_fusion_files(3, args.fusion_rows, seed=args.seed)
+        self._session_seed = itertools.count(1000)
+
+    async def _post(self, path: str, payload: Dict) -> Tuple[bool, str]:
+        response = await self.http.post(path, json=payload)
+        return response.status_code < 400, str(response.status_code)
+
+    async def spectral_match(self, rng: random.Random):
+        peaks = rng.choice(self.queries)
+        return await self._post("/deep-spectrum/spectral-match", {
+            "peaks": peaks, "precursor_mz": peaks[-1]["mz"] + 1.007276, "top_n": 10})
+
+    async def spec2vec_match(self, rng: random.Random):
+        return await self._post("/deep-spectrum/spec2vec-match", {"peaks": rng.choice(self.queries), "top_n": 10})
+
+    async def datafusion_merge(self, rng: random.Random):
+        return await self._post("/datafusion/merge", {
+            "files": self.fusion_files,
+            "key_column": "sample_id",
+            "label_col": "label",
+            "rules": {"caseStrategy": "lowercase", "duplicateStrategy": "first"},
+        })
+
+    async def ws_train(self, rng: random.Random):
+        import websockets
+
+        request = {
+            "dataset": self.args.dataset,
+            "models": self.args.models,
+            "test_size": 0.2,
+            "random_state": 42 if self.args.allow_dedup else next(self._session_seed),
+        }
+        async with websockets.connect(f"{self.ws_url}/ws/train", max_size=None,
+                                      open_timeout=self.args.timeout) as ws:
+            await ws.send(json.dumps(request))
+            failed = False
+            while True:
+                message = json.loads(await asyncio.wait_for(ws.recv(), timeout=self.args.timeout))
+                status = message.get("status")
+                if status in ("model_error", "cancelled"):
+                    failed = True
+                elif status == "error":
+                    return False, "error"
+                elif status == "all_completed":
+                    return not failed, "model_error" if failed else "ok"
+
+    async def call(self, scenario: str, rng: random.Random) -> Tuple[bool, str]:
+        return await getattr(self, scenario.replace("-", "_"))(rng)
+
+
+async def _virtual_user(client: LoadClient, scenarios: List[str], weights: List[float], seed: int,
+                        warmup_until: float, stop_at: float, samples: List[Tuple[str, float, bool, str]]):
+    rng = random.Random(seed)
+    while time.perf_counter() < stop_at:
+        scenario = rng.choices(scenarios, weights)[0]
+        start = time.perf_counter()
+        try:
+            ok, detail = await client.call(scenario, rng)
+        except Exception as e:
+            ok, detail = False, type(e).__name__
+        end = time.perf_counter()
+        # Only requests started after the warmup and finished before the deadline count
+        if start >= warmup_until and end <= stop_at:
+            samples.append((scenario, end - start, ok, detail))
+
+
+def _summarise(samples: List[Tuple[str, float, bool, str]], window: float) -> Dict[str, Dict]:
+    by_scenario: Dict[str, List[Tuple[float, bool, str]]] = {}
+    for scenario, latency, ok, detail in samples:
+        by_scenario.setdefault(scenario, []).append((latency, ok, detail))
+    summary = {}
+    for scenario, rows in by_scenario.items():
+        latencies = np.array([r[0] for r in rows])
+        ok_latencies = np.array([r[0] for r in rows if r[1]])
+        errors = [r[2] for r in rows if not r[1]]
+        pct = (lambda q: float(np.percentile(ok_latencies, q) * 1000)) if len(ok_latencies) else (lambda q: None)
+        summary[scenario] = {
+            "requests": len(rows),
+            "errors": len(errors),
+            "error_rate": len(errors) / len(rows),
+            "error_kinds": {kind: errors.count(kind) for kind in set(errors)},
+            "throughput_rps": (len(rows) - len(errors)) / window,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+            "mean_ms": float(latencies.mean() * 1000),
+            "max_ms": float(latencies.max() * 1000),
+        }
+    return summary
+
+
+async def run_level(client: LoadClient, http, scenarios: List[str], weights: List[float],
+                    concurrency: int, args) -> Dict:
+    now = time.perf_counter()
+    warmup_until = now + args.warmup
+    stop_at = warmup_until + args.duration
+    samples: List[Tuple[str, float, bool, str]] = []
+    await asyncio.gather(*(
+        _virtual_user(client, scenarios, weights, args.seed * 1000 + i, warmup_until, stop_at, samples)
+        for i in range(concurrency)
+    ))
+    level = {"concurrency": concurrency, "scenarios": _summarise(samples, args.duration)}
+    try:
+        level["executors"] = (await http.get("/executors")).json()
+    except Exception:
+        level["executors"] = None
+    return level
+
+
+def saturation_point(curve: List[Dict], scenario: str, gain: float) -> Optional[int]:
+    """First concurrency level whose throughput is below (1 + gain) × the previous level's."""
+    previous = None
+    for level in curve:
+        stats = level["scenarios"].get(scenario)
+        if stats is None:
+            continue
+        if previous is not None and stats["throughput_rps"] < previous * (1.0 + gain):
+            return level["concurrency"]
+        previous = stats["throughput_rps"]
+    return None
+
+
+def _print_level(label: str, level: Dict):
+    for scenario, s in sorted(level["scenarios"].items()):
+        fmt = lambda v: f"{v:9.1f}" if v is not None else f"{'-':>9}"
+        print(f"{label:<18} c={level['concurrency']:<4} {scenario:<18} "
+              f"{s['throughput_rps']:8.2f} rps  p50 {fmt(s['p50_ms'])}  p95 {fmt(s['p95_ms'])}  "
+              f"p99 {fmt(s['p99_ms'])} ms  err {s['error_rate']:6.1%}")
+
+
+def _parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def run(args) -> Dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 4, max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as http:
+        client = LoadClient(args, http)
+
+        groups: List[Tuple[str, Dict[str, float]]] = [(s, {s: 1.0}) for s in args.scenarios]
+        if args.mix:
+            groups.append(("mix", _parse_mix(args.mix)))
+
+        curves: Dict[str, List[Dict]] = {}
+        for label, weights in groups:
+            curves[label] = []
+            for concurrency in args.concurrency:
+                level = await run_level(client, http, list(weights), list(weights.values()), concurrency, args)
+                curves[label].append(level)
+                _print_level(label, level)
+
+    saturation = {
+        label: {scenario: saturation_point(curve, scenario, args.saturation_gain)
+                for scenario in (SCENARIOS if label == "mix" else (label,))
+                if any(scenario in level["scenarios"] for level in curve)}
+        for label, curve in curves.items()
+    }
+    print("\nSaturation (first level with < {:.0%} throughput gain):".format(args.saturation_gain))
+    for label, points in saturation.items():
+        for scenario, point in points.items():
+            print(f"  {label:<18} {scenario:<18} {point if point is not None else 'not reached'}")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "args": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        },
+        "curves": curves,
+        "saturation": saturation,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", nargs="*", choices=SCENARIOS, default=list(SCENARIOS),
+                        help="scenarios driven alone (one saturation curve each)")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="weighted mix driven after the single-scenario curves; empty string to skip")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each level")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--dataset", default="demo.csv", help="dataset for ws-train sessions")
+    parser.add_argument("--models", nargs="+", default=["Decision Tree"], help="models per ws-train session")
+    parser.add_argument("--allow-dedup", action="store_true",
+                        help="send identical ws-train requests (exercise job deduplication)")
+    parser.add_argument("--fusion-rows", type=int, default=2000, help="rows per synthetic DataFusion file")
+    parser.add_argument("--saturation-gain", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the report JSON here")
+    args = parser.parse_args(argv)
+
+    try:
+        import httpx  # noqa: F401
+        import websockets  # noqa: F401
+    except ImportError as e:
+        print(f"Missing dependency: {e.name} (pip install httpx websockets)")
+        return 2
+
+    report = asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
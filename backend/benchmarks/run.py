@@ -0,0 +1,324 @@
+"""
+Benchmark harness for the matching, embedding, DataFusion and training hot paths.
+
+Usage (from backend/):
+
+    python -m benchmarks.run --sizes 1000 10000 --output bench.json
+    python -m benchmarks.run --sizes 1000 10000 --output new.json --baseline bench.json
+
+Each benchmark is run `--warmup` times untimed and then `--repeat` times.
+Results (min / median / mean / p95 seconds, plus throughput) are written as
+JSON keyed by "<benchmark>@<size>".  With --baseline, every result whose
+median is slower than the baseline by more than --tolerance is reported as a
+regression, and the exit code is 1.
+
+Everything runs inside a temporary working directory: synthetic MGF
+libraries are written there and the Deep Spectrum module is pointed at it,
+so the real datasets/ and trained_models/ folders are never touched.
+Benchmarks whose optional dependency (matchms, gensim) is missing are
+reported as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks import synthetic
+
+BENCHMARKS = (
+    "parse_mgf",
+    "spectrum_to_embedding",
+    "spectral_match",
+    "spec2vec_match",
+    "spec2vec_broad_match",
+    "merge_datasets",
+    "fuzzy_key_merge",
+    "train_model",
+)
+
+
+class Skip(Exception):
+    """Raised by a benchmark setup when an optional dependency is not available."""
+
+
+def _time(fn: Callable, warmup: int, repeat: int) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _summary(timings: List[float], items: int) -> Dict:
+    ordered = sorted(timings)
+    median = statistics.median(ordered)
+    return {
+        "repeat": len(ordered),
+        "min_s": ordered[0],
+        "median_s": median,
+        "mean_s": statistics.fmean(ordered),
+        "p95_s": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        "items": items,
+        "items_per_s": items / median if median > 0 else None,
+    }
+
+
+def _require(module: str):
+    try:
+        __import__(module)
+    except ImportError:
+        raise Skip(f"{module} not installed")
+
+
+# ──────────────────────────────────────────────────────────────
+#  Benchmarks — each returns (callable, items processed per call)
+# ──────────────────────────────────────────────────────────────
+
+class Context:
+    """Synthetic inputs for one size, generated lazily and shared between benchmarks."""
+
+    def __init__(self, workdir: Path, size: int, args):
+        self.workdir = workdir
+        self.size = size
+        self.args = args
+        self.lib_id = f"bench_{size}"
+        self._mgf: Optional[Path] = None
+        self._queries: Optional[List[List[Dict]]] = None
+
+    @property
+    def mgf(self) -> Path:
+        if self._mgf is None:
+            self._mgf = synthetic.write_mgf(
+                self.workdir / "deep_spectrum" / f"{self.lib_id}.mgf", self.size,
+                vocab_size=self.args.vocab_size, seed=self.args.seed)
+        return self._mgf
+
+    @property
+    def queries(self) -> List[List[Dict]]:
+        if self._queries is None:
+            rng = np.random.default_rng(self.args.seed + 1)
+            grid = synthetic.mz_grid(self.args.vocab_size)
+            self._queries = [synthetic.random_peaks(rng, int(rng.integers(5, 40)), grid)
+                             for _ in range(self.args.queries)]
+        return self._queries
+
+    def warm_library(self, ds):
+        """Write the library and fill the per-library caches: matching benchmarks measure steady-state queries."""
+        self.mgf
+        ds.get_library(self.lib_id)
+
+    def use_synthetic_model(self, ds):
+        """Install a synthetic Spec2Vec vocabulary (the real one has no tokens for synthetic peaks)."""
+        _require("gensim")
+        if getattr(ds, "_bench_vocab", None) != self.args.vocab_size:
+            ds._spec2vec_wv = synthetic.synthetic_keyed_vectors(self.args.vocab_size, seed=self.args.seed)
+            ds._bench_vocab = self.args.vocab_size
+
+
+def bench_parse_mgf(ctx: Context, ds):
+    path = ctx.mgf
+    return lambda: ds._parse_mgf(path), ctx.size
+
+
+def bench_spectrum_to_embedding(ctx: Context, ds):
+    ctx.use_synthetic_model(ds)
+    spectra = ds._parse_mgf(ctx.mgf)[:ctx.args.embed_sample]
+    return lambda: [ds._spectrum_to_embedding(sp) for sp in spectra], len(spectra)
+
+
+def bench_spectral_match(ctx: Context, ds):
+    _require("matchms")
+    ctx.warm_library(ds)
+    queries = ctx.queries
+
+    def run():
+        for peaks in queries:
+            ds.spectral_match(peaks, precursor_mz=peaks[-1]["mz"] + 1.007276, lib_id=ctx.lib_id)
+    return run, len(queries)
+
+
+def bench_spec2vec_match(ctx: Context, ds):
+    ctx.use_synthetic_model(ds)
+    ctx.warm_library(ds)
+    queries = ctx.queries
+
+    def run():
+        for peaks in queries:
+            ds.spec2vec_match(peaks, lib_id=ctx.lib_id)
+    return run, len(queries)
+
+
+def bench_spec2vec_broad_match(ctx: Context, ds):
+    ctx.use_synthetic_model(ds)
+    spectra = ds._parse_mgf(ctx.mgf)
+    vectors = np.array([ds._spectrum_to_embedding(sp) for sp in spectra], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    ds._broad_vectors = vectors / np.where(norms > 0, norms, 1.0)
+    ds._broad_metadata = [
+        {"id": f"BENCH{i:07d}", "name": sp["metadata"]["NAME"], "formula": sp["metadata"].get("FORMULA", ""),
+         "inchikey": "", "source": "bench"}
+        for i, sp in enumerate(spectra)
+    ]
+    queries = ctx.queries
+
+    def run():
+        for peaks in queries:
+            ds.spec2vec_broad_match(peaks)
+    return run, len(queries)
+
+
+def bench_merge_datasets(ctx: Context, ds):
+    from app import datafusion_service as fusion
+
+    n_files = ctx.args.fusion_files
+    files = synthetic.make_fusion_files(n_files, max(1, ctx.size // n_files), seed=ctx.args.seed)
+    dfs = fusion.parse_files(files)
+    rules = {"caseStrategy": "lowercase", "duplicateStrategy": "first"}
+    total = sum(len(df) for df in dfs.values())
+    return lambda: fusion.merge_datasets(dfs, "sample_id", "label", rules), total
+
+
+def bench_fuzzy_key_merge(ctx: Context, ds):
+    from app import datafusion_service as fusion
+
+    n_files = ctx.args.fusion_files
+    files = synthetic.make_fusion_files(
+        n_files, max(1, ctx.size // n_files), key_variant_rate=0.05, seed=ctx.args.seed
+    )
+    dfs = fusion.parse_files(files)
+    rules = {"caseStrategy": "lowercase", "duplicateStrategy": "first", "fuzzyKeyStrategy": "merge"}
+    total = sum(len(df) for df in dfs.values())
+    return lambda: fusion.merge_frame(dfs, "sample_id", "label", rules), total
+
+
+def bench_train_model(ctx: Context, ds):
+    from app.ml_service import MLService
+
+    testing_station = ctx.workdir / "datasets" / "testing_station"
+    testing_station.mkdir(parents=True, exist_ok=True)
+    dataset = f"bench_{ctx.size}.csv"
+    synthetic.make_ml_dataset(testing_station / dataset, ctx.size, seed=ctx.args.seed)
+
+    # MLService resolves datasets/ and trained_models/ relative to the working directory
+    service = MLService()
+    service.load_dataset(dataset)
+    X_train, X_test, y_train, y_test = service.prepare_data(dataset, 0.2, 42, None)
+
+    def run():
+        for model_name in ctx.args.models:
+            service.train_model(dataset, model_name, X_train, y_train, X_test, y_test)
+    return run, len(ctx.args.models)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Runner
+# ──────────────────────────────────────────────────────────────
+
+def run_benchmarks(args) -> Dict:
+    backend_dir = Path(__file__).resolve().parent.parent
+    if str(backend_dir) not in sys.path:
+        sys.path.insert(0, str(backend_dir))
+
+    results: Dict[str, Dict] = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        workdir = Path(tmp)
+        (workdir / "deep_spectrum").mkdir()
+        os.chdir(workdir)
+        try:
+            from app import deep_spectrum_service as ds
+            ds.DATASETS_DIR = workdir / "deep_spectrum"
+
+            for size in args.sizes:
+                ctx = Context(workdir, size, args)
+                for name in args.only or BENCHMARKS:
+                    key = f"{name}@{size}"
+                    try:
+                        fn, items = globals()[f"bench_{name}"](ctx, ds)
+                        results[key] = _summary(_time(fn, args.warmup, args.repeat), items)
+                        print(f"{key:<36} median {results[key]['median_s'] * 1000:10.2f} ms"
+                              f"   {results[key]['items_per_s'] or 0:12.1f} items/s")
+                    except Skip as e:
+                        results[key] = {"skipped": str(e)}
+                        print(f"{key:<36} skipped ({e})")
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": __import__("pandas").__version__,
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Median-vs-median comparison; returns the entries slower than baseline × (1 + tolerance)."""
+    regressions = []
+    print(f"\n{'benchmark':<36} {'baseline ms':>12} {'current ms':>12} {'ratio':>8}")
+    for key, result in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if not base or "median_s" not in base or "median_s" not in result:
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] > 0 else float("inf")
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append({"benchmark": key, "baseline_s": base["median_s"],
+                                "current_s": result["median_s"], "ratio": ratio})
+        print(f"{key:<36} {base['median_s'] * 1000:12.2f} {result['median_s'] * 1000:12.2f} {ratio:8.2f}{flag}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="library / dataset sizes (spectra or rows), e.g. 1000 100000 1000000")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=10, help="query spectra per matching call")
+    parser.add_argument("--embed-sample", type=int, default=5000, help="spectra embedded per call")
+    parser.add_argument("--vocab-size", type=int, default=20000, help="distinct m/z tokens")
+    parser.add_argument("--fusion-files", type=int, default=3)
+    parser.add_argument("--models", nargs="+", default=["Decision Tree", "Naive Bayes", "Random Forest"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed slowdown vs baseline before flagging a regression (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args)
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(current, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
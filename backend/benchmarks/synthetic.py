@@ -0,0 +1,123 @@
+"""
+Synthetic data with the same shapes as the real inputs.
+
+All generators are seeded so that two runs (e.g. baseline vs candidate) see
+identical data.  m/z values are drawn from a fixed grid of `vocab_size`
+values so that a synthetic Spec2Vec vocabulary covers every peak token.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+MZ_MIN, MZ_MAX = 50.0, 1000.0
+
+
+def mz_grid(vocab_size: int = 20000) -> np.ndarray:
+    """m/z values used by every synthetic spectrum (rounded like the peak@{mz:.2f} tokens)."""
+    return np.round(np.linspace(MZ_MIN, MZ_MAX, vocab_size), 2)
+
+
+def random_peaks(rng: np.random.Generator, n_peaks: int, grid: np.ndarray) -> List[Dict]:
+    """One spectrum's peaks as [{mz, intensity}] — the shape used by the API payloads."""
+    mz = np.sort(rng.choice(grid, size=min(n_peaks, len(grid)), replace=False))
+    intensity = np.round(rng.random(len(mz)) * 1000.0 + 1.0, 1)
+    return [{"mz": float(m), "intensity": float(i)} for m, i in zip(mz, intensity)]
+
+
+def write_mgf(path: Path, n_spectra: int, min_peaks: int = 5, max_peaks: int = 40,
+              vocab_size: int = 20000, seed: int = 0) -> Path:
+    """
+    Write an MGF library with n_spectra spectra.
+    Streams to disk in blocks so that libraries of 1M spectra never sit in memory.
+    """
+    rng = np.random.default_rng(seed)
+    grid = mz_grid(vocab_size)
+    path = Path(path)
+    block = 10000
+    with open(path, "w", encoding="utf-8") as fh:
+        for start in range(0, n_spectra, block):
+            lines: List[str] = []
+            for i in range(start, min(start + block, n_spectra)):
+                n_peaks = int(rng.integers(min_peaks, max_peaks + 1))
+                mz = np.sort(rng.choice(grid, size=n_peaks, replace=False))
+                intensity = rng.random(n_peaks) * 1000.0 + 1.0
+                precursor = float(mz[-1]) + 1.007276
+                lines.append("BEGIN IONS")
+                lines.append(f"NAME=Compound_{i} [M+H]+")
+                lines.append(f"FORMULA=C{10 + i % 20}H{12 + i % 30}N{i % 4}O{i % 6}")
+                lines.append(f"PEPMASS={precursor:.4f}")
+                lines.append(f"EXACTMASS={precursor - 1.007276:.4f}")
+                lines.append("IONMODE=positive")
+                lines.extend(f"{m:.4f} {v:.1f}" for m, v in zip(mz, intensity))
+                lines.append("END IONS")
+                lines.append("")
+            fh.write("\n".join(lines))
+    return path
+
+
+def synthetic_keyed_vectors(vocab_size: int = 20000, dim: int = 300, seed: int = 0):
+    """Random Spec2Vec-like KeyedVectors covering every token of mz_grid(vocab_size). Needs gensim."""
+    from gensim.models import KeyedVectors
+
+    rng = np.random.default_rng(seed)
+    kv = KeyedVectors(vector_size=dim)
+    tokens = [f"peak@{m:.2f}" for m in mz_grid(vocab_size)]
+    kv.add_vectors(tokens, rng.standard_normal((len(tokens), dim)).astype(np.float32))
+    return kv
+
+
+def make_ml_dataset(path: Path, n_rows: int, n_features: int = 20, n_classes: int = 3,
+                    seed: int = 0) -> Path:
+    """Classification CSV in the testing_station layout: numeric features, target in the last column."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 2.0, size=(n_classes, n_features))
+    y = rng.integers(0, n_classes, size=n_rows)
+    X = centers[y] + rng.normal(0, 1.0, size=(n_rows, n_features))
+    df = pd.DataFrame(X.astype(np.float32), columns=[f"f{i}" for i in range(n_features)])
+    df["target"] = np.array([f"class_{k}" for k in range(n_classes)])[y]
+    df.to_csv(path, index=False)
+    return Path(path)
+
+
+def make_fusion_files(n_files: int, rows_per_file: int, n_columns: int = 6,
+                      key_cardinality: Optional[int] = None, n_labels: int = 50,
+                      duplicate_rate: float = 0.05, case_rate: float = 0.1,
+                      conflict_rate: float = 0.02, key_variant_rate: float = 0.0,
+                      seed: int = 0) -> List[Dict]:
+    """
+    DataFusion upload payload: [{name, content}] CSV files sharing a key and a label column.
+    Injects exact duplicates, label case variants and key → label conflicts at the given rates,
+    and (key_variant_rate) keys written in another format ("s-00000042" for "S00000042").
+    """
+    rng = np.random.default_rng(seed)
+    key_cardinality = key_cardinality or max(1, rows_per_file * n_files // 2)
+    labels = np.array([f"Label_{i}" for i in range(n_labels)])
+    # Each key has one "true" label; conflicts replace it with another label
+    key_label = rng.integers(0, n_labels, size=key_cardinality)
+
+    files: List[Dict] = []
+    for f in range(n_files):
+        keys = rng.integers(0, key_cardinality, size=rows_per_file)
+        label_idx = key_label[keys].copy()
+        conflicting = rng.random(rows_per_file) < conflict_rate
+        label_idx[conflicting] = rng.integers(0, n_labels, size=int(conflicting.sum()))
+        label = labels[label_idx].astype(object)
+        variants = rng.random(rows_per_file)
+        label[variants < case_rate / 2] = np.char.lower(label[variants < case_rate / 2].astype(str))
+        upper = (variants >= case_rate / 2) & (variants < case_rate)
+        label[upper] = np.char.upper(label[upper].astype(str))
+
+        sample_id = np.array([f"S{k:08d}" for k in keys], dtype=object)
+        reformat = rng.random(rows_per_file) < key_variant_rate
+        sample_id[reformat] = [f"s-{k:08d}" for k in keys[reformat]]
+        df = pd.DataFrame({"sample_id": sample_id, "label": label})
+        for c in range(n_columns):
+            df[f"value_{c}"] = np.round(rng.normal(size=rows_per_file), 4)
+        n_dupes = int(rows_per_file * duplicate_rate)
+        if n_dupes:
+            df = pd.concat([df, df.sample(n=n_dupes, random_state=seed + f)], ignore_index=True)
+        files.append({"name": f"source_{f}.csv", "content": df.to_csv(index=False)})
+    return files
@@ -0,0 +1,59 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The backend is run from backend/ (uvicorn app.main:app): make `app` importable the same way
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# app.main opens the persisted DataFusion datasets at import: keep them out of the tree
+if "DATAFUSION_STORE_DIR" not in os.environ:
+    os.environ["DATAFUSION_STORE_DIR"] = tempfile.mkdtemp(prefix="fusion_datasets_")
+    atexit.register(shutil.rmtree, os.environ["DATAFUSION_STORE_DIR"], True)
+
+from benchmarks.synthetic import make_ml_dataset  # noqa: E402
+
+ML_DATASET = "ml.csv"
+
+
+@pytest.fixture
+def ml_workdir(tmp_path, monkeypatch):
+    """
+    Working directory holding datasets/testing_station/ml.csv (600 rows, 5
+    features, 3 classes).  MLService resolves datasets/ and trained_models/
+    from the working directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    station = tmp_path / "datasets" / "testing_station"
+    station.mkdir(parents=True)
+    make_ml_dataset(station / ML_DATASET, 600, n_features=5, seed=0)
+    return tmp_path
+
+
+@pytest.fixture
+def ml_service(ml_workdir):
+    from app.ml_service import MLService
+
+    return MLService()
+
+
+@pytest.fixture
+def trained(ml_service):
+    """ml_service with a Decision Tree trained on ml.csv; returns (service, dataset, model name)."""
+    X_train, X_test, y_train, y_test = ml_service.prepare_data(ML_DATASET, 0.2, 42)
+    ml_service.train_model(ML_DATASET, "Decision Tree", X_train, y_train, X_test, y_test)
+    return ml_service, ML_DATASET, "Decision Tree"
+
+
+@pytest.fixture
+def api(ml_service, monkeypatch):
+    """TestClient on app.main, with its MLService replaced by the one in the temporary working directory."""
+    from fastapi.testclient import TestClient
+    from app import main
+
+    monkeypatch.setattr(main, "ml_service", ml_service)
+    return TestClient(main.app)
@@ -0,0 +1,82 @@
+"""
+Random DataFusion inputs shared by the tests: CSV files drawn from small
+per-column vocabularies, so keys collide, case variants meet and empty
+cells, zeros and mixed-type columns show up at every seed.
+"""
+import io
+import random
+
+import pandas as pd
+
+from app import datafusion_service as D
+
+VOCABULARIES = {
+    "id": ["0", "1", "k3", "GNPS-0001", "gnps_0001", "GNPS 0001", "CCMS1", "ccms-1", "Caffeine", "caffeine", ""],
+    "label": ["A", "a", "B", "b", "Cat", "0", ""],
+    "flag": ["True", "False", ""],
+    "n": ["1", "2", "30", ""],
+    "x": ["0", "1", "2", ""],
+    "y": ["0", "0.5", "-1.25", ""],     # exact binary fractions: every parser reads the same float
+    "z": ["p", "q", "0", ""],
+    "mixed": ["1", "2", "1.0", "n/a2", ""],     # numeric in some files, text in others
+}
+
+
+def random_csv(rnd: random.Random, n_rows: int, columns, blank_rows: float = 0.0) -> str:
+    """CSV text with the given columns; blank_rows is the share of all-empty rows."""
+    rows = [",".join(columns)]
+    for _ in range(n_rows):
+        if rnd.random() < blank_rows:
+            rows.append("," * (len(columns) - 1))
+        else:
+            rows.append(",".join(rnd.choice(VOCABULARIES[col]) for col in columns))
+    return "\n".join(rows) + "\n"
+
+
+def random_frame(rnd: random.Random, n_rows: int, columns, name: str = "f.csv"):
+    """A random CSV parsed the way an upload is."""
+    return D.parse_text(random_csv(rnd, n_rows, columns), name)
+
+
+def random_rules(rnd: random.Random) -> dict:
+    return {
+        "caseStrategy": rnd.choice(["lowercase", "uppercase", "keep"]),
+        "duplicateStrategy": rnd.choice(["first", "last"]),
+        "fuzzyKeyStrategy": rnd.choice(["off", "report", "merge"]),
+        "fuzzyThreshold": rnd.choice([0.5, 0.7, 0.85, 1.0]),
+        "fuzzyNgram": rnd.choice([2, 3]),
+    }
+
+
+def random_files(seed: int):
+    """
+    1-4 small files; some lack the label or value columns, about half are
+    compacted to categoricals.  Returns ({name: csv text}, {name: frame}, key, label, rules).
+    """
+    rnd = random.Random(seed)
+    texts, frames = {}, {}
+    for f in range(rnd.randint(1, 4)):
+        name = f"f{f}.csv"
+        columns = ["id"] + [col for col in ("label", "x", "mixed") if rnd.random() < 0.7]
+        texts[name] = random_csv(rnd, rnd.randint(0, 40), columns)
+        df = pd.read_csv(io.StringIO(texts[name]))
+        frames[name] = D.compact_frame(df) if rnd.random() < 0.5 else df
+    key = rnd.choice(["id", "id", "label", ""])
+    label = rnd.choice(["label", "label", ""])
+    return texts, frames, key, label, random_rules(rnd)
+
+
+def keyed_frames(rnd: random.Random, n_files: int, n_rows: int, n_keys: int) -> dict:
+    """Uncompacted frames with many distinct keys ("k00"…) sharing the label vocabulary."""
+    return {
+        f"f{f}.csv": pd.DataFrame({
+            "id": [f"k{rnd.randrange(n_keys):02d}" for _ in range(n_rows)],
+            "label": [rnd.choice(VOCABULARIES["label"]) or None for _ in range(n_rows)],
+        })
+        for f in range(n_files)
+    }
+
+
+def upload(texts: dict) -> list:
+    """Multipart `files` for the TestClient."""
+    return [("files", (name, io.BytesIO(text.encode()), "text/csv")) for name, text in texts.items()]
@@ -0,0 +1,54 @@
+import pytest
+
+from app import executors
+from conftest import ML_DATASET
+
+
+@pytest.fixture
+def process_pool():
+    yield executors.cpu_process
+    executors.cpu_process.shutdown()
+
+
+def test_cross_validation_runs_folds_on_the_shared_pool(ml_service, process_pool):
+    seen = []
+    metrics = ml_service.cross_validate_model(
+        ML_DATASET, "Decision Tree", n_splits=4,
+        on_fold=lambda fold, result, done, total: seen.append((fold, done, total)),
+    )
+    cv = metrics["cv"]
+    assert sorted(fold for fold, _, _ in seen) == [0, 1, 2, 3]
+    assert [done for _, done, _ in seen] == [1, 2, 3, 4]
+    assert cv["n_splits"] == 4 and cv["stratified"]
+    assert sum(f["n_test_samples"] for f in cv["folds"]) == 600
+    assert 0 <= cv["mean"]["accuracy"] <= 1
+    assert process_pool.stats()["in_flight"] == 0
+    # the model trained alongside the folds is saved with the cv summary
+    assert ml_service._load_model(f"{ML_DATASET}_Decision_Tree")["metadata"]["metrics"]["cv"] == cv
+
+
+def test_cancelling_from_on_fold_stops_cross_validation(ml_service, process_pool):
+    class Cancelled(Exception):
+        pass
+
+    def on_fold(fold, result, done, total):
+        raise Cancelled
+
+    with pytest.raises(Cancelled):
+        ml_service.cross_validate_model(ML_DATASET, "Decision Tree", n_splits=5, on_fold=on_fold)
+    assert process_pool.stats()["in_flight"] == 0
+
+
+def test_fold_indices_cache_is_bounded(ml_workdir):
+    from app.ml_service import MLService
+
+    service = MLService(splits_cache_size=2)
+    service.load_dataset(ML_DATASET)
+    cols = service._resolve_features(ML_DATASET, None)
+    _, y = service._feature_matrix(ML_DATASET, cols)
+    first = service._cv_folds(ML_DATASET, cols, y, 3, True, 0)
+    service._cv_folds(ML_DATASET, cols, y, 3, True, 1)
+    assert service._cv_folds(ML_DATASET, cols, y, 3, True, 0) is first   # hit, now most recent
+    service._cv_folds(ML_DATASET, cols, y, 3, True, 2)
+    assert len(service.folds_cache) == 2
+    assert (ML_DATASET, tuple(cols), 3, True, 1) not in service.folds_cache
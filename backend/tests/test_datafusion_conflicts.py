@@ -0,0 +1,55 @@
+import random
+import warnings
+
+import pandas as pd
+import pytest
+
+from app import datafusion_service as D
+from factories import keyed_frames, random_files
+
+
+def reference_conflicts(dfs, key, label):
+    """Row-by-row case issues and key conflicts, as detect_conflicts computed them before vectorising."""
+    combined = D.concat_frames(dfs.values())
+    case_issues, key_conflicts = [], []
+    if label and label in combined.columns:
+        lower_map = {}
+        for v in combined[label].dropna().astype(str).tolist():
+            lower_map.setdefault(v.lower(), set()).add(v)
+        case_issues = [{"lower": k, "variants": sorted(v)} for k, v in lower_map.items() if len(v) > 1]
+        if key and key in combined.columns:
+            grouped = combined.groupby(key, observed=True)[label].apply(
+                lambda x: sorted(set(x.dropna().astype(str).tolist())))
+            key_conflicts = [{"key": str(k), "labels": v} for k, v in grouped.items() if len(v) > 1]
+    return case_issues[:D.CASE_ISSUES_LIMIT], key_conflicts[:D.KEY_CONFLICTS_LIMIT]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_vectorised_detection_matches_row_by_row(seed):
+    _, dfs, key, label, rules = random_files(seed)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        conflicts = D.detect_conflicts(dfs, key, label)
+        case_issues, key_conflicts = reference_conflicts(dfs, key, label)
+    assert conflicts["case_issues"] == case_issues
+    assert conflicts["key_conflicts"] == key_conflicts
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_limits_keep_the_first_issues(seed):
+    rnd = random.Random(seed)
+    dfs = keyed_frames(rnd, 3, 2000, 400)
+    # 60 labels in two spellings each: more case issues than CASE_ISSUES_LIMIT
+    for df in dfs.values():
+        df["label"] = [f"{rnd.choice(['L', 'l'])}{rnd.randrange(60)}" for _ in range(len(df))]
+    conflicts = D.detect_conflicts(dfs, "id", "label")
+    case_issues, key_conflicts = reference_conflicts(dfs, "id", "label")
+    assert len(conflicts["case_issues"]) == D.CASE_ISSUES_LIMIT
+    assert len(conflicts["key_conflicts"]) == D.KEY_CONFLICTS_LIMIT
+    assert (conflicts["case_issues"], conflicts["key_conflicts"]) == (case_issues, key_conflicts)
+
+
+def test_numbers_and_their_text_are_one_label():
+    dfs = {"a.csv": pd.DataFrame({"id": ["k"], "label": [1]}),
+           "b.csv": pd.DataFrame({"id": ["k"], "label": ["1"]})}
+    assert D.detect_conflicts(dfs, "id", "label")["key_conflicts"] == []
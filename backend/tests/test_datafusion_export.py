@@ -0,0 +1,55 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from app import datafusion_service as D
+from factories import random_files, upload
+
+
+def merged(seed):
+    _, dfs, key, label, rules = random_files(seed)
+    frame, _ = D.merge_frame(dfs, key, label, rules)
+    return frame
+
+
+def as_text(frame):
+    """Cell values as the CSV export writes them, for comparing round trips."""
+    return frame.astype(object).where(frame.notna(), None).astype(str)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_csv_and_ndjson_exports_round_trip(seed):
+    frame = merged(seed)
+    csv = b"".join(D.iter_export(frame, "csv", chunk_rows=7))
+    assert csv == frame.to_csv(index=False).encode()
+    lines = b"".join(D.iter_export(frame, "ndjson", chunk_rows=7)).decode().splitlines()
+    assert [json.loads(line) for line in lines] == json.loads(json.dumps(D.to_records(frame), default=str))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_parquet_export_round_trips_mixed_columns(seed):
+    pq = pytest.importorskip("pyarrow.parquet")
+    frame = merged(seed)
+    table = pq.read_table(io.BytesIO(b"".join(D.iter_export(frame, "parquet", chunk_rows=7))))
+    assert table.num_rows == len(frame)
+    expected = as_text(frame.reset_index(drop=True))
+    pd.testing.assert_frame_equal(as_text(table.to_pandas()), expected, check_dtype=False)
+
+
+def test_unconvertible_frame_fails_before_streaming():
+    pytest.importorskip("pyarrow")
+    with pytest.raises(ValueError, match="Cannot export as parquet"):
+        D.iter_export(pd.DataFrame({"z": [1 + 2j]}), "parquet")
+
+
+def test_session_export_of_a_mixed_column(api):
+    pq = pytest.importorskip("pyarrow.parquet")
+    texts = {"a.csv": "id,v\nx,1\n", "b.csv": "id,v\ny,n/a2\n"}
+    session = api.post("/datafusion/sessions", files=upload(texts)).json()["session_id"]
+    response = api.post(f"/datafusion/sessions/{session}/export", json={"key_column": "id", "format": "parquet"})
+    assert response.status_code == 200
+    assert pq.read_table(io.BytesIO(response.content)).column("v").to_pylist() == ["1", "n/a2"]
+    response = api.post(f"/datafusion/sessions/{session}/export", json={"key_column": "id", "format": "xlsx"})
+    assert response.status_code == 400
@@ -0,0 +1,49 @@
+import itertools
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import datafusion_fuzzy as F
+
+
+def grams(value, n):
+    padded = f" {value} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def brute_force_pairs(values, threshold, n):
+    pairs = set()
+    for i, j in itertools.combinations(range(len(values)), 2):
+        a, b = grams(values[i], n), grams(values[j], n)
+        if a and b and len(a & b) / len(a | b) >= threshold - 1e-9:
+            pairs.add((i, j))
+    return pairs
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("n", [2, 3, 4, 5])
+def test_similar_pairs_match_brute_force(seed, n):
+    rnd = random.Random(seed)
+    alphabet = rnd.choice(["ab0", "abc01", "abcdéü9"])
+    values = sorted({"".join(rnd.choice(alphabet) for _ in range(rnd.randint(1, 9))) for _ in range(150)})
+    values = np.asarray(values, dtype=object)
+    threshold = rnd.choice([0.5, 0.7, 0.85])
+    a, b, scores = F._similar_pairs(values, threshold, n)
+    found = {(min(i, j), max(i, j)) for i, j in zip(a.tolist(), b.tolist())}
+    assert found == brute_force_pairs(list(values), threshold, n)
+
+
+def test_five_grams_keep_their_first_character():
+    values = np.asarray(["ba0", "bba0"], dtype=object)
+    a, _, _ = F._similar_pairs(values, 0.85, 5)
+    assert len(a) == 0
+
+
+def test_threshold_one_ignores_case_only():
+    keys = pd.Series(["GNPS-12-3", "GNPS-1-23", "gnps-12-3", "GNPS-12-3"])
+    resolved, report, rewritten = F.resolve_keys(keys, threshold=1.0)
+    assert resolved.tolist() == ["GNPS-12-3", "GNPS-1-23", "GNPS-12-3", "GNPS-12-3"]
+    assert rewritten == 1
+    assert [sorted(c["variants"]) for c in report] == [["GNPS-12-3", "gnps-12-3"]]
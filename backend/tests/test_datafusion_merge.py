@@ -0,0 +1,45 @@
+import random
+import warnings
+
+import pytest
+
+from app import datafusion_service as D
+from factories import keyed_frames, random_files
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_analyze_merge_matches_detect_and_dry_run(seed):
+    _, dfs, key, label, rules = random_files(seed)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        analysis = D.analyze_merge(dfs, key, label, rules)
+        conflicts = D.detect_conflicts(dfs, key, label, rules)
+        dry_run = D.merge_datasets(dfs, key, label, rules, dry_run=True)
+    assert analysis["conflicts"] == conflicts
+    assert analysis["stats"] == dry_run["stats"]
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_compacted_frames_keep_conflict_order(seed):
+    """Categorical columns from compact_frame report key conflicts in the object-column order."""
+    rnd = random.Random(seed)
+    dfs = keyed_frames(rnd, rnd.randint(2, 4), 200, 81)
+    compacted = {name: D.compact_frame(df) for name, df in dfs.items()}
+    assert D.detect_conflicts(compacted, "id", "label") == D.detect_conflicts(dfs, "id", "label")
+
+
+def test_numbers_and_numeric_looking_text_are_not_duplicates():
+    a = D.parse_text("id,v,label\nx,1,A\ny,2,B\n", "a.csv")
+    b = D.parse_text("id,v,label\nx,1,A\ny,n/a2,B\n", "b.csv")
+    assert b["v"].dtype == object                # "1" stays text next to "n/a2"
+    analysis = D.analyze_merge({"a.csv": a, "b.csv": b}, "id", "label", {})
+    merged = D.merge_datasets({"a.csv": a, "b.csv": b}, "id", "label", {})
+    assert analysis["conflicts"]["exact_duplicates"] == 0
+    assert analysis["stats"] == merged["stats"]
+    assert merged["stats"]["duplicates_removed"] == 0
+
+
+def test_label_column_without_values():
+    dfs = {"a.csv": D.parse_text("id,label\n1,\n", "a.csv"), "b.csv": D.parse_text("id\n2\n", "b.csv")}
+    analysis = D.analyze_merge(dfs, "id", "label", {})
+    assert analysis["stats"] == D.merge_datasets(dfs, "id", "label", {}, dry_run=True)["stats"]
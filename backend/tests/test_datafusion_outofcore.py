@@ -0,0 +1,75 @@
+import io
+
+import pandas as pd
+import pytest
+
+from app import datafusion_service as D
+from app.datafusion_outofcore import merge_out_of_core
+from factories import random_files
+
+
+def sorted_rows(csv_text: str):
+    """(rows as sorted text tuples, columns): the out-of-core merge groups rows by partition."""
+    df = pd.read_csv(io.StringIO(csv_text), dtype=str, keep_default_na=False)
+    return sorted(df.itertuples(index=False, name=None)), list(df.columns)
+
+
+def write_files(texts: dict, directory) -> dict:
+    paths = {}
+    for name, text in texts.items():
+        paths[name] = directory / name
+        paths[name].write_text(text)
+    return paths
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("partitions", [1, 3])
+def test_out_of_core_matches_in_memory_merge(seed, partitions, tmp_path):
+    texts, _, key, label, rules = random_files(seed)
+    paths = write_files(texts, tmp_path)
+    options = {"key_column": key, "label_col": label, "rules": rules}
+
+    merged, expected_stats = D.merge_frame(D.parse_paths(paths), key, label, rules)
+    output = tmp_path / "merged.csv"
+    stats = merge_out_of_core(paths, options, output, tmp_path / "spill", partitions=partitions, chunksize=7)
+
+    assert stats == expected_stats
+    assert sorted_rows(output.read_text()) == sorted_rows(merged.to_csv(index=False))
+    assert not list((tmp_path / "spill").iterdir())
+
+
+def test_column_mapping_is_applied_per_file(tmp_path):
+    paths = write_files({"a.csv": "ID,cls\n1,A\n2,B\n", "b.csv": "id,label\n1,a\n3,C\n"}, tmp_path)
+    options = {
+        "column_mapping": {"a.csv": {"ID": "id", "cls": "label"}},
+        "key_column": "id", "label_col": "label", "rules": {"caseStrategy": "lowercase"},
+    }
+    stats = merge_out_of_core(paths, options, tmp_path / "merged.csv", tmp_path / "spill", partitions=2)
+
+    assert stats["total_input"] == 4 and stats["duplicates_removed"] == 1
+    rows, columns = sorted_rows((tmp_path / "merged.csv").read_text())
+    assert columns == ["id", "label", "_conflict"]
+    assert rows == [("1", "a", "False"), ("2", "b", "False"), ("3", "c", "False")]
+
+
+def test_unparsable_file_is_reported_by_name(tmp_path):
+    paths = write_files({"bad.csv": 'id,label\n"1,a\n'}, tmp_path)
+    with pytest.raises(ValueError, match="bad.csv"):
+        merge_out_of_core(paths, {}, tmp_path / "merged.csv", tmp_path / "spill")
+
+
+def test_mixed_column_does_not_depend_on_chunk_boundaries(tmp_path, monkeypatch):
+    # Chunks of 2 rows: ["1", "2"] parse as ints, ["1.0", "n/a2"] as text, ["True", ""] as booleans
+    path = tmp_path / "a.csv"
+    path.write_text("id,mixed\n1,1\n2,2\n3,1.0\n4,n/a2\n5,True\n6,\n")
+    assert D.mixed_columns(pd.read_csv(path, chunksize=2)) == ["mixed"]
+
+    whole = pd.read_csv(path)["mixed"].tolist()
+    monkeypatch.setattr(D, "_has_pyarrow", lambda: False)
+    chunked = D.parse_csv_path(path, "a.csv", chunksize=2)["mixed"]
+    assert chunked.astype(object).where(chunked.notna(), None).tolist() == whole[:5] + [None]
+
+    stats = merge_out_of_core({"a.csv": path}, {}, tmp_path / "merged.csv", tmp_path / "spill", chunksize=2)
+    rows, _ = sorted_rows((tmp_path / "merged.csv").read_text())
+    assert stats["duplicates_removed"] == 0
+    assert [row[1] for row in rows] == ["1", "2", "1.0", "n/a2", "True", ""]
@@ -0,0 +1,29 @@
+import io
+import random
+
+import pandas as pd
+import pytest
+
+from app import datafusion_service as D
+from factories import random_csv
+
+pytest.importorskip("pyarrow")
+
+COLUMNS = ["id", "label", "flag", "n", "x", "y", "mixed"]
+
+
+def parse(text, monkeypatch, pyarrow, chunksize=None):
+    monkeypatch.setattr(D, "_has_pyarrow", lambda: pyarrow)
+    return D.read_csv_source(lambda: io.BytesIO(text.encode()), "f.csv", chunksize)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_pyarrow_parse_matches_c_parser(seed, monkeypatch):
+    rnd = random.Random(seed)
+    text = random_csv(rnd, rnd.randint(1, 60), COLUMNS, blank_rows=0.1)
+    arrow = parse(text, monkeypatch, True)
+    c = parse(text, monkeypatch, False)
+    pd.testing.assert_frame_equal(arrow, c)
+    pd.testing.assert_frame_equal(parse(text, monkeypatch, False, chunksize=7), c)
+    for strategy in ("lowercase", "uppercase"):
+        assert D.normalize_case(arrow, "label", strategy).equals(D.normalize_case(c, "label", strategy))
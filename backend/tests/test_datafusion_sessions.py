@@ -0,0 +1,96 @@
+import json
+import random
+
+import pytest
+
+from app import datafusion_service as D
+from app import datafusion_sessions as S
+from factories import random_files, random_frame, upload
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(S.time, "time", clock)
+    return clock
+
+
+def frames(seed, n_rows=30):
+    return {"a.csv": random_frame(random.Random(seed), n_rows, ["id", "label", "x"])}
+
+
+def test_idle_sessions_expire(clock):
+    store = S.SessionStore(ttl=60)
+    idle, active = store.create(frames(0)), store.create(frames(1))
+    clock.now += 45
+    store.get(active.id)
+    clock.now += 30
+    assert store.get(active.id) is active
+    with pytest.raises(ValueError, match="not found or expired"):
+        store.get(idle.id)
+
+
+def test_least_recently_used_sessions_are_evicted_first(clock):
+    size = S.SessionStore().create(frames(0)).size_bytes
+    store = S.SessionStore(max_bytes=int(2.5 * size))
+    first, second = store.create(frames(0)), store.create(frames(0))
+    store.get(first.id)                       # second is now the least recently used
+    third = store.create(frames(0))
+    assert store.stats()["sessions"] == 2
+    assert store.get(first.id) is first and store.get(third.id) is third
+    with pytest.raises(ValueError):
+        store.get(second.id)
+
+
+def test_a_session_above_the_cap_is_rejected():
+    store = S.SessionStore(max_bytes=1)
+    with pytest.raises(ValueError, match="session memory cap"):
+        store.create(frames(0))
+    assert store.stats()["sessions"] == 0
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_session_merge_matches_a_one_shot_merge(seed):
+    _, dfs, key, label, rules = random_files(seed)
+    options = {"key_column": key, "label_col": label, "rules": rules}
+    session = S.SessionStore().create(dfs)
+    for dry_run in (False, True):
+        expected = D.analyze_merge(dfs, key, label, rules) if dry_run else D.merge_datasets(dfs, key, label, rules)
+        assert session.merge({**options, "dry_run": dry_run}) == expected
+
+
+def test_merged_frame_is_reused_until_the_inputs_change(monkeypatch):
+    calls = []
+    merge_frame = S.merge_frame
+    monkeypatch.setattr(S, "merge_frame", lambda *args: calls.append(1) or merge_frame(*args))
+    session = S.SessionStore().create({**frames(0), "b.csv": frames(1)["a.csv"]})
+    options = {"key_column": "id", "label_col": "label", "rules": {}}
+
+    session.merge(options)
+    session.preview({**options, "offset": 10, "limit": 5})
+    assert len(calls) == 1
+    session.remove_file("b.csv")
+    assert session.preview(options)["stats"]["total_input"] == 30
+    assert len(calls) == 2
+
+
+def test_session_endpoints_match_the_one_shot_endpoint(api):
+    texts, _, key, label, rules = random_files(7)
+    options = {"key_column": key, "label_col": label, "rules": rules}
+    created = api.post("/datafusion/sessions", files=upload(texts)).json()
+    session_url = f"/datafusion/sessions/{created['session_id']}"
+    assert [f["name"] for f in created["files"]] == list(texts)
+
+    one_shot = api.post("/datafusion/upload/merge", files=upload(texts), data={"options": json.dumps(options)})
+    assert api.post(f"{session_url}/merge", json=options).json() == one_shot.json()
+
+    assert api.delete(session_url).status_code == 200
+    assert api.post(f"{session_url}/merge", json=options).status_code == 404
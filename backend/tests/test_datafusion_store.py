@@ -0,0 +1,76 @@
+import random
+import warnings
+
+import numpy as np
+import pytest
+
+from app import datafusion_service as D
+from app import datafusion_store as S
+from app.datafusion_store import DatasetStore
+from factories import random_frame
+
+STATS = ("total_input", "total_output", "duplicates_removed", "conflicts_found")
+
+
+def random_dataset(seed):
+    """(rules, [(name, frame)], number of files in the create call) for one seed."""
+    rnd = random.Random(seed)
+    rules = {
+        "caseStrategy": rnd.choice(["lowercase", "uppercase", "keep"]),
+        "duplicateStrategy": rnd.choice(["first", "last", "none"]),
+    }
+    files = []
+    for i in range(rnd.randint(1, 5)):
+        columns = ["id"] + rnd.sample(["label", "x", "y", "z", "mixed"], rnd.randint(1, 5))
+        files.append((f"f{i}.csv", random_frame(rnd, rnd.randint(0, 30), columns, f"f{i}.csv")))
+    return rules, files, rnd.randint(1, len(files))
+
+
+def check_against_merge_frame(seed, tmp_path):
+    rules, files, cut = random_dataset(seed)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        store = DatasetStore(tmp_path)
+        store.create("ds", dict(files[:cut]), {"key_column": "id", "label_col": "label", "rules": rules})
+        for name, df in files[cut:]:
+            store.append("ds", {name: df})
+        merged, stats = D.merge_frame(dict(files), "id", "label", rules)
+
+    frame, store_stats = store.frame("ds")
+    assert frame.to_csv(index=False) == merged.to_csv(index=False)
+    assert store_stats == {k: stats[k] for k in STATS}
+
+
+def test_zero_is_not_null(tmp_path):
+    files = {"a.csv": D.parse_text("id,label,y\n1,cat,0\n", "a.csv"),
+             "b.csv": D.parse_text("id,label,y\n1,cat,\n", "b.csv")}
+    store = DatasetStore(tmp_path)
+    store.create("ds", {"a.csv": files["a.csv"]}, {"key_column": "id", "label_col": "label", "rules": {}})
+    info = store.append("ds", {"b.csv": files["b.csv"]})
+    assert info["stats"]["total_output"] == 2
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_append_matches_merge_frame(seed, tmp_path):
+    check_against_merge_frame(seed, tmp_path)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_hash_collisions_do_not_drop_rows(seed, tmp_path, monkeypatch):
+    # Every row gets the same hash: dedup must still go by the stored values
+    monkeypatch.setattr(S, "_row_hashes", lambda df: np.zeros(len(df), dtype=np.uint64))
+    check_against_merge_frame(seed, tmp_path)
+
+
+@pytest.mark.parametrize("strategy", ["first", "last"])
+def test_colliding_rows_are_kept_and_equal_rows_deduplicated(strategy, tmp_path, monkeypatch):
+    monkeypatch.setattr(S, "_row_hashes", lambda df: np.zeros(len(df), dtype=np.uint64))
+    store = DatasetStore(tmp_path)
+    options = {"key_column": "id", "label_col": "label", "rules": {"duplicateStrategy": strategy}}
+    store.create("ds", {"a.csv": D.parse_text("id,label\n1,a\n2,b\n", "a.csv")}, options)
+    info = store.append("ds", {"b.csv": D.parse_text("id,label\n2,b\n3,c\n1,a\n", "b.csv")})
+
+    assert info["append"]["inserted"] == (1 if strategy == "first" else 3)
+    assert info["append"]["replaced"] == (0 if strategy == "first" else 2)
+    assert info["stats"]["total_output"] == 3
+    assert sorted(store.frame("ds")[0]["id"].astype(int)) == [1, 2, 3]
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from factories import random_files, upload
+
+
+def json_files(texts):
+    return [{"name": name, "content": text} for name, text in texts.items()]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_multipart_merge_matches_json_merge(seed, api):
+    texts, _, key, label, rules = random_files(seed)
+    for dry_run in (False, True):
+        options = {"key_column": key, "label_col": label, "rules": rules, "dry_run": dry_run}
+        embedded = api.post("/datafusion/merge", json={"files": json_files(texts), **options})
+        streamed = api.post("/datafusion/upload/merge", files=upload(texts), data={"options": json.dumps(options)})
+        assert streamed.status_code == embedded.status_code
+        assert streamed.json() == embedded.json()
+
+
+def test_multipart_info_matches_json_info(api):
+    texts = random_files(3)[0]
+    embedded = api.post("/datafusion/info", json={"files": json_files(texts)})
+    streamed = api.post("/datafusion/upload/info", files=upload(texts))
+    assert streamed.status_code == 200
+    assert streamed.json() == embedded.json()
+
+
+def test_latin1_upload_is_decoded(api):
+    streamed = api.post("/datafusion/upload/info", files=upload({"a.csv": "id,name\n1,café\n"}))
+    text = "id,name\n1,café\n".encode("latin-1")
+    latin = api.post("/datafusion/upload/info", files=[("files", ("a.csv", text, "text/csv"))])
+    assert latin.status_code == 200
+    assert latin.json() == streamed.json()
+
+
+def test_duplicate_upload_names_are_rejected(api):
+    files = upload({"a.csv": "id\n1\n"}) + upload({"a.csv": "id\n2\n"})
+    response = api.post("/datafusion/upload/merge", files=files, data={"options": "{}"})
+    assert response.status_code == 400
+    assert "Duplicate file name" in response.json()["detail"]
+
+
+def test_latin1_upload_merges_out_of_core(api):
+    text = "id,name\n1,café\n2,crème\n".encode("latin-1")
+    response = api.post("/datafusion/upload/merge-large",
+                        files=[("files", ("a.csv", text, "text/csv"))],
+                        data={"options": json.dumps({"key_column": "id"})})
+    assert response.status_code == 200
+    assert sorted(response.text.splitlines()[1:]) == ["1,café,False", "2,crème,False"]
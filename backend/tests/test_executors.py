@@ -0,0 +1,82 @@
+import asyncio
+import contextvars
+import os
+
+import pytest
+
+from app import executors, instrumentation
+
+marker = contextvars.ContextVar("marker", default=None)
+
+
+def staged(value):
+    with instrumentation.span("staged"):
+        return value, marker.get()
+
+
+def crash():
+    os._exit(1)
+
+
+@pytest.fixture
+def pools():
+    thread = executors.InstrumentedPool("test-thread", "thread", 2)
+    process = executors.InstrumentedPool("test-process", "process", 1)
+    yield thread, process
+    thread.shutdown()
+    process.shutdown()
+
+
+def test_thread_tasks_run_in_the_callers_context(pools):
+    thread, _ = pools
+
+    async def request():
+        marker.set("request")
+        spans, token = instrumentation.begin_request()
+        try:
+            return await thread.run(staged, 1), spans
+        finally:
+            instrumentation.end_request(token)
+
+    result, spans = asyncio.run(request())
+    assert result == (1, "request")
+    assert [name for name, _ in spans] == ["staged", "queue_wait"]
+    assert thread.stats()["completed"] == 1 and thread.stats()["in_flight"] == 0
+
+
+def test_process_spans_are_replayed_in_the_request(pools):
+    _, process = pools
+
+    async def request():
+        spans, token = instrumentation.begin_request()
+        try:
+            return await process.run(staged, 2), spans
+        finally:
+            instrumentation.end_request(token)
+
+    result, spans = asyncio.run(request())
+    assert result == (2, None)
+    assert "staged" in [name for name, _ in spans]
+
+
+def test_a_crashed_worker_gets_the_pool_recreated(pools):
+    _, process = pools
+    with pytest.raises(executors.BrokenExecutor):
+        asyncio.run(process.run(crash))
+    assert asyncio.run(process.run(staged, 3)) == (3, None)
+    assert process.stats()["failed"] == 1
+
+
+def test_submit_from_a_worker_thread(pools):
+    thread, process = pools
+    assert thread.submit(staged, 4).result(timeout=30) == (4, None)
+    assert process.submit(staged, 5).result(timeout=60) == (5, None)
+    with pytest.raises(executors.BrokenExecutor):
+        process.submit(crash).result(timeout=60)
+    assert process.submit(staged, 6).result(timeout=60) == (6, None)
+
+
+def test_pool_metrics_are_exported(api):
+    body = api.get("/metrics").text
+    for pool in executors.POOLS:
+        assert f'executor_workers{{pool="{pool.name}"}} {pool.max_workers}' in body
@@ -0,0 +1,42 @@
+import pytest
+
+from conftest import ML_DATASET
+
+
+@pytest.fixture
+def knn(ml_service):
+    X_train, X_test, y_train, y_test = ml_service.prepare_data(ML_DATASET, 0.2, 42)
+    ml_service.train_model(ML_DATASET, "KNN", X_train, y_train, X_test, y_test)
+    return ml_service
+
+
+def test_permutation_importance_is_persisted_with_the_model(knn, monkeypatch):
+    importances = knn.get_feature_importance(ML_DATASET, "KNN")
+    assert sorted(i["feature"] for i in importances) == [f"f{i}" for i in range(5)]
+    assert sum(i["importance"] for i in importances) == pytest.approx(1.0)
+    assert [i["importance"] for i in importances] == sorted((i["importance"] for i in importances), reverse=True)
+    metadata = knn._load_model(f"{ML_DATASET}_KNN")["metadata"]
+    assert 0 < metadata["feature_importance_samples"] <= 120
+
+    # Later requests, also from a fresh service, read the saved value
+    from app.ml_service import MLService
+
+    fresh = MLService()
+    monkeypatch.setattr(fresh, "_adaptive_permutation_importance", pytest.fail)
+    assert fresh.get_feature_importance(ML_DATASET, "KNN") == importances
+
+
+def test_retraining_invalidates_saved_importances(knn):
+    knn.get_feature_importance(ML_DATASET, "KNN")
+    X_train, X_test, y_train, y_test = knn.prepare_data(ML_DATASET, 0.2, 42)
+    knn.train_model(ML_DATASET, "KNN", X_train, y_train, X_test, y_test)
+    assert knn._load_model(f"{ML_DATASET}_KNN")["metadata"].get("feature_importances") is None
+
+
+def test_adaptive_sample_stops_at_the_test_set_size(ml_service, knn):
+    X_train, X_test, y_train, y_test = ml_service.prepare_data(ML_DATASET, 0.2, 42)
+    model = ml_service._load_model(f"{ML_DATASET}_KNN")["model"]
+    _, size = ml_service._adaptive_permutation_importance(model, X_test, y_test, start_size=16, ci_tolerance=0.0)
+    assert size == len(X_test)
+    _, size = ml_service._adaptive_permutation_importance(model, X_test, y_test, start_size=16, ci_tolerance=10.0)
+    assert size == 16
@@ -0,0 +1,45 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def test_predict_batch_chunks_cover_every_row(trained):
+    service, dataset, model = trained
+    frame = pd.read_csv(f"datasets/testing_station/{dataset}").iloc[:25]
+    X, features = service.prepare_inference_input(dataset, model, rows=frame.to_dict("records"))
+    assert features == [f"f{i}" for i in range(5)]
+
+    chunks = list(service.predict_batch(dataset, model, X, chunk_size=10))
+    assert [c["offset"] for c in chunks] == [0, 10, 20]
+    assert sum(c["count"] for c in chunks) == 25
+    predictions = [p for c in chunks for p in c["predictions"]]
+    assert predictions == service.trained_models[f"{dataset}_Decision_Tree"]["model"].predict(X).tolist()
+    assert all(len(row) == 3 for c in chunks for row in c["probabilities"])
+
+
+def test_infer_upload_reads_csv_sent_as_octet_stream(trained, api):
+    _, dataset, model = trained
+    csv = pd.read_csv(f"datasets/testing_station/{dataset}").iloc[:5].to_csv(index=False).encode()
+    response = api.post(
+        "/infer/upload",
+        data={"dataset": dataset, "model_name": model},
+        files={"file": ("batch.csv", csv, "application/octet-stream")},
+    )
+    assert response.status_code == 200
+    lines = response.text.strip().split("\n")
+    assert sum(len(json.loads(line)["predictions"]) for line in lines[1:]) == 5
+
+
+def test_infer_upload_reads_npy_by_magic_number(trained, api):
+    _, dataset, model = trained
+    buffer = io.BytesIO()
+    np.save(buffer, np.zeros((3, 5)))
+    response = api.post(
+        "/infer/upload",
+        data={"dataset": dataset, "model_name": model},
+        files={"file": ("batch.bin", buffer.getvalue(), "application/octet-stream")},
+    )
+    assert response.status_code == 200
+    assert '"n_rows": 3' in response.text.split("\n")[0]
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+
+from app.job_manager import JobCancelled, JobManager
+from app.ml_service import _fit
+from conftest import ML_DATASET
+
+
+def wait_finished(job, timeout=30):
+    deadline = time.time() + timeout
+    while not job.finished:
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return job
+
+
+@pytest.fixture
+def manager():
+    return JobManager(max_workers=1, orphan_timeout=0.05)
+
+
+def test_identical_requests_share_a_job(manager):
+    release = threading.Event()
+    job, deduplicated = manager.submit(("k",), "m", lambda job: release.wait(5) and {"ok": 1})
+    again, deduplicated_again = manager.submit(("k",), "m", lambda job: {"other": 1})
+    assert (deduplicated, deduplicated_again, again) == (False, True, job)
+    release.set()
+    assert wait_finished(job).result == {"ok": 1}
+    assert job.events[-1]["status"] == "completed"
+
+
+def test_cancellation_stops_at_the_next_checkpoint(manager):
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.set_fraction(0.5)
+            time.sleep(0.01)
+
+    job, _ = manager.submit(("k",), "m", work)
+    started.wait(5)
+    manager.cancel(job.id)
+    assert wait_finished(job).status == "cancelled"
+    assert job.snapshot()["interruptible"] is True
+
+
+def test_failures_are_logged(manager, caplog):
+    def work(job):
+        raise RuntimeError("boom")
+
+    job, _ = manager.submit(("k",), "m", work)
+    wait_finished(job)
+    assert (job.status, job.error) == ("failed", "boom")
+    assert "Error training m" in caplog.text and "RuntimeError: boom" in caplog.text
+
+
+def test_orphaned_job_is_cancelled(manager):
+    def work(job):
+        while True:
+            job.set_fraction(0.1)
+            time.sleep(0.01)
+
+    job, _ = manager.submit(("k",), "m", work)
+    queue = asyncio.Queue()
+    manager.subscribe(job.id, None, queue)
+    manager.unsubscribe(job, queue)
+    assert wait_finished(job).status == "cancelled"
+
+
+@pytest.mark.parametrize("ModelClass, params", [
+    (GradientBoostingClassifier, {"n_estimators": 50, "random_state": 0}),
+    (RandomForestClassifier, {"n_estimators": 50, "random_state": 0}),
+])
+def test_interruptible_models_check_for_cancellation_during_fit(ModelClass, params):
+    rng = np.random.RandomState(0)
+    X, y = rng.rand(200, 4), rng.randint(0, 3, 200)
+    calls = []
+
+    def checkpoint():
+        calls.append(1)
+        if len(calls) == 3:
+            raise JobCancelled()
+
+    with pytest.raises(JobCancelled):
+        _fit(ModelClass, params, X, y, checkpoint)
+
+    # Without cancellation the checkpointed fit gives the same model as a plain fit
+    plain = _fit(ModelClass, params, X, y)
+    checked = _fit(ModelClass, params, X, y, lambda: None)
+    np.testing.assert_array_equal(plain.predict_proba(X), checked.predict_proba(X))
+    assert checked.get_params() == plain.get_params()
+
+
+def test_training_job_reports_whether_it_is_interruptible(ml_service, manager, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "ml_service", ml_service)
+    request = {"dataset": ML_DATASET}
+    tree, _ = manager.submit(("tree",), "Decision Tree",
+                             lambda job: main.run_training_job(job, request, "Decision Tree"))
+    forest, _ = manager.submit(("forest",), "Random Forest",
+                               lambda job: main.run_training_job(job, request, "Random Forest"))
+    assert wait_finished(tree).status == "completed" and not tree.interruptible
+    assert wait_finished(forest).status == "completed" and forest.interruptible
@@ -0,0 +1,49 @@
+import json
+
+from app.model_registry import ModelRegistry
+from app.model_store import ModelStore
+from conftest import ML_DATASET
+
+
+def metadata(dataset, model_name, task_type="classification", accuracy=0.5):
+    return {"dataset": dataset, "model_name": model_name, "task_type": task_type,
+            "metrics": {"accuracy": accuracy}, "selected_features": ["a", "b"]}
+
+
+def test_upsert_and_filtered_listing(tmp_path):
+    registry = ModelRegistry(tmp_path / "registry.sqlite3")
+    assert registry.is_empty()
+    registry.upsert("d.csv_KNN", metadata("d.csv", "KNN"))
+    registry.upsert("d.csv_SVM", metadata("d.csv", "SVM", "regression"))
+    # Same prefix as d.csv: the old glob on "d.csv*_metadata.json" mixed the two up
+    registry.upsert("d.csv.bak_KNN", metadata("d.csv.bak", "KNN"))
+    registry.upsert("d.csv_KNN", metadata("d.csv", "KNN", accuracy=0.9))
+
+    assert [m["model_name"] for m in registry.list_models("d.csv")] == ["KNN", "SVM"]
+    assert registry.list_models("d.csv", model_name="KNN")[0]["metrics"]["accuracy"] == 0.9
+    assert [m["model_name"] for m in registry.list_models("d.csv", task_type="regression")] == ["SVM"]
+    assert registry.list_models("other.csv") == []
+
+
+def test_rebuild_imports_existing_metadata_files(tmp_path):
+    store = ModelStore(tmp_path)
+    store.save_model("d.csv_KNN", [1])
+    store.save_metadata("d.csv_KNN", metadata("d.csv", "KNN"))
+    (tmp_path / "broken_metadata.json").write_text(json.dumps({"metrics": {}}))
+
+    registry = ModelRegistry(tmp_path / "registry.sqlite3")
+    registry.rebuild(tmp_path)
+    assert registry.list_models("d.csv") == [metadata("d.csv", "KNN")]
+
+
+def test_trained_models_survive_a_restart(trained):
+    service, dataset, model = trained
+    listed = service.get_trained_models(dataset)
+    assert [m["model_name"] for m in listed] == [model]
+
+    from app.ml_service import MLService
+
+    # The registry is reopened, not rebuilt; deleting it rebuilds it from the _metadata.json files
+    assert MLService().get_trained_models(dataset) == listed
+    (service.models_dir / "registry.sqlite3").unlink()
+    assert MLService().get_trained_models(ML_DATASET) == listed
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from app.model_store import ModelStore
+
+
+@pytest.fixture
+def forest():
+    rng = np.random.RandomState(0)
+    X, y = rng.rand(200, 4), rng.randint(0, 3, 200)
+    return RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y), X
+
+
+@pytest.mark.parametrize("compress", [0, 3])
+def test_model_round_trip(tmp_path, forest, compress):
+    model, X = forest
+    store = ModelStore(tmp_path, compress=compress)
+    path = store.save_model("ds_Random_Forest", model)
+    assert path == store.model_path("ds_Random_Forest")
+    assert ModelStore.is_compressed(path) == bool(compress)
+
+    loaded = store.load_model("ds_Random_Forest")
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(X))
+    # The atomic write leaves no temporary file behind
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+
+def test_uncompressed_artifacts_load_memory_mapped(tmp_path):
+    store = ModelStore(tmp_path)
+    store.save_model("m", {"weights": np.arange(1000, dtype=np.float64)})
+    assert isinstance(store.load_model("m")["weights"], np.memmap)
+    assert not isinstance(ModelStore(tmp_path, mmap=False).load_model("m")["weights"], np.memmap)
+
+
+def test_metadata_round_trip_and_missing_model(tmp_path):
+    store = ModelStore(tmp_path)
+    metadata = {"dataset": "ds", "model_name": "KNN", "metrics": {"accuracy": 0.5}}
+    store.save_metadata("ds_KNN", metadata)
+    assert store.load_metadata("ds_KNN") == metadata
+    with pytest.raises(ValueError, match="not found"):
+        store.load_model("ds_KNN")
+
+
+def test_failed_write_keeps_the_previous_artifact(tmp_path):
+    store = ModelStore(tmp_path)
+    store.save_model("m", [1, 2, 3])
+
+    class Unpicklable:
+        def __reduce__(self):
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        store.save_model("m", Unpicklable())
+    assert store.load_model("m") == [1, 2, 3]
+    assert [p.name for p in tmp_path.iterdir()] == ["m.joblib"]
@@ -0,0 +1,52 @@
+import marshal
+
+import pytest
+
+from app import profiling
+
+TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def admin(api, monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", TOKEN)
+    profiling.clear()
+    yield api
+    profiling.clear()
+
+
+def test_requests_are_profiled_only_with_the_admin_token(admin):
+    assert "X-Profile-Ids" not in admin.get("/datasets").headers
+    assert "X-Profile-Ids" not in admin.get("/datasets", headers={"X-Profile": "wrong"}).headers
+
+    response = admin.get("/datasets", headers={"X-Profile": TOKEN})
+    assert response.status_code == 200
+    [profile_id] = response.headers["X-Profile-Ids"].split(",")
+
+    [summary] = admin.get("/admin/profiles", headers={"X-Admin-Token": TOKEN}).json()["profiles"]
+    assert summary["id"] == profile_id
+    assert summary["route"] == "/datasets"
+    assert summary["function"].endswith("MLService.list_datasets")
+
+    text = admin.get(f"/admin/profiles/{profile_id}", params={"token": TOKEN}).text
+    assert "list_datasets" in text
+    stats = marshal.loads(admin.get(f"/admin/profiles/{profile_id}/pstats", params={"token": TOKEN}).content)
+    assert any(name == "list_datasets" for _, _, name in stats)
+
+
+def test_admin_endpoints_require_the_token(admin, monkeypatch):
+    assert admin.get("/admin/profiles").status_code == 403
+    assert admin.get("/admin/profiles/unknown", params={"token": TOKEN}).status_code == 404
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "")
+    # Profiling disabled: no token is accepted
+    assert admin.get("/admin/profiles", params={"token": ""}).status_code == 403
+
+
+def test_failed_calls_keep_their_report():
+    def fail():
+        raise KeyError("x")
+
+    with pytest.raises(KeyError):
+        profiling.profiled(fail, route="/ws/train")()
+    assert profiling.list_profiles()[0]["error"] == "KeyError('x')"
+    profiling.clear()
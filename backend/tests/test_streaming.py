@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from conftest import ML_DATASET
+
+
+def test_streaming_training_predicts_on_its_own_holdout(ml_service):
+    metrics = ml_service.train_model_streaming(ML_DATASET, "SGD", chunksize=128)
+    assert metrics["n_train_samples"] + metrics["n_test_samples"] == 600
+    assert 0 <= metrics["accuracy"] <= 1
+
+    # /predict rebuilds the test set with the trainer's hash holdout, not train_test_split
+    results, page_metrics, total = ml_service.predict(ML_DATASET, "SGD")
+    assert total == metrics["n_test_samples"]
+    assert page_metrics["accuracy"] == pytest.approx(metrics["accuracy"])
+    assert np.array(page_metrics["confusion_matrix"]).sum() == metrics["n_test_samples"]
+
+
+def test_streaming_holdout_ignores_chunk_boundaries(ml_service):
+    small = ml_service.train_model_streaming(ML_DATASET, "SGD", chunksize=64)
+    large = ml_service.train_model_streaming(ML_DATASET, "SGD", chunksize=1000)
+    assert small["n_test_samples"] == large["n_test_samples"]
+
+
+def test_permutation_importance_uses_the_streaming_holdout(ml_service, monkeypatch):
+    ml_service.train_model_streaming(ML_DATASET, "Naive Bayes", chunksize=128)
+    sizes = []
+    original = ml_service._adaptive_permutation_importance
+
+    def recording(model, X_test, y_test):
+        sizes.append(len(y_test))
+        return original(model, X_test, y_test)
+
+    monkeypatch.setattr(ml_service, "_adaptive_permutation_importance", recording)
+    importances = ml_service.get_feature_importance(ML_DATASET, "Naive Bayes")
+    metrics = ml_service._load_model(f"{ML_DATASET}_Naive_Bayes")["metadata"]["metrics"]
+    assert sizes == [metrics["n_test_samples"]]
+    assert len(importances) == 5
@@ -0,0 +1,36 @@
+import pytest
+
+from app import executors
+from app.tuning_service import _rung_budgets, tune_model
+from conftest import ML_DATASET
+
+
+@pytest.mark.parametrize("n_candidates, eta, n_rungs", [
+    (1, 3, 1), (2, 3, 1), (3, 3, 2), (27, 3, 4), (243, 3, 6), (242, 3, 5), (8, 2, 4), (1000, 10, 4),
+])
+def test_rung_count_is_exact_at_powers_of_eta(n_candidates, eta, n_rungs):
+    budgets = _rung_budgets(10_000, n_candidates, eta, min_samples=1)
+    assert len(budgets) == n_rungs
+    assert budgets[-1] == 10_000
+    assert all(a <= b for a, b in zip(budgets, budgets[1:]))
+
+
+def test_tuning_runs_on_the_shared_process_pool(ml_service):
+    events = []
+    try:
+        result = tune_model(ml_service, ML_DATASET, "Decision Tree",
+                            n_candidates=4, eta=2, max_workers=2, on_event=events.append)
+        stats = executors.cpu_process.stats()
+    finally:
+        executors.cpu_process.shutdown()
+
+    assert [e["done"] for e in events] == list(range(1, events[-1]["total"] + 1))
+    assert events[-1]["total"] == 4 + 2 + 1
+    assert stats["completed"] >= 7 and stats["in_flight"] == 0
+    assert result["best_params"] == events[-1]["best_params"]
+    assert 0 <= result["metrics"]["accuracy"] <= 1
+
+
+def test_eta_below_two_is_rejected(ml_service):
+    with pytest.raises(ValueError):
+        tune_model(ml_service, ML_DATASET, "Decision Tree", eta=1)
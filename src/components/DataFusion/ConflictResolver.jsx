@@ -1,7 +1,6 @@
 import React, { useState } from "react";
-import { LuTriangleAlert, LuCopy, LuShieldAlert, LuChevronDown } from "react-icons/lu";
-
-const BACKEND = "http://localhost:8000";
+import { LuTriangleAlert, LuCopy, LuShieldAlert, LuChevronDown, LuGitMerge } from "react-icons/lu";
+import { mergeInSession } from "./fusionApi";
 
 // ── Inline strategy selector ──────────────────────────────────────────────────
 const StrategySelect = ({ label, value, options, onChange }) => {
@@ -62,6 +61,8 @@ const ConflictPanel = ({ icon, title, badge, badgeColor, children }) => (
 // ── Main ─────────────────────────────────────────────────────────────────────
 const ConflictResolver = ({
   files,
+  sessionId,
+  setSessionId,
   columnMapping,
   keyColumn,
   labelColumn,
@@ -80,23 +81,13 @@ const ConflictResolver = ({
     setError(null);
     try {
       const payload = {
-        files: files.map((f) => ({ name: f.name, content: f.content })),
         column_mapping: columnMapping,
         key_column: keyColumn ?? "",
         label_col: labelColumn ?? "",
         rules,
         dry_run: true,
       };
-      const resp = await fetch(`${BACKEND}/datafusion/merge`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
-      });
-      if (!resp.ok) {
-        const detail = await resp.text();
-        throw new Error(`Server error ${resp.status}: ${detail}`);
-      }
-      setAnalysis(await resp.json());
+      setAnalysis(await mergeInSession(sessionId, setSessionId, files, payload));
     } catch (e) {
       setError(e.message);
     } finally {
@@ -113,6 +104,7 @@ const ConflictResolver = ({
   }
 
   const conflicts = analysis?.conflicts;
+  const fuzzyOn = (rules.fuzzyKeyStrategy ?? "off") !== "off";
 
   return (
     <div
@@ -302,6 +294,86 @@ const ConflictResolver = ({
             <div className="text-[10px] text-gray-700 italic">Run Analyze to detect.</div>
           )}
         </ConflictPanel>
+
+        {/* ── Fuzzy Key Matches ── */}
+        <ConflictPanel
+          icon={<LuGitMerge className="w-4 h-4 text-violet-400" />}
+          title="Fuzzy Key Matches"
+          badge={fuzzyOn ? conflicts?.fuzzy_key_clusters?.length ?? null : null}
+          badgeColor="bg-violet-900/40 text-violet-400"
+        >
+          <div className="flex flex-wrap gap-6 mb-4">
+            <StrategySelect
+              label="Matching"
+              value={rules.fuzzyKeyStrategy ?? "off"}
+              options={[
+                { value: "off",    label: "Off" },
+                { value: "report", label: "Report only" },
+                { value: "merge",  label: "Unify keys" },
+              ]}
+              onChange={(v) => setRule("fuzzyKeyStrategy", v)}
+            />
+            {fuzzyOn && (
+              <StrategySelect
+                label="Similarity ≥"
+                value={rules.fuzzyThreshold ?? 0.85}
+                options={[0.7, 0.8, 0.85, 0.9, 0.95].map((t) => ({ value: t, label: t.toFixed(2) }))}
+                onChange={(v) => setRule("fuzzyThreshold", v)}
+              />
+            )}
+          </div>
+          {!fuzzyOn ? (
+            <div className="text-[10px] text-gray-700 italic">
+              Enable to find near-identical keys across files (e.g. "GNPS-0001" vs "gnps_0001").
+            </div>
+          ) : conflicts?.fuzzy_key_clusters ? (
+            conflicts.fuzzy_key_clusters.length > 0 ? (
+              <div className="overflow-x-auto">
+                <table className="w-full text-[10px] text-gray-600">
+                  <thead>
+                    <tr className="text-gray-700 uppercase tracking-widest text-[9px]">
+                      <th className="text-left pb-1 pr-4 font-normal">Key</th>
+                      <th className="text-left pb-1 pr-4 font-normal">Variants</th>
+                      <th className="text-right pb-1 font-normal">Score</th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {conflicts.fuzzy_key_clusters.slice(0, 10).map((fc) => (
+                      <tr key={fc.key} className="border-t border-gray-800/40">
+                        <td className="pr-4 py-1 font-mono text-gray-500 max-w-xs truncate">
+                          {fc.key.substring(0, 30)}
+                        </td>
+                        <td className="pr-4 py-1">
+                          {fc.variants.map((v, i) => (
+                            <span
+                              key={i}
+                              className="inline-block mr-1.5 px-1.5 py-0.5 bg-violet-900/20 rounded text-violet-400 font-mono text-[9px]"
+                            >
+                              {v}
+                            </span>
+                          ))}
+                          {fc.size > fc.variants.length && (
+                            <span className="text-gray-700">+{fc.size - fc.variants.length}</span>
+                          )}
+                        </td>
+                        <td className="py-1 text-right font-mono text-gray-500">{fc.score.toFixed(2)}</td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+                {conflicts.fuzzy_key_clusters.length > 10 && (
+                  <div className="text-[9px] text-gray-700 mt-2">
+                    +{conflicts.fuzzy_key_clusters.length - 10} more clusters
+                  </div>
+                )}
+              </div>
+            ) : (
+              <div className="text-[10px] text-gray-600 italic">No near-identical keys found.</div>
+            )
+          ) : (
+            <div className="text-[10px] text-gray-700 italic">Run Analyze to detect.</div>
+          )}
+        </ConflictPanel>
       </div>
     </div>
   );
@@ -9,7 +9,8 @@ const DataFusionContent = ({ activeIndex, scrollIndex, totalSections }) => {
   const { currentOpacity } = getAnimationProgress(scrollIndex, activeIndex, totalSections);
 
   // ── Global flow state ─────────────────────────────────────────────────────
-  const [files, setFiles] = useState([]);           // [{name, content, info}]
+  const [files, setFiles] = useState([]);           // [{name, file, info}]
+  const [sessionId, setSessionId] = useState(null); // server-side session with the parsed files
   const [columnMapping, setColumnMapping] = useState({}); // {filename: {oldCol: newCol|null}}
   const [keyColumn, setKeyColumn] = useState(null);
   const [labelColumn, setLabelColumn] = useState(null);
@@ -18,8 +19,10 @@ const DataFusionContent = ({ activeIndex, scrollIndex, totalSections }) => {
     caseStrategy: "lowercase",
     duplicateStrategy: "first",
     conflictStrategy: "flag",
+    fuzzyKeyStrategy: "off",
+    fuzzyThreshold: 0.85,
   });
-  const [mergedResult, setMergedResult] = useState(null); // {data, stats}
+  const [mergedResult, setMergedResult] = useState(null); // {stats, columns, data (loaded pages), total}
 
   let content = null;
 
@@ -28,6 +31,8 @@ const DataFusionContent = ({ activeIndex, scrollIndex, totalSections }) => {
       <ImportView
         files={files}
         setFiles={setFiles}
+        sessionId={sessionId}
+        setSessionId={setSessionId}
       />
     );
   } else if (activeIndex === 1) {
@@ -46,6 +51,8 @@ const DataFusionContent = ({ activeIndex, scrollIndex, totalSections }) => {
     content = (
       <ConflictResolver
         files={files}
+        sessionId={sessionId}
+        setSessionId={setSessionId}
         columnMapping={columnMapping}
         keyColumn={keyColumn}
         labelColumn={labelColumn}
@@ -59,6 +66,8 @@ const DataFusionContent = ({ activeIndex, scrollIndex, totalSections }) => {
     content = (
       <ExportView
         files={files}
+        sessionId={sessionId}
+        setSessionId={setSessionId}
         columnMapping={columnMapping}
         keyColumn={keyColumn}
         labelColumn={labelColumn}
@@ -1,22 +1,12 @@
 import React, { useState } from "react";
 import { LuDownload, LuGitMerge } from "react-icons/lu";
+import { exportFromSession, previewInSession } from "./fusionApi";
 
-const BACKEND = "http://localhost:8000";
-
-// ── CSV download helper ───────────────────────────────────────────────────────
-function downloadCSV(data, filename = "merged_dataset.csv") {
-  if (!data?.length) return;
-  const cols = Object.keys(data[0]);
-  const escape = (v) => {
-    const s = String(v ?? "");
-    return s.includes(",") || s.includes('"') || s.includes("\n")
-      ? `"${s.replace(/"/g, '""')}"`
-      : s;
-  };
-  const header = cols.join(",");
-  const rows = data.map((row) => cols.map((c) => escape(row[c])).join(","));
-  const csv = [header, ...rows].join("\n");
-  const blob = new Blob([csv], { type: "text/csv;charset=utf-8;" });
+const PAGE_SIZE = 50;
+const FORMATS = ["csv", "ndjson", "parquet"];
+
+// ── Download helper ───────────────────────────────────────────────────────────
+function downloadBlob(blob, filename) {
   const url = URL.createObjectURL(blob);
   const a = document.createElement("a");
   a.href = url;
@@ -28,6 +18,8 @@ function downloadCSV(data, filename = "merged_dataset.csv") {
 // ── Main ─────────────────────────────────────────────────────────────────────
 const ExportView = ({
   files,
+  sessionId,
+  setSessionId,
   columnMapping,
   keyColumn,
   labelColumn,
@@ -36,33 +28,28 @@ const ExportView = ({
   setMergedResult,
 }) => {
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [exporting, setExporting] = useState(false);
   const [error, setError] = useState(null);
-  const [visibleRows, setVisibleRows] = useState(50);
+  const [format, setFormat] = useState("csv");
+
+  const payload = {
+    column_mapping: columnMapping,
+    key_column: keyColumn ?? "",
+    label_col: labelColumn ?? "",
+    rules,
+  };
+
+  // The merge runs once server-side; pages of the result are fetched on demand
+  const fetchPage = (offset) =>
+    previewInSession(sessionId, setSessionId, files, payload, offset, PAGE_SIZE);
 
   const handleMerge = async () => {
     setLoading(true);
     setError(null);
     setMergedResult(null);
     try {
-      const payload = {
-        files: files.map((f) => ({ name: f.name, content: f.content })),
-        column_mapping: columnMapping,
-        key_column: keyColumn ?? "",
-        label_col: labelColumn ?? "",
-        rules,
-        dry_run: false,
-      };
-      const resp = await fetch(`${BACKEND}/datafusion/merge`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
-      });
-      if (!resp.ok) {
-        const detail = await resp.text();
-        throw new Error(`Server error ${resp.status}: ${detail}`);
-      }
-      setMergedResult(await resp.json());
-      setVisibleRows(50);
+      setMergedResult(await fetchPage(0));
     } catch (e) {
       setError(e.message);
     } finally {
@@ -70,6 +57,32 @@ const ExportView = ({
     }
   };
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    setError(null);
+    try {
+      const page = await fetchPage(mergedResult.data.length);
+      setMergedResult((prev) => ({ ...page, data: [...prev.data, ...page.data] }));
+    } catch (e) {
+      setError(e.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const handleExport = async () => {
+    setExporting(true);
+    setError(null);
+    try {
+      const blob = await exportFromSession(sessionId, setSessionId, files, payload, format);
+      downloadBlob(blob, `merged_dataset.${format}`);
+    } catch (e) {
+      setError(e.message);
+    } finally {
+      setExporting(false);
+    }
+  };
+
   if (files.length === 0) {
     return (
       <div className="absolute inset-0 flex items-center justify-center">
@@ -80,8 +93,8 @@ const ExportView = ({
 
   const data = mergedResult?.data ?? [];
   const stats = mergedResult?.stats;
-  const cols = data.length > 0 ? Object.keys(data[0]) : [];
-  const visible = data.slice(0, visibleRows);
+  const total = mergedResult?.total ?? 0;
+  const cols = mergedResult?.columns ?? [];
 
   return (
     <div
@@ -101,13 +114,27 @@ const ExportView = ({
           </button>
 
           {data.length > 0 && (
-            <button
-              onClick={() => downloadCSV(data)}
-              className="flex items-center gap-2 px-4 py-2 bg-gray-800 hover:bg-gray-700 border border-gray-700 rounded-lg text-xs text-gray-300 transition-colors"
-            >
-              <LuDownload className="w-4 h-4" />
-              Download CSV
-            </button>
+            <>
+              <select
+                value={format}
+                onChange={(e) => setFormat(e.target.value)}
+                className="px-2 py-2 bg-gray-900 border border-gray-700 rounded-lg text-xs text-gray-300"
+              >
+                {FORMATS.map((f) => (
+                  <option key={f} value={f}>
+                    {f.toUpperCase()}
+                  </option>
+                ))}
+              </select>
+              <button
+                onClick={handleExport}
+                disabled={exporting}
+                className="flex items-center gap-2 px-4 py-2 bg-gray-800 hover:bg-gray-700 border border-gray-700 rounded-lg text-xs text-gray-300 transition-colors disabled:opacity-50"
+              >
+                <LuDownload className="w-4 h-4" />
+                {exporting ? "Exporting…" : `Download ${format.toUpperCase()}`}
+              </button>
+            </>
           )}
         </div>
 
@@ -140,7 +167,7 @@ const ExportView = ({
           <div className="bg-[#0e0e0e] border border-gray-800 rounded-xl overflow-hidden">
             <div className="flex items-center justify-between px-4 py-3 border-b border-gray-800">
               <div className="text-[10px] text-gray-600 uppercase tracking-widest">
-                Preview · {data.length} rows · {cols.length} columns
+                Preview · {total} rows · {cols.length} columns
               </div>
             </div>
             <div className="overflow-x-auto">
@@ -158,7 +185,7 @@ const ExportView = ({
                   </tr>
                 </thead>
                 <tbody>
-                  {visible.map((row, i) => (
+                  {data.map((row, i) => (
                     <tr
                       key={i}
                       className={`border-t border-gray-800/40 ${
@@ -185,13 +212,14 @@ const ExportView = ({
               </table>
             </div>
 
-            {data.length > visibleRows && (
+            {total > data.length && (
               <div className="flex justify-center px-4 py-3 border-t border-gray-800">
                 <button
-                  onClick={() => setVisibleRows((n) => n + 50)}
-                  className="text-[10px] text-emerald-600 hover:text-emerald-400 transition-colors"
+                  onClick={handleLoadMore}
+                  disabled={loadingMore}
+                  className="text-[10px] text-emerald-600 hover:text-emerald-400 transition-colors disabled:opacity-50"
                 >
-                  Load more ({data.length - visibleRows} remaining)
+                  Load more ({total - data.length} remaining)
                 </button>
               </div>
             )}
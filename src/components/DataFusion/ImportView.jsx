@@ -1,7 +1,6 @@
 import React, { useState, useRef, useCallback } from "react";
 import { LuCloudUpload, LuX, LuTable2 } from "react-icons/lu";
-
-const BACKEND = "http://localhost:8000";
+import { uploadToSession, removeFromSession } from "./fusionApi";
 
 // ── File card ─────────────────────────────────────────────────────────────────
 const FileCard = ({ file, onRemove }) => {
@@ -75,7 +74,7 @@ const FileCard = ({ file, onRemove }) => {
 };
 
 // ── Main ─────────────────────────────────────────────────────────────────────
-const ImportView = ({ files, setFiles }) => {
+const ImportView = ({ files, setFiles, sessionId, setSessionId }) => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const fileInputRef = useRef(null);
@@ -85,53 +84,35 @@ const ImportView = ({ files, setFiles }) => {
       setLoading(true);
       setError(null);
       try {
-        // Read file contents
-        const fileContents = await Promise.all(
-          Array.from(rawFiles).map(
-            (f) =>
-              new Promise((resolve, reject) => {
-                const reader = new FileReader();
-                reader.onload = (e) =>
-                  resolve({ name: f.name, content: e.target.result });
-                reader.onerror = reject;
-                reader.readAsText(f);
-              })
-          )
-        );
-
         // Skip duplicates already loaded
         const existingNames = new Set(files.map((f) => f.name));
-        const newContents = fileContents.filter((f) => !existingNames.has(f.name));
-        if (newContents.length === 0) {
+        const newFiles = Array.from(rawFiles).filter((f) => !existingNames.has(f.name));
+        if (newFiles.length === 0) {
           setLoading(false);
           return;
         }
 
-        const resp = await fetch(`${BACKEND}/datafusion/info`, {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ files: newContents }),
-        });
-        if (!resp.ok) {
-          const detail = await resp.text();
-          throw new Error(`Server error ${resp.status}: ${detail}`);
-        }
-        const { files: infos } = await resp.json();
-
-        const merged = infos.map((info) => ({
-          name: info.name,
-          content: newContents.find((f) => f.name === info.name)?.content ?? "",
-          info,
-        }));
-
-        setFiles((prev) => [...prev, ...merged]);
+        // Upload once: the server parses the files into a session
+        const { session_id, files: infos } = await uploadToSession(sessionId, files, newFiles);
+        setSessionId(session_id);
+
+        // Keep the File objects: they re-create the session if it expires
+        const byName = new Map(files.map((f) => [f.name, f.file]));
+        newFiles.forEach((f) => byName.set(f.name, f));
+        setFiles(
+          infos.map((info) => ({
+            name: info.name,
+            file: byName.get(info.name),
+            info,
+          }))
+        );
       } catch (e) {
         setError(e.message);
       } finally {
         setLoading(false);
       }
     },
-    [files, setFiles]
+    [files, setFiles, sessionId, setSessionId]
   );
 
   const handleDrop = useCallback(
@@ -144,7 +125,10 @@ const ImportView = ({ files, setFiles }) => {
 
   const handleDragOver = (e) => e.preventDefault();
 
-  const removeFile = (name) => setFiles((prev) => prev.filter((f) => f.name !== name));
+  const removeFile = (name) => {
+    setFiles((prev) => prev.filter((f) => f.name !== name));
+    removeFromSession(sessionId, name).catch((e) => setError(e.message));
+  };
 
   return (
     <div
@@ -0,0 +1,104 @@
+// ── DataFusion session API ────────────────────────────────────────────────────
+// Files are uploaded once (multipart) into a server-side session; later steps
+// refer to the session id. Sessions expire server-side: on 404 the session is
+// recreated from the File objects kept in state and the call is retried.
+
+const BACKEND = "http://localhost:8000";
+
+class HttpError extends Error {
+  constructor(status, detail) {
+    super(`Server error ${status}: ${detail}`);
+    this.status = status;
+  }
+}
+
+async function request(url, options) {
+  const resp = await fetch(url, options);
+  if (!resp.ok) throw new HttpError(resp.status, await resp.text());
+  return resp.json();
+}
+
+function upload(url, rawFiles) {
+  const form = new FormData();
+  rawFiles.forEach((f) => form.append("files", f, f.name));
+  return request(url, { method: "POST", body: form });
+}
+
+// Add rawFiles to the session (creating it if needed) → {session_id, files: [info]}
+export async function uploadToSession(sessionId, existingFiles, rawFiles) {
+  if (sessionId) {
+    try {
+      return await upload(`${BACKEND}/datafusion/sessions/${sessionId}/files`, rawFiles);
+    } catch (e) {
+      if (e.status !== 404) throw e;
+    }
+  }
+  return upload(`${BACKEND}/datafusion/sessions`, [
+    ...existingFiles.map((f) => f.file),
+    ...rawFiles,
+  ]);
+}
+
+export async function removeFromSession(sessionId, name) {
+  if (!sessionId) return;
+  try {
+    await request(
+      `${BACKEND}/datafusion/sessions/${sessionId}/files/${encodeURIComponent(name)}`,
+      { method: "DELETE" }
+    );
+  } catch (e) {
+    if (e.status !== 404) throw e;
+  }
+}
+
+// Run call(sessionId); on 404 re-create the session from the File objects and retry
+async function withSession(sessionId, setSessionId, files, call) {
+  if (sessionId) {
+    try {
+      return await call(sessionId);
+    } catch (e) {
+      if (e.status !== 404) throw e;
+    }
+  }
+  const { session_id } = await upload(
+    `${BACKEND}/datafusion/sessions`,
+    files.map((f) => f.file)
+  );
+  setSessionId(session_id);
+  return call(session_id);
+}
+
+const jsonBody = (payload) => ({
+  method: "POST",
+  headers: { "Content-Type": "application/json" },
+  body: JSON.stringify(payload),
+});
+
+// POST /datafusion/sessions/{id}/merge — payload as /datafusion/merge, without files
+export function mergeInSession(sessionId, setSessionId, files, payload) {
+  return withSession(sessionId, setSessionId, files, (id) =>
+    request(`${BACKEND}/datafusion/sessions/${id}/merge`, jsonBody(payload))
+  );
+}
+
+// One page of the merged rows → {stats, columns, data, offset, limit, total}
+export function previewInSession(sessionId, setSessionId, files, payload, offset, limit) {
+  return withSession(sessionId, setSessionId, files, (id) =>
+    request(
+      `${BACKEND}/datafusion/sessions/${id}/preview`,
+      jsonBody({ ...payload, offset, limit })
+    )
+  );
+}
+
+// Streamed export (csv | ndjson | parquet) → Blob
+export function exportFromSession(sessionId, setSessionId, files, payload, format) {
+  return withSession(sessionId, setSessionId, files, async (id) => {
+    const resp = await fetch(
+      `${BACKEND}/datafusion/sessions/${id}/export`,
+      jsonBody({ ...payload, format })
+    );
+    if (!resp.ok) throw new HttpError(resp.status, await resp.text());
+    return resp.blob();
+  });
+}